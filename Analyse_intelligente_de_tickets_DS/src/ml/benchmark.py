@@ -0,0 +1,374 @@
+# =============================================================================
+# Benchmark - Latence et débit de la chaîne de prédiction locale
+# =============================================================================
+"""
+Mesures reproductibles de predict_pipeline sur data/test.csv et
+data/validation.csv :
+
+    1. Démarrage à froid : import + chargement des 4 modèles + premier
+       ticket, dans un interpréteur neuf (sous-processus)
+    2. Latence à chaud d'un ticket (predict_ticket, cache désactivé) :
+       moyenne, p50, p95, p99
+    3. Débit par lot (predict_tickets) pour plusieurs tailles de lot
+    4. Pic de mémoire résidente (RSS) du processus
+
+Le rapport JSON (clés triées, valeurs arrondies) est fait pour être
+comparé d'un commit à l'autre ; --compare affiche les écarts avec un
+rapport précédent.
+
+Usage :
+    python src/ml/benchmark.py --output reports/benchmark_report.json
+    python src/ml/benchmark.py --batch-sizes 1 16 64 256 --compare reports/old_report.json
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(SCRIPT_DIR))
+DATA_FILES = [
+    os.path.join(PROJECT_ROOT, "data", "test.csv"),
+    os.path.join(PROJECT_ROOT, "data", "validation.csv"),
+]
+
+# Rapports générés (reports/ est ignoré par git)
+DEFAULT_OUTPUT = os.path.join(PROJECT_ROOT, "reports", "benchmark_report.json")
+DEFAULT_BATCH_SIZES = [1, 16, 64, 256]
+DEFAULT_WARMUP = 10           # Tickets ignorés avant la mesure à chaud
+DEFAULT_REPEATS = 3           # Passes par taille de lot (meilleure passe retenue)
+
+# Métriques comparées par --compare (plus petit = meilleur, sauf débit)
+HIGHER_IS_BETTER = ('tickets_per_s',)
+
+# Code exécuté dans un interpréteur neuf pour le démarrage à froid
+_COLD_START_CODE = """
+import json, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, {ml_dir!r})
+import predict_pipeline as pp
+t1 = time.perf_counter()
+pp.get_registry().preload(pp.PIPELINE_FILES)
+t2 = time.perf_counter()
+pp.predict_ticket({titre!r}, {texte!r}, use_cache=False)
+t3 = time.perf_counter()
+print(json.dumps({{'import_ms': (t1 - t0) * 1000, 'load_models_ms': (t2 - t1) * 1000,
+                  'first_ticket_ms': (t3 - t2) * 1000, 'total_ms': (t3 - t0) * 1000}}))
+"""
+
+
+# =============================================================================
+# DONNÉES
+# =============================================================================
+
+def load_tickets(paths: list = None) -> pd.DataFrame:
+    """
+    Charge les tickets de référence (titre, texte) valides pour la chaîne.
+
+    Args:
+        paths: Fichiers CSV (défaut : test.csv + validation.csv)
+
+    Returns:
+        DataFrame avec les colonnes titre et texte
+    """
+    from predict_pipeline import validate_input
+
+    frames = [pd.read_csv(path, usecols=['titre', 'texte']) for path in (paths or DATA_FILES)]
+    df = pd.concat(frames, ignore_index=True).fillna('')
+
+    valid = []
+    for titre, texte in zip(df['titre'], df['texte']):
+        try:
+            validate_input(titre, texte)
+            valid.append(True)
+        except ValueError:
+            valid.append(False)
+    return df[valid].reset_index(drop=True)
+
+
+def _take(df: pd.DataFrame, n: int) -> pd.DataFrame:
+    """Les n premiers tickets (le jeu est répété si n dépasse sa taille)."""
+    reps = -(-n // len(df))
+    return pd.concat([df] * reps, ignore_index=True).iloc[:n]
+
+
+# =============================================================================
+# MESURES
+# =============================================================================
+
+def _round(value: float, ndigits: int = 3) -> float:
+    return round(float(value), ndigits)
+
+
+def latency_summary(samples_ms: list) -> dict:
+    """Moyenne et percentiles d'une série de latences (ms)."""
+    values = np.asarray(samples_ms, dtype=float)
+    return {
+        'n': int(values.size),
+        'mean_ms': _round(values.mean()),
+        'p50_ms': _round(np.percentile(values, 50)),
+        'p95_ms': _round(np.percentile(values, 95)),
+        'p99_ms': _round(np.percentile(values, 99)),
+        'max_ms': _round(values.max()),
+    }
+
+
+def peak_rss_mb() -> float:
+    """Pic de mémoire résidente du processus courant (Mo), None si indisponible."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux : kilo-octets, macOS : octets
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return _round(peak / divisor, 1)
+
+
+def bench_cold_start(titre: str, texte: str) -> dict:
+    """
+    Démarrage à froid dans un sous-processus (import, modèles, premier ticket).
+    """
+    code = _COLD_START_CODE.format(ml_dir=SCRIPT_DIR, titre=titre, texte=texte)
+    proc = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Démarrage à froid en échec:\n{proc.stderr.strip()}")
+    timings = json.loads(proc.stdout.strip().splitlines()[-1])
+    return {key: _round(value) for key, value in timings.items()}
+
+
+def bench_single(df: pd.DataFrame, warmup: int = DEFAULT_WARMUP) -> dict:
+    """
+    Latence à chaud de predict_ticket, un ticket à la fois (cache désactivé).
+    """
+    from predict_pipeline import predict_ticket
+
+    rows = list(zip(df['titre'], df['texte']))
+    for titre, texte in rows[:warmup]:
+        predict_ticket(titre, texte, use_cache=False)
+
+    samples = []
+    for titre, texte in rows:
+        t0 = time.perf_counter()
+        predict_ticket(titre, texte, use_cache=False)
+        samples.append((time.perf_counter() - t0) * 1000)
+    return latency_summary(samples)
+
+
+def bench_batches(df: pd.DataFrame, batch_sizes: list,
+                  repeats: int = DEFAULT_REPEATS) -> dict:
+    """
+    Débit de predict_tickets pour chaque taille de lot.
+
+    Chaque taille traite au moins len(df) tickets par passe ; la meilleure
+    des `repeats` passes est retenue (moins sensible au bruit).
+    """
+    from predict_pipeline import predict_tickets
+
+    results = {}
+    for size in batch_sizes:
+        batch = _take(df, size)
+        n_batches = max(1, -(-len(df) // size))
+        predict_tickets(batch, validate=False)  # préchauffage
+
+        best = None
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            for _ in range(n_batches):
+                predict_tickets(batch, validate=False)
+            elapsed = time.perf_counter() - t0
+            best = elapsed if best is None else min(best, elapsed)
+
+        n_tickets = n_batches * size
+        results[str(size)] = {
+            'batches': n_batches,
+            'tickets': n_tickets,
+            'batch_ms': _round(best / n_batches * 1000),
+            'per_ticket_ms': _round(best / n_tickets * 1000),
+            'tickets_per_s': _round(n_tickets / best, 1),
+        }
+    return results
+
+
+# =============================================================================
+# RAPPORT
+# =============================================================================
+
+def _git_commit() -> str:
+    try:
+        proc = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True)
+        return proc.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _environment() -> dict:
+    versions = {}
+    for name in ('numpy', 'pandas', 'scipy', 'sklearn', 'xgboost', 'joblib'):
+        try:
+            versions[name] = __import__(name).__version__
+        except ImportError:
+            versions[name] = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'packages': versions,
+    }
+
+
+def run_benchmark(batch_sizes: list = None, warmup: int = DEFAULT_WARMUP,
+                  repeats: int = DEFAULT_REPEATS, cold_start: bool = True,
+                  stages: bool = False) -> dict:
+    """
+    Exécute toutes les mesures et retourne le rapport.
+
+    Args:
+        batch_sizes: Tailles de lot pour le débit
+        warmup: Tickets de préchauffage avant la latence à chaud
+        repeats: Passes par taille de lot
+        cold_start: Mesurer le démarrage à froid (sous-processus)
+        stages: Inclure la latence par étape (latency_metrics)
+    """
+    import latency_metrics
+    from predict_pipeline import model_bundle_version
+
+    df = load_tickets()
+    if df.empty:
+        raise ValueError("Aucun ticket valide dans les données de référence.")
+
+    report = {
+        'commit': _git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': _environment(),
+        'dataset': {'files': [os.path.relpath(p, PROJECT_ROOT) for p in DATA_FILES],
+                    'tickets': len(df)},
+    }
+
+    if cold_start:
+        report['cold_start'] = bench_cold_start(df['titre'].iloc[0], df['texte'].iloc[0])
+
+    report['model_version'] = model_bundle_version()
+    if stages:
+        latency_metrics.enable()
+    report['single_ticket'] = bench_single(df, warmup)
+    if stages:
+        report['stages'] = latency_metrics.snapshot()['sections']
+        latency_metrics.disable()
+
+    report['batch'] = bench_batches(df, batch_sizes or DEFAULT_BATCH_SIZES, repeats)
+    report['peak_rss_mb'] = peak_rss_mb()
+    return report
+
+
+def _flatten(data: dict, prefix: str = '') -> dict:
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare_reports(old: dict, new: dict) -> list:
+    """
+    Écarts entre deux rapports (métriques de temps, débit et mémoire).
+
+    Returns:
+        Liste de tuples (métrique, ancienne valeur, nouvelle valeur, écart %)
+    """
+    old_flat = _flatten({k: v for k, v in old.items() if k != 'environment'})
+    new_flat = _flatten({k: v for k, v in new.items() if k != 'environment'})
+    rows = []
+    for name in sorted(set(old_flat) & set(new_flat)):
+        if not name.endswith(('_ms', '_mb', 'tickets_per_s')):
+            continue
+        before, after = old_flat[name], new_flat[name]
+        delta = (after - before) / before * 100 if before else 0.0
+        rows.append((name, before, after, delta))
+    return rows
+
+
+def print_comparison(rows: list) -> None:
+    """Affiche les écarts (▲ = régression, ▼ = amélioration)."""
+    print(f"\n{'Métrique':<40} {'Avant':>12} {'Après':>12} {'Écart':>9}")
+    print("-" * 76)
+    for name, before, after, delta in rows:
+        worse = delta < 0 if name.endswith(HIGHER_IS_BETTER) else delta > 0
+        mark = '▲' if worse and abs(delta) >= 5 else ('▼' if abs(delta) >= 5 else ' ')
+        print(f"{name:<40} {before:>12.3f} {after:>12.3f} {delta:>+8.1f}% {mark}")
+
+
+def print_summary(report: dict) -> None:
+    """Affiche un résumé lisible du rapport."""
+    print("\n" + "=" * 60)
+    print("⏱️  BENCHMARK - CHAÎNE DE PRÉDICTION LOCALE")
+    print("=" * 60)
+    print(f"  Tickets de référence : {report['dataset']['tickets']}")
+    if 'cold_start' in report:
+        cold = report['cold_start']
+        print(f"  Démarrage à froid    : {cold['total_ms']:.0f} ms "
+              f"(import {cold['import_ms']:.0f}, modèles {cold['load_models_ms']:.0f}, "
+              f"1er ticket {cold['first_ticket_ms']:.0f})")
+    single = report['single_ticket']
+    print(f"  Ticket unitaire      : p50 {single['p50_ms']:.2f} ms | "
+          f"p95 {single['p95_ms']:.2f} ms | p99 {single['p99_ms']:.2f} ms")
+    for size, stats in report['batch'].items():
+        print(f"  Lot de {size:>4}          : {stats['tickets_per_s']:>8.1f} tickets/s "
+              f"({stats['per_ticket_ms']:.3f} ms/ticket)")
+    print(f"  Pic RSS              : {report['peak_rss_mb']} Mo")
+    print("=" * 60)
+
+
+# =============================================================================
+# POINT D'ENTRÉE
+# =============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de la chaîne de prédiction locale")
+    parser.add_argument('--output', '-o', default=DEFAULT_OUTPUT,
+                        help="Fichier JSON du rapport")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=DEFAULT_BATCH_SIZES,
+                        help=f"Tailles de lot (défaut: {DEFAULT_BATCH_SIZES})")
+    parser.add_argument('--warmup', type=int, default=DEFAULT_WARMUP)
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS)
+    parser.add_argument('--no-cold-start', action='store_true',
+                        help="Ne pas mesurer le démarrage à froid")
+    parser.add_argument('--stages', action='store_true',
+                        help="Inclure la latence par étape (TF-IDF, OneHot, predict...)")
+    parser.add_argument('--compare', help="Rapport JSON précédent à comparer")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.batch_sizes, args.warmup, args.repeats,
+                           cold_start=not args.no_cold_start, stages=args.stages)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, sort_keys=True, ensure_ascii=False)
+        f.write('\n')
+
+    print_summary(report)
+    print(f"\n💾 Rapport écrit dans {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            print_comparison(compare_reports(json.load(f), report))
+
+
+if __name__ == "__main__":
+    main()
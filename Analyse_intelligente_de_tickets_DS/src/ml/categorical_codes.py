@@ -0,0 +1,103 @@
+# =============================================================================
+# Codes Catégoriels - Encodage OneHot par index entre les étapes
+# =============================================================================
+"""
+Transmission des prédictions upstream sous forme de codes entiers.
+
+Dans la chaîne, les étapes 2 à 4 encodent en OneHot les prédictions des
+étapes précédentes (urgence_pred, categorie_pred, type_ticket_pred). Plutôt
+que de passer des chaînes à OneHotEncoder.transform (comparaisons de
+chaînes ligne par ligne), chaque étape transmet l'indice de sa classe dans
+model.classes_. Une table code -> colonne OneHot, calculée une fois par
+couple (encodeur, classes upstream), permet de construire directement la
+matrice CSR par arithmétique d'index.
+
+Le résultat est identique à OneHotEncoder(handle_unknown='ignore') : une
+classe upstream absente des catégories de l'encodeur donne une ligne vide.
+"""
+
+from typing import Any, Dict, List
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+def encoder_lookup(encoder: Any, classes: List[np.ndarray]) -> List[np.ndarray]:
+    """
+    Tables de correspondance code upstream -> colonne de la matrice OneHot.
+
+    Args:
+        encoder: OneHotEncoder entraîné (sans drop)
+        classes: Pour chaque colonne encodée, les classes du modèle upstream
+
+    Returns:
+        Une table int64 par colonne (-1 si la classe est inconnue de l'encodeur)
+    """
+    if len(classes) != len(encoder.categories_):
+        raise ValueError(
+            f"{len(classes)} colonnes upstream pour {len(encoder.categories_)} colonnes encodées"
+        )
+
+    lookups = []
+    offset = 0
+    for categories, upstream in zip(encoder.categories_, classes):
+        position = {value: offset + i for i, value in enumerate(categories.tolist())}
+        lookups.append(np.array([position.get(value, -1) for value in upstream.tolist()],
+                                dtype=np.int64))
+        offset += len(categories)
+    return lookups
+
+
+class StageCodes:
+    """
+    Prédictions upstream d'un lot, sous forme de codes entiers.
+
+    Chaque colonne (ex: 'urgence_pred') est enregistrée avec ses codes
+    (indices dans classes) et les classes du modèle qui les a produits.
+    """
+
+    def __init__(self):
+        self._columns: Dict[str, tuple] = {}
+
+    def set(self, column: str, codes: np.ndarray, classes: np.ndarray) -> None:
+        self._columns[column] = (np.asarray(codes, dtype=np.intp), np.asarray(classes))
+
+    def has(self, columns: List[str]) -> bool:
+        return all(column in self._columns for column in columns)
+
+    def decode(self, column: str) -> np.ndarray:
+        """Libellés de la colonne (classes[codes])."""
+        codes, classes = self._columns[column]
+        return classes[codes]
+
+    def onehot(self, pipeline: Dict[str, Any], columns: List[str]):
+        """
+        Matrice OneHot CSR des colonnes, équivalente à
+        pipeline['encoder'].transform(df[columns]).
+
+        La table de correspondance est mémorisée dans le pipeline
+        (clé 'onehot_lookup'), par jeu de classes upstream.
+        """
+        encoder = pipeline['encoder']
+        classes = [self._columns[column][1] for column in columns]
+        key = (tuple(columns),) + tuple(tuple(c.tolist()) for c in classes)
+
+        cache = pipeline.setdefault('onehot_lookup', {})
+        lookups = cache.get(key)
+        if lookups is None:
+            lookups = cache[key] = encoder_lookup(encoder, classes)
+
+        n_rows = len(self._columns[columns[0]][0])
+        n_cols = sum(len(categories) for categories in encoder.categories_)
+
+        # Une colonne OneHot par colonne encodée (offsets croissants : indices triés)
+        cols = np.empty((n_rows, len(columns)), dtype=np.int64)
+        for j, (column, lookup) in enumerate(zip(columns, lookups)):
+            cols[:, j] = lookup[self._columns[column][0]]
+
+        known = cols >= 0
+        indptr = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(known.sum(axis=1), out=indptr[1:])
+        indices = cols[known]
+        data = np.ones(indices.size, dtype=np.float64)
+        return csr_matrix((data, indices, indptr), shape=(n_rows, n_cols))
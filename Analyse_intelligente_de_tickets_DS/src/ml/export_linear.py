@@ -0,0 +1,363 @@
+# =============================================================================
+# Export des Étapes Linéaires vers le Runtime NumPy
+# =============================================================================
+"""
+Compile les pipelines linéaires (urgence, catégorie, type) en fichiers .npz
+utilisables par linear_runtime.py, sans sklearn à l'inférence.
+
+Le modèle de temps (XGBoost / GradientBoosting) n'est pas linéaire et reste
+servi par predict_pipeline.py.
+
+Au format mmap, le vocabulaire TF-IDF de chaque étape (temps compris) est
+aussi exporté dans models/vocab_<tfidf_id>/ : avec MODEL_MMAP=1,
+predict_pipeline l'utilise à la place du dictionnaire vocabulary_ des .pkl.
+
+Réduction de taille à l'export :
+    - les coefficients sont stockés en float32 (float16 ou float64 au choix)
+    - --prune-threshold retire du vocabulaire et des coefficients les termes
+      dont le poids absolu maximal (toutes classes) est sous le seuil ;
+      --accuracy mesure l'écart d'exactitude sur data/test.csv
+
+Usage :
+    python src/ml/export_linear.py                  # export .npz dans models/
+    python src/ml/export_linear.py --format mmap    # répertoires .npy (mmap, partagés)
+                                                    # + vocabulaires partagés des 4 étapes
+    python src/ml/export_linear.py --check          # export + parité sur data/test.csv
+    python src/ml/export_linear.py --prune-threshold 0.05 --precision float16 --accuracy
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+
+from predict_pipeline import MODELS_DIR, PROJECT_ROOT, PIPELINE_FILES, load_pipeline, predict_tickets
+from linear_runtime import LINEAR_STAGES, CompiledLinearChain, compiled_path, compiled_dir, vocab_dir
+from text_features import tfidf_fingerprint
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+# Jeu de données utilisé pour le contrôle de parité
+CHECK_DATA = os.path.join(PROJECT_ROOT, "data", "test.csv")
+
+# Précision des coefficients exportés
+PRECISIONS = {'float64': np.float64, 'float32': np.float32, 'float16': np.float16}
+DEFAULT_PRECISION = 'float32'
+
+# Colonne de vérité terrain (data/test.csv) de chaque prédiction
+TRUE_COLUMNS = {
+    'urgence_pred': 'urgence',
+    'categorie_pred': 'categorie',
+    'type_ticket_pred': 'type_ticket',
+}
+
+
+# =============================================================================
+# EXPORT
+# =============================================================================
+
+def tfidf_meta(tfidf) -> dict:
+    """
+    Extrait les paramètres de tokenisation d'un TfidfVectorizer.
+
+    Raises:
+        ValueError: Si le vectoriseur utilise une option non reproduite par le runtime
+    """
+    if not hasattr(tfidf, 'vocabulary_'):
+        raise ValueError("Vectoriseur sklearn requis : exporter avec MODEL_MMAP=0.")
+    if tfidf.analyzer != 'word' or tfidf.tokenizer is not None or tfidf.preprocessor is not None:
+        raise ValueError("Seul l'analyseur 'word' standard est supporté par le runtime compilé.")
+    if tfidf.stop_words is not None:
+        raise ValueError("Les stop words ne sont pas supportés par le runtime compilé.")
+
+    return {
+        'lowercase': bool(tfidf.lowercase),
+        'strip_accents': tfidf.strip_accents,
+        'token_pattern': tfidf.token_pattern,
+        'ngram_range': list(tfidf.ngram_range),
+        'sublinear_tf': bool(tfidf.sublinear_tf),
+        'binary': bool(tfidf.binary),
+        'norm': tfidf.norm,
+    }
+
+
+def prune_terms(coef_terms: np.ndarray, threshold: float) -> np.ndarray:
+    """
+    Indices des termes conservés : poids absolu maximal (toutes classes) >= threshold.
+
+    Args:
+        coef_terms: Coefficients des termes (n_terms x n_classes)
+        threshold: Seuil de poids (0 = tout conserver)
+    """
+    if threshold <= 0 or coef_terms.shape[0] == 0:
+        return np.arange(coef_terms.shape[0])
+    return np.flatnonzero(np.abs(coef_terms).max(axis=1) >= threshold)
+
+
+def compile_linear_stage(pipeline: dict, prune_threshold: float = 0.0,
+                         precision: str = DEFAULT_PRECISION) -> dict:
+    """
+    Convertit un pipeline linéaire en tableaux NumPy.
+
+    Les termes élagués disparaissent du vocabulaire : la norme L2 du vecteur
+    TF-IDF est alors calculée sur les termes restants, d'où un léger écart
+    possible avec sklearn (à mesurer avec accuracy_report).
+
+    Args:
+        pipeline: Pipeline chargé (model avec coef_/intercept_, tfidf, encoder)
+        prune_threshold: Seuil d'élagage du vocabulaire (0 = aucun élagage)
+        precision: 'float64', 'float32' ou 'float16' pour les coefficients
+
+    Returns:
+        Dict nom -> tableau, prêt pour np.savez
+
+    Raises:
+        ValueError: Si le modèle n'est pas linéaire ou si les dimensions ne concordent pas
+    """
+    model = pipeline['model']
+    tfidf = pipeline['tfidf']
+    if not hasattr(model, 'coef_'):
+        raise ValueError(f"Modèle non linéaire : {type(model).__name__}")
+
+    num_cols = list(pipeline.get('numeric_columns', ['nb_mots']))
+    cat_cols = list(pipeline.get('categorical_pred_columns', [])) if pipeline.get('encoder') else []
+    categories = pipeline['encoder'].categories_ if cat_cols else []
+
+    terms = sorted(tfidf.vocabulary_, key=tfidf.vocabulary_.get)
+    coef = np.asarray(model.coef_, dtype=np.float64)
+    n_expected = len(terms) + len(num_cols) + sum(len(c) for c in categories)
+    if coef.shape[1] != n_expected:
+        raise ValueError(f"Dimensions incohérentes : coef {coef.shape[1]} != features {n_expected}")
+
+    if precision not in PRECISIONS:
+        raise ValueError(f"Précision inconnue : {precision} (choix : {', '.join(PRECISIONS)})")
+    dtype = PRECISIONS[precision]
+
+    coef_t = coef.T
+    idf = np.asarray(getattr(tfidf, 'idf_', np.empty(0)), dtype=np.float64)
+    tfidf_id = pipeline.get('tfidf_id') or tfidf_fingerprint(tfidf)
+
+    keep = prune_terms(coef_t[:len(terms)], prune_threshold)
+    if keep.size < len(terms):
+        coef_t = np.vstack([coef_t[keep], coef_t[len(terms):]])
+        idf = idf[keep] if idf.size else idf
+        terms = [terms[i] for i in keep]
+        # Vocabulaire propre à l'étape : ne pas partager le vecteur TF-IDF
+        tfidf_id = f"{tfidf_id}-{hashlib.sha256(keep.tobytes()).hexdigest()[:8]}"
+
+    meta = tfidf_meta(tfidf)
+    meta.update({
+        'numeric_columns': num_cols,
+        'categorical_columns': cat_cols,
+        'tfidf_id': tfidf_id,
+        'model': type(model).__name__,
+        'precision': precision,
+        'prune_threshold': prune_threshold,
+        'n_terms_original': len(tfidf.vocabulary_),
+    })
+
+    arrays = {
+        'meta': np.array(json.dumps(meta, ensure_ascii=False)),
+        'vocab_terms': np.array(terms, dtype=str),
+        # idf en float32 au minimum (float16 trop imprécis pour la norme L2)
+        'idf': idf.astype(np.float64 if dtype == np.float64 else np.float32),
+        'coef_t': np.ascontiguousarray(coef_t, dtype=dtype),
+        'intercept': np.asarray(model.intercept_, dtype=np.float64),
+        'classes': np.array([str(c) for c in model.classes_], dtype=str),
+    }
+    for i, values in enumerate(categories):
+        arrays[f'cat_values_{i}'] = np.array([str(v) for v in values], dtype=str)
+    return arrays
+
+
+def save_mmap_stage(arrays: dict, dirpath: str) -> int:
+    """
+    Écrit une étape compilée au format mmap : meta.json + un .npy par tableau.
+
+    Le vocabulaire est remplacé par sa version triée (octets UTF-8) et la
+    colonne de chaque terme, interrogeables sans construire de dictionnaire.
+
+    Returns:
+        Taille totale écrite (octets)
+    """
+    os.makedirs(dirpath, exist_ok=True)
+    arrays = dict(arrays)
+
+    meta = json.loads(str(arrays.pop('meta')))
+    with open(os.path.join(dirpath, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+
+    arrays.update(sorted_vocabulary(arrays.pop('vocab_terms').tolist()))
+    return _save_npy_arrays(arrays, dirpath)
+
+
+def sorted_vocabulary(terms: list) -> dict:
+    """Vocabulaire trié (octets UTF-8) et colonne d'origine de chaque terme."""
+    encoded = [str(t).encode('utf-8') for t in terms]
+    order = sorted(range(len(encoded)), key=encoded.__getitem__)
+    return {
+        'vocab_sorted': np.array([encoded[i] for i in order], dtype=bytes),
+        'vocab_cols': np.array(order, dtype=np.int32),
+    }
+
+
+def _save_npy_arrays(arrays: dict, dirpath: str) -> int:
+    total = 0
+    for key, value in arrays.items():
+        filepath = os.path.join(dirpath, f"{key}.npy")
+        np.save(filepath, np.ascontiguousarray(value), allow_pickle=False)
+        total += os.path.getsize(filepath)
+    return total
+
+
+def export_vocabularies(models_dir: str = MODELS_DIR) -> list:
+    """
+    Exporte le vocabulaire TF-IDF de chaque étape (temps compris) au format
+    mmap : models/vocab_<tfidf_id>/ (un seul répertoire par vectoriseur).
+
+    Returns:
+        Liste des répertoires écrits
+    """
+    written = []
+    for name in PIPELINE_FILES:
+        pipeline = load_pipeline(name)
+        tfidf = pipeline['tfidf']
+        dirpath = vocab_dir(models_dir, pipeline['tfidf_id'])
+        if dirpath in written:
+            continue
+        meta = tfidf_meta(tfidf)
+        meta['tfidf_id'] = pipeline['tfidf_id']
+        os.makedirs(dirpath, exist_ok=True)
+        with open(os.path.join(dirpath, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2, ensure_ascii=False)
+        terms = sorted(tfidf.vocabulary_, key=tfidf.vocabulary_.get)
+        arrays = sorted_vocabulary(terms)
+        arrays['idf'] = np.asarray(getattr(tfidf, 'idf_', np.empty(0)), dtype=np.float64)
+        size = _save_npy_arrays(arrays, dirpath)
+        print(f"✅ vocab     → {dirpath} ({size / 1024:.0f} Ko, {len(terms)} termes)")
+        written.append(dirpath)
+    return written
+
+
+def export_linear_stages(models_dir: str = MODELS_DIR, fmt: str = 'npz',
+                         prune_threshold: float = 0.0,
+                         precision: str = DEFAULT_PRECISION) -> list:
+    """
+    Exporte les étapes urgence, catégorie et type dans models_dir.
+
+    Args:
+        models_dir: Répertoire de sortie
+        fmt: 'npz' (un fichier par étape) ou 'mmap' (un répertoire .npy par étape)
+        prune_threshold: Seuil d'élagage du vocabulaire (0 = aucun élagage)
+        precision: Précision des coefficients ('float64', 'float32', 'float16')
+
+    Returns:
+        Liste des fichiers / répertoires écrits
+    """
+    written = []
+    for name, _ in LINEAR_STAGES:
+        arrays = compile_linear_stage(load_pipeline(name), prune_threshold, precision)
+        if fmt == 'mmap':
+            target = compiled_dir(models_dir, name)
+            size = save_mmap_stage(arrays, target)
+        else:
+            target = compiled_path(models_dir, name)
+            np.savez(target, **arrays)
+            size = os.path.getsize(target)
+        meta = json.loads(str(arrays['meta']))
+        print(f"✅ {name:<9} → {target} ({size / 1024:.0f} Ko, {arrays['coef_t'].shape[0]} features, "
+              f"{len(arrays['vocab_terms'])}/{meta['n_terms_original']} termes, {precision})")
+        written.append(target)
+    if fmt == 'mmap':
+        written.extend(export_vocabularies(models_dir))
+    return written
+
+
+# =============================================================================
+# CONTRÔLE DE PARITÉ
+# =============================================================================
+
+def check_parity(models_dir: str = MODELS_DIR, data_path: str = CHECK_DATA,
+                 mmap: bool = None) -> dict:
+    """
+    Compare les prédictions du runtime compilé à celles de sklearn.
+
+    Returns:
+        Dict colonne -> taux d'accord (0..1)
+    """
+    df = pd.read_csv(data_path)
+    records = df[['titre', 'texte']].fillna('').to_dict(orient='records')
+
+    reference = predict_tickets(records, validate=False)
+    chain = CompiledLinearChain.from_dir(models_dir, mmap=mmap)
+    compiled = [chain.predict(r['titre'], r['texte']) for r in records]
+
+    agreement = {}
+    print(f"\n📊 Parité runtime compilé vs sklearn ({len(records)} tickets) :")
+    for _, column in LINEAR_STAGES:
+        same = sum(1 for i, c in enumerate(compiled) if c[column] == reference[column][i])
+        agreement[column] = same / len(records) if records else 1.0
+        print(f"   {column:<17}: {agreement[column]*100:.2f}%")
+    return agreement
+
+
+def accuracy_report(models_dir: str = MODELS_DIR, data_path: str = CHECK_DATA,
+                    mmap: bool = None) -> dict:
+    """
+    Exactitude du runtime compilé (élagué / précision réduite) et de sklearn
+    sur les étiquettes réelles du jeu de test.
+
+    Returns:
+        Dict colonne -> {'sklearn', 'compiled', 'delta'} (exactitudes 0..1)
+    """
+    df = pd.read_csv(data_path)
+    records = df[['titre', 'texte']].fillna('').to_dict(orient='records')
+
+    reference = predict_tickets(records, validate=False)
+    chain = CompiledLinearChain.from_dir(models_dir, mmap=mmap)
+    compiled = [chain.predict(r['titre'], r['texte']) for r in records]
+
+    report = {}
+    print(f"\n🎯 Exactitude sur {os.path.basename(data_path)} ({len(records)} tickets) :")
+    for _, column in LINEAR_STAGES:
+        truth = df[TRUE_COLUMNS[column]].astype(str).tolist()
+        n = len(truth) or 1
+        acc_ref = sum(str(p) == t for p, t in zip(reference[column], truth)) / n
+        acc_cmp = sum(c[column] == t for c, t in zip(compiled, truth)) / n
+        report[column] = {'sklearn': acc_ref, 'compiled': acc_cmp, 'delta': acc_cmp - acc_ref}
+        print(f"   {column:<17}: sklearn {acc_ref*100:.2f}% | compilé {acc_cmp*100:.2f}% "
+              f"| écart {(acc_cmp - acc_ref)*100:+.2f} pts")
+    return report
+
+
+# =============================================================================
+# POINT D'ENTRÉE
+# =============================================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export des étapes linéaires en .npz")
+    parser.add_argument('--models-dir', default=MODELS_DIR)
+    parser.add_argument('--format', choices=['npz', 'mmap'], default='npz',
+                        help="npz (compact) ou mmap (tableaux .npy partagés entre processus)")
+    parser.add_argument('--check', action='store_true',
+                        help="Vérifier la parité avec sklearn sur data/test.csv")
+    parser.add_argument('--prune-threshold', type=float, default=0.0,
+                        help="Retirer les termes dont le poids absolu maximal est sous ce seuil")
+    parser.add_argument('--precision', choices=list(PRECISIONS), default=DEFAULT_PRECISION,
+                        help=f"Précision des coefficients (défaut: {DEFAULT_PRECISION})")
+    parser.add_argument('--accuracy', action='store_true',
+                        help="Comparer l'exactitude compilé / sklearn sur data/test.csv")
+    args = parser.parse_args()
+
+    export_linear_stages(args.models_dir, args.format, args.prune_threshold, args.precision)
+    if args.check:
+        check_parity(args.models_dir, mmap=(args.format == 'mmap'))
+    if args.accuracy:
+        accuracy_report(args.models_dir, mmap=(args.format == 'mmap'))
@@ -0,0 +1,181 @@
+# =============================================================================
+# Export ONNX des 4 Étapes de la Chaîne
+# =============================================================================
+"""
+Convertit le modèle de chaque pipeline (urgence, catégorie, type, temps) en
+graphe ONNX servi par onnxruntime (voir onnx_runtime.py).
+
+    - LogisticRegression, GradientBoostingRegressor : skl2onnx
+    - XGBRegressor : onnxmltools (entrées absentes de la matrice creuse
+      traitées comme valeurs manquantes, comme à l'entraînement)
+
+Le graphe prend en entrée la matrice de features de l'étape (TF-IDF +
+nb_mots + OneHot), construite par predict_pipeline. Le TfidfVectorizer n'est
+pas converti : son strip_accents='unicode' n'a pas d'équivalent dans les
+convertisseurs ONNX. Le backend ONNX dépend donc toujours de scikit-learn
+pour la vectorisation.
+
+Chaque export est suivi d'un contrôle de parité avec sklearn sur
+data/test.csv : le script échoue (code de sortie 1) si une étiquette
+prédite diffère ou si l'écart sur le temps dépasse TIME_TOLERANCE.
+
+Usage :
+    pip install -r requirements-onnx.txt
+    python src/ml/export_onnx.py                # export + parité sur data/test.csv
+    python src/ml/export_onnx.py --skip-check   # export seul
+"""
+
+import os
+import sys
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+
+import predict_pipeline
+from predict_pipeline import (MODELS_DIR, PROJECT_ROOT, PIPELINE_FILES,
+                              load_pipeline, predict_tickets, set_backend)
+from onnx_runtime import onnx_path, MISSING_AS_NAN_KEY
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+# Jeu de données utilisé pour le contrôle de parité
+CHECK_DATA = os.path.join(PROJECT_ROOT, "data", "test.csv")
+
+# Version de l'opset ONNX visée
+TARGET_OPSET = 15
+
+# Écart absolu toléré sur le temps de résolution (heures, entrée float32)
+TIME_TOLERANCE = 0.01
+
+CLASSIFICATION_COLUMNS = ['urgence_pred', 'categorie_pred', 'type_ticket_pred']
+
+
+# =============================================================================
+# CONVERSION
+# =============================================================================
+
+def _n_features(model) -> int:
+    n_features = getattr(model, 'n_features_in_', None)
+    if n_features is None:
+        raise ValueError(f"Nombre de features inconnu pour {type(model).__name__}")
+    return int(n_features)
+
+
+def convert_model(model):
+    """
+    Convertit un modèle entraîné en ModelProto ONNX.
+
+    Args:
+        model: LogisticRegression, XGBRegressor ou GradientBoostingRegressor
+
+    Returns:
+        ModelProto (entrée 'input' float32 [N, n_features])
+    """
+    n_features = _n_features(model)
+
+    if hasattr(model, 'get_booster'):
+        from onnxmltools import convert_xgboost
+        from onnxmltools.convert.common.data_types import FloatTensorType as XgbFloatTensorType
+
+        onx = convert_xgboost(model, initial_types=[('input', XgbFloatTensorType([None, n_features]))],
+                              target_opset=TARGET_OPSET)
+        entry = onx.metadata_props.add()
+        entry.key, entry.value = MISSING_AS_NAN_KEY, '1'
+        return onx
+
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+
+    options = {id(model): {'zipmap': False}} if hasattr(model, 'classes_') else None
+    return convert_sklearn(model, initial_types=[('input', FloatTensorType([None, n_features]))],
+                           options=options, target_opset=TARGET_OPSET)
+
+
+def export_onnx_stages(models_dir: str = MODELS_DIR) -> list:
+    """
+    Exporte le modèle des 4 étapes à côté de leur pipeline .pkl.
+
+    Returns:
+        Liste des fichiers .onnx écrits
+    """
+    written = []
+    for name, filename in PIPELINE_FILES.items():
+        model = load_pipeline(name)['model']
+        onx = convert_model(model)
+
+        target = onnx_path(os.path.join(models_dir, filename))
+        with open(target, 'wb') as f:
+            f.write(onx.SerializeToString())
+        print(f"✅ {name:<9} → {target} ({os.path.getsize(target) / 1024:.0f} Ko, "
+              f"{type(model).__name__})")
+        written.append(target)
+    return written
+
+
+# =============================================================================
+# CONTRÔLE DE PARITÉ
+# =============================================================================
+
+def check_parity(data_path: str = CHECK_DATA) -> dict:
+    """
+    Compare les prédictions du backend ONNX à celles de sklearn.
+
+    Returns:
+        Dict colonne -> taux d'accord (0..1) pour les classifieurs,
+        'temps_resolution_max_abs' (écart maximal en heures) et
+        'ok' (True si toutes les étiquettes sont identiques et l'écart
+        sur le temps dans TIME_TOLERANCE)
+    """
+    df = pd.read_csv(data_path)
+    records = df[['titre', 'texte']].fillna('').to_dict(orient='records')
+
+    previous = predict_pipeline.INFERENCE_BACKEND
+    try:
+        set_backend('sklearn')
+        reference = predict_tickets(records, validate=False)
+        set_backend('onnx')
+        candidate = predict_tickets(records, validate=False)
+    finally:
+        set_backend(previous)
+
+    n = len(records) or 1
+    report = {}
+    print(f"\n📊 Parité ONNX vs sklearn ({len(records)} tickets) :")
+    for column in CLASSIFICATION_COLUMNS:
+        same = sum(a == b for a, b in zip(reference[column], candidate[column]))
+        report[column] = same / n
+        print(f"   {column:<22}: {report[column]*100:.2f}%")
+
+    diffs = np.abs(np.array(reference['temps_resolution_pred'], dtype=float)
+                   - np.array(candidate['temps_resolution_pred'], dtype=float))
+    report['temps_resolution_max_abs'] = float(diffs.max()) if diffs.size else 0.0
+    status = "✅" if report['temps_resolution_max_abs'] <= TIME_TOLERANCE else "⚠️"
+    print(f"   {'temps_resolution_pred':<22}: écart max {report['temps_resolution_max_abs']:.4f} h {status}")
+
+    report['ok'] = (all(report[column] == 1.0 for column in CLASSIFICATION_COLUMNS)
+                    and report['temps_resolution_max_abs'] <= TIME_TOLERANCE)
+    return report
+
+
+# =============================================================================
+# POINT D'ENTRÉE
+# =============================================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export ONNX des 4 étapes de la chaîne")
+    parser.add_argument('--models-dir', default=MODELS_DIR)
+    parser.add_argument('--data', default=CHECK_DATA,
+                        help="Jeu de données du contrôle de parité")
+    parser.add_argument('--skip-check', action='store_true',
+                        help="Ne pas vérifier la parité avec sklearn")
+    args = parser.parse_args()
+
+    export_onnx_stages(args.models_dir)
+    if not args.skip_check and not check_parity(args.data)['ok']:
+        print("\n❌ Les prédictions ONNX diffèrent de sklearn : "
+              "ne pas activer INFERENCE_BACKEND=onnx")
+        sys.exit(1)
@@ -0,0 +1,238 @@
+# =============================================================================
+# Instrumentation - Latence par étape de la chaîne d'inférence
+# =============================================================================
+"""
+Mesure du temps passé dans chaque étape de predict_pipeline.
+
+Chaque section chronométrée (ex: 'urgency.tfidf', 'category.predict')
+alimente un histogramme : compteur, somme, buckets cumulés (format
+Prometheus) et une fenêtre glissante des dernières mesures pour les
+percentiles p50/p95/p99.
+
+Désactivé par défaut : timed() retourne alors un contexte vide partagé et
+le coût se limite à un appel de fonction. Activation :
+    PIPELINE_METRICS=1          (variable d'environnement)
+    latency_metrics.enable()    (depuis Python)
+
+Export :
+    latency_metrics.to_json()
+    latency_metrics.to_prometheus()
+"""
+
+import os
+import json
+import math
+import time
+import threading
+from bisect import bisect_left
+from collections import deque
+from typing import Dict, Any
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+# Bornes supérieures des buckets (millisecondes)
+BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Nombre de mesures conservées par section pour le calcul des percentiles
+WINDOW_SIZE = 2048
+
+# Préfixe des métriques Prometheus
+METRIC_PREFIX = "ticket_pipeline"
+
+_enabled = os.getenv("PIPELINE_METRICS", "0") == "1"
+_lock = threading.Lock()
+_histograms: Dict[str, 'Histogram'] = {}
+_counters: Dict[str, float] = {}
+
+
+# =============================================================================
+# HISTOGRAMME
+# =============================================================================
+
+class Histogram:
+    """Histogramme de durées (ms) avec fenêtre glissante pour les percentiles."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.bucket_counts = [0] * (len(BUCKETS_MS) + 1)
+        self.window = deque(maxlen=WINDOW_SIZE)
+        self._lock = threading.Lock()
+
+    def observe(self, duration_ms: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.total_ms += duration_ms
+            if duration_ms > self.max_ms:
+                self.max_ms = duration_ms
+            self.bucket_counts[bisect_left(BUCKETS_MS, duration_ms)] += 1
+            self.window.append(duration_ms)
+
+    def percentile(self, q: float) -> float:
+        """Percentile q (0..100) sur la fenêtre glissante (méthode du rang le plus proche)."""
+        with self._lock:
+            values = sorted(self.window)
+        if not values:
+            return 0.0
+        rank = max(0, min(len(values) - 1, math.ceil(q / 100.0 * len(values)) - 1))
+        return values[rank]
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'sum_ms': round(self.total_ms, 4),
+            'mean_ms': round(self.total_ms / self.count, 4) if self.count else 0.0,
+            'p50_ms': round(self.percentile(50), 4),
+            'p95_ms': round(self.percentile(95), 4),
+            'p99_ms': round(self.percentile(99), 4),
+            'max_ms': round(self.max_ms, 4),
+        }
+
+
+# =============================================================================
+# API D'INSTRUMENTATION
+# =============================================================================
+
+class _NullTimer:
+    """Contexte vide utilisé quand l'instrumentation est désactivée."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, (time.perf_counter() - self.start) * 1000.0)
+        return False
+
+
+def enable() -> None:
+    """Active l'instrumentation."""
+    global _enabled
+    _enabled = True
+
+
+def disable() -> None:
+    """Désactive l'instrumentation (les mesures déjà collectées sont conservées)."""
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def timed(name: str):
+    """
+    Contexte chronométrant une section.
+
+    Usage :
+        with timed('urgency.predict'):
+            model.predict(X)
+    """
+    if not _enabled:
+        return _NULL_TIMER
+    return _Timer(name)
+
+
+def observe(name: str, duration_ms: float) -> None:
+    """Enregistre une durée (ms) dans l'histogramme name."""
+    hist = _histograms.get(name)
+    if hist is None:
+        with _lock:
+            hist = _histograms.setdefault(name, Histogram())
+    hist.observe(duration_ms)
+
+
+def increment(name: str, value: float = 1) -> None:
+    """Incrémente un compteur (ignoré si l'instrumentation est désactivée)."""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def reset() -> None:
+    """Efface toutes les mesures."""
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+# =============================================================================
+# EXPORT
+# =============================================================================
+
+def snapshot() -> Dict[str, Any]:
+    """Résumé de toutes les sections (p50/p95/p99, compteurs)."""
+    with _lock:
+        histograms = dict(_histograms)
+        counters = dict(_counters)
+    return {
+        'enabled': _enabled,
+        'sections': {name: histograms[name].summary() for name in sorted(histograms)},
+        'counters': counters,
+    }
+
+
+def to_json(indent: int = 2) -> str:
+    """Export JSON du résumé."""
+    return json.dumps(snapshot(), indent=indent, ensure_ascii=False)
+
+
+def _label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def to_prometheus() -> str:
+    """Export au format texte Prometheus (histogrammes en secondes + compteurs)."""
+    with _lock:
+        histograms = dict(_histograms)
+        counters = dict(_counters)
+
+    name = f"{METRIC_PREFIX}_section_duration_seconds"
+    lines = [
+        f"# HELP {name} Durée des sections de la chaîne d'inférence.",
+        f"# TYPE {name} histogram",
+    ]
+    for section in sorted(histograms):
+        hist = histograms[section]
+        with hist._lock:
+            bucket_counts = list(hist.bucket_counts)
+            count, total_ms = hist.count, hist.total_ms
+        label = f'section="{_label(section)}"'
+        cumulative = 0
+        for bound, n in zip(BUCKETS_MS, bucket_counts):
+            cumulative += n
+            lines.append(f'{name}_bucket{{{label},le="{bound / 1000.0:g}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{label},le="+Inf"}} {count}')
+        lines.append(f'{name}_sum{{{label}}} {total_ms / 1000.0:.9f}')
+        lines.append(f'{name}_count{{{label}}} {count}')
+
+    if counters:
+        cname = f"{METRIC_PREFIX}_events_total"
+        lines.append(f"# HELP {cname} Compteurs de la chaîne d'inférence.")
+        lines.append(f"# TYPE {cname} counter")
+        for counter in sorted(counters):
+            lines.append(f'{cname}{{event="{_label(counter)}"}} {counters[counter]:g}')
+
+    return "\n".join(lines) + "\n"
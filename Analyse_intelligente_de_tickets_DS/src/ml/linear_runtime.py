@@ -0,0 +1,474 @@
+# =============================================================================
+# Runtime Linéaire Compilé - Inférence NumPy pure
+# =============================================================================
+"""
+Runtime léger pour les étapes linéaires de la chaîne (urgence, catégorie, type).
+
+Chaque étape est exportée par export_linear.py dans un fichier .npz contenant :
+    - vocab_terms  : termes du vocabulaire TF-IDF (index = colonne)
+    - idf          : vecteur idf
+    - coef_t       : coefficients transposés (n_features x n_classes,
+                     float32 par défaut, voir export_linear.py --precision)
+    - intercept    : intercepts (n_classes)
+    - classes      : libellés des classes
+    - cat_values_i : modalités OneHot de chaque prédiction upstream
+    - meta         : paramètres de tokenisation (JSON)
+
+Format mmap (export_linear.py --format mmap) : un répertoire
+models/<étape>_linear/ contenant meta.json et un fichier .npy non compressé
+par tableau. Les tableaux sont ouverts avec np.load(mmap_mode='r') : plusieurs
+processus d'une même machine partagent les mêmes pages (cache du noyau) au lieu
+d'en garder chacun une copie. Le vocabulaire y est stocké trié (vocab_sorted,
+octets UTF-8) avec sa colonne (vocab_cols) et interrogé par recherche
+dichotomique, sans reconstruire de dictionnaire par processus.
+
+Vocabulaire partagé (export_linear.py --format mmap) : models/vocab_<tfidf_id>/
+contient le vocabulaire trié, la colonne de chaque terme, l'idf et les
+paramètres de tokenisation d'un vectoriseur, pour les 4 étapes (temps compris).
+Avec MODEL_MMAP=1, predict_pipeline y remplace le TfidfVectorizer de chaque
+pipeline par MmapTfidf : le dictionnaire vocabulary_ (l'essentiel de la
+mémoire d'un pipeline) n'est plus gardé par chaque processus.
+
+L'inférence reproduit TfidfVectorizer (accents, minuscules, n-grammes,
+tf sous-linéaire, idf, norme L2) puis fait un seul produit creux et un argmax,
+sans importer sklearn, pandas ni scipy.
+
+Usage :
+    chain = CompiledLinearChain.from_dir("models")
+    chain.predict("Panne wifi", "Plus de connexion depuis ce matin")
+"""
+
+import os
+import re
+import json
+import math
+import unicodedata
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+# Suffixe des fichiers compilés (ex: models/urgency_linear.npz)
+COMPILED_SUFFIX = "_linear.npz"
+
+# Suffixe des répertoires compilés au format mmap (ex: models/urgency_linear/)
+COMPILED_DIR_SUFFIX = "_linear"
+
+# Étapes linéaires dans l'ordre de la chaîne, et colonne produite par chacune
+LINEAR_STAGES = [
+    ('urgency', 'urgence_pred'),
+    ('category', 'categorie_pred'),
+    ('type', 'type_ticket_pred'),
+]
+
+
+def compiled_path(models_dir: str, model_name: str) -> str:
+    """Chemin du fichier compilé d'une étape."""
+    return os.path.join(models_dir, f"{model_name}{COMPILED_SUFFIX}")
+
+
+def compiled_dir(models_dir: str, model_name: str) -> str:
+    """Répertoire compilé (format mmap) d'une étape."""
+    return os.path.join(models_dir, f"{model_name}{COMPILED_DIR_SUFFIX}")
+
+
+def vocab_dir(models_dir: str, tfidf_id: str) -> str:
+    """Répertoire du vocabulaire partagé (format mmap) d'un vectoriseur."""
+    return os.path.join(models_dir, f"vocab_{tfidf_id}")
+
+
+def load_mmap_arrays(dirpath: str) -> tuple:
+    """Ouvre meta.json et les .npy d'un répertoire en mmap (lecture seule)."""
+    with open(os.path.join(dirpath, 'meta.json'), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    arrays = {}
+    for filename in os.listdir(dirpath):
+        if filename.endswith('.npy'):
+            arrays[filename[:-4]] = np.load(
+                os.path.join(dirpath, filename), mmap_mode='r', allow_pickle=False
+            )
+    return arrays, meta
+
+
+# =============================================================================
+# TOKENISATION (équivalente à TfidfVectorizer)
+# =============================================================================
+
+def strip_accents_unicode(text: str) -> str:
+    """Supprime les accents (décomposition NFKD), comme strip_accents='unicode'."""
+    nfkd = unicodedata.normalize('NFKD', text)
+    if nfkd == text:
+        return text
+    return ''.join(c for c in nfkd if not unicodedata.combining(c))
+
+
+def strip_accents_ascii(text: str) -> str:
+    """Supprime les accents et tout caractère non ASCII, comme strip_accents='ascii'."""
+    return unicodedata.normalize('NFKD', text).encode('ASCII', 'ignore').decode('ASCII')
+
+
+class TextAnalyzer:
+    """
+    Découpe un texte en n-grammes de mots, avec les mêmes règles que
+    l'analyseur 'word' de TfidfVectorizer.
+    """
+
+    def __init__(self, meta: dict):
+        self.lowercase = meta.get('lowercase', True)
+        accents = meta.get('strip_accents')
+        if accents == 'unicode':
+            self.strip_accents = strip_accents_unicode
+        elif accents == 'ascii':
+            self.strip_accents = strip_accents_ascii
+        else:
+            self.strip_accents = None
+        self.token_re = re.compile(meta.get('token_pattern') or r"(?u)\b\w\w+\b")
+        self.min_n, self.max_n = meta.get('ngram_range', (1, 1))
+
+    def __call__(self, text: str) -> List[str]:
+        if self.lowercase:
+            text = text.lower()
+        if self.strip_accents is not None:
+            text = self.strip_accents(text)
+        tokens = self.token_re.findall(text)
+
+        if self.max_n == 1:
+            return tokens
+
+        ngrams = list(tokens) if self.min_n == 1 else []
+        n_tokens = len(tokens)
+        for n in range(max(self.min_n, 2), min(self.max_n, n_tokens) + 1):
+            for i in range(n_tokens - n + 1):
+                ngrams.append(' '.join(tokens[i:i + n]))
+        return ngrams
+
+
+# =============================================================================
+# VOCABULAIRE TF-IDF
+# =============================================================================
+
+class TfidfVocabulary:
+    """
+    Vocabulaire + idf d'un vectoriseur : calcule le vecteur TF-IDF creux d'un
+    texte. Le vocabulaire est un dict (vocab_terms) ou, au format mmap, un
+    tableau trié d'octets UTF-8 (vocab_sorted + vocab_cols) interrogé par
+    recherche dichotomique.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: dict):
+        self.analyzer = TextAnalyzer(meta)
+        self.sublinear_tf = meta.get('sublinear_tf', False)
+        self.binary = meta.get('binary', False)
+        self.norm = meta.get('norm', 'l2')
+
+        if 'vocab_sorted' in arrays:
+            # Vocabulaire trié (mmap) : recherche dichotomique, pas de dict
+            self.vocabulary = None
+            self.vocab_sorted = arrays['vocab_sorted']
+            self.vocab_cols = arrays['vocab_cols']
+            self.n_terms = len(self.vocab_sorted)
+        else:
+            terms = arrays['vocab_terms']
+            self.vocabulary = {str(t): i for i, t in enumerate(terms.tolist())}
+            self.n_terms = len(terms)
+        self.idf = arrays['idf'] if arrays['idf'].size else None
+
+    def _term_counts(self, text: str):
+        """Compte les termes du vocabulaire présents dans le texte (colonne -> nombre)."""
+        terms = self.analyzer(text)
+
+        if self.vocabulary is not None:
+            counts = {}
+            vocabulary = self.vocabulary
+            for term in terms:
+                j = vocabulary.get(term)
+                if j is not None:
+                    counts[j] = counts.get(j, 0) + 1
+            if not counts:
+                return None, None
+            cols = np.fromiter(counts.keys(), dtype=np.intp, count=len(counts))
+            vals = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+            return cols, vals
+
+        # Recherche dichotomique dans le vocabulaire trié (octets UTF-8)
+        width = self.vocab_sorted.dtype.itemsize
+        encoded = [t.encode('utf-8') for t in terms]
+        encoded = [t for t in encoded if len(t) <= width]
+        if not encoded:
+            return None, None
+        keys = np.array(encoded, dtype=self.vocab_sorted.dtype)
+        pos = np.searchsorted(self.vocab_sorted, keys)
+        pos[pos >= self.n_terms] = 0
+        found = self.vocab_sorted[pos] == keys
+        if not found.any():
+            return None, None
+        cols, vals = np.unique(self.vocab_cols[pos[found]], return_counts=True)
+        return cols.astype(np.intp), vals.astype(np.float64)
+
+    def text_vector(self, text: str):
+        """
+        Calcule le vecteur TF-IDF creux d'un texte.
+
+        Returns:
+            Tuple (indices de colonnes, valeurs)
+        """
+        cols, vals = self._term_counts(text)
+        if cols is None:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float64)
+
+        if self.binary:
+            vals[:] = 1.0
+        elif self.sublinear_tf:
+            vals = np.log(vals) + 1.0
+        if self.idf is not None:
+            vals *= self.idf[cols]
+        if self.norm == 'l2':
+            vals /= math.sqrt(float(vals @ vals))
+        elif self.norm == 'l1':
+            vals /= float(np.abs(vals).sum())
+        return cols, vals
+
+
+# =============================================================================
+# ÉTAPE LINÉAIRE COMPILÉE
+# =============================================================================
+
+class CompiledLinearStage:
+    """
+    Étape linéaire (TF-IDF + nb_mots + OneHot upstream -> argmax) chargée
+    depuis un fichier .npz ou un répertoire mmap.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: Optional[dict] = None):
+        if meta is None:
+            meta = json.loads(str(arrays['meta']))
+        self.meta = meta
+        self.vocab = TfidfVocabulary(arrays, meta)
+        self.n_terms = self.vocab.n_terms
+        self.coef_t = arrays['coef_t']
+        self.intercept = arrays['intercept']
+        self.classes = [str(c) for c in arrays['classes'].tolist()]
+
+        self.num_columns = meta.get('numeric_columns', [])
+        self.cat_columns = meta.get('categorical_columns', [])
+
+        # Index de colonne de chaque modalité OneHot : {colonne: {valeur: index}}
+        offset = self.n_terms + len(self.num_columns)
+        self.cat_index = {}
+        for i, col in enumerate(self.cat_columns):
+            values = [str(v) for v in arrays[f'cat_values_{i}'].tolist()]
+            self.cat_index[col] = {v: offset + j for j, v in enumerate(values)}
+            offset += len(values)
+
+    @classmethod
+    def load(cls, filepath: str) -> 'CompiledLinearStage':
+        """
+        Charge une étape compilée.
+
+        Args:
+            filepath: Chemin du fichier .npz
+
+        Returns:
+            Étape prête pour l'inférence
+        """
+        with np.load(filepath, allow_pickle=False) as data:
+            arrays = {k: data[k] for k in data.files}
+        return cls(arrays)
+
+    @classmethod
+    def load_mmap(cls, dirpath: str) -> 'CompiledLinearStage':
+        """
+        Charge une étape compilée au format mmap (tableaux partagés entre processus).
+
+        Args:
+            dirpath: Répertoire models/<étape>_linear/
+
+        Returns:
+            Étape prête pour l'inférence
+        """
+        arrays, meta = load_mmap_arrays(dirpath)
+        return cls(arrays, meta)
+
+    def text_vector(self, text: str):
+        """Vecteur TF-IDF creux d'un texte : (indices de colonnes, valeurs)."""
+        return self.vocab.text_vector(text)
+
+    def decision(self, text: str, numeric: Sequence[float] = (),
+                 categorical: Optional[Dict[str, str]] = None,
+                 text_vector=None) -> np.ndarray:
+        """
+        Scores de décision (un par classe, ou un seul pour un modèle binaire).
+
+        Args:
+            text: Texte complet du ticket (text_full)
+            numeric: Valeurs des colonnes numériques (ex: [nb_mots])
+            categorical: Prédictions upstream {colonne: valeur}
+            text_vector: Vecteur TF-IDF précalculé (cols, vals), optionnel
+        """
+        cols, vals = text_vector if text_vector is not None else self.text_vector(text)
+        scores = vals @ self.coef_t[cols] + self.intercept
+
+        for k, value in enumerate(numeric):
+            # Coefficients éventuellement en float16 : produit en float64
+            scores = scores + float(value) * self.coef_t[self.n_terms + k].astype(np.float64)
+
+        if categorical:
+            for col, index in self.cat_index.items():
+                j = index.get(str(categorical.get(col)))
+                if j is not None:
+                    scores = scores + self.coef_t[j]
+        return scores
+
+    def predict(self, text: str, numeric: Sequence[float] = (),
+                categorical: Optional[Dict[str, str]] = None,
+                text_vector=None) -> str:
+        """Retourne la classe prédite (argmax des scores de décision)."""
+        scores = self.decision(text, numeric, categorical, text_vector)
+        if scores.shape[0] == 1:
+            return self.classes[int(scores[0] > 0)]
+        return self.classes[int(np.argmax(scores))]
+
+
+# =============================================================================
+# VECTORISEUR PARTAGÉ (remplaçant de TfidfVectorizer dans les pipelines)
+# =============================================================================
+
+class MmapTfidf:
+    """
+    Remplaçant de TfidfVectorizer.transform adossé au vocabulaire partagé
+    models/vocab_<tfidf_id>/ (tableaux ouverts en mmap).
+
+    Produit la même matrice creuse que le vectoriseur sklearn d'origine
+    (mêmes colonnes, float64), sans dictionnaire par processus.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: dict):
+        if 'vocab_sorted' not in arrays:
+            raise ValueError("MmapTfidf attend un vocabulaire trié (vocab_sorted)")
+        self.meta = meta
+        self.tfidf_id = meta.get('tfidf_id')
+        self.vocab = TfidfVocabulary(arrays, meta)
+
+    @classmethod
+    def load(cls, dirpath: str) -> 'MmapTfidf':
+        arrays, meta = load_mmap_arrays(dirpath)
+        return cls(arrays, meta)
+
+    def transform(self, texts):
+        """Matrice TF-IDF creuse (n_textes x n_termes), comme TfidfVectorizer.transform."""
+        from scipy.sparse import csr_matrix
+
+        indptr = [0]
+        indices, data = [], []
+        for text in texts:
+            cols, vals = self.vocab.text_vector(str(text))
+            indices.append(cols)
+            data.append(vals)
+            indptr.append(indptr[-1] + len(cols))
+        return csr_matrix(
+            (np.concatenate(data) if data else np.empty(0),
+             np.concatenate(indices) if indices else np.empty(0, dtype=np.intp),
+             np.asarray(indptr)),
+            shape=(len(indptr) - 1, self.vocab.n_terms),
+        )
+
+
+def attach_mmap_vocabulary(pipeline: dict, models_dir: str) -> dict:
+    """
+    Remplace pipeline['tfidf'] par le vocabulaire partagé de même empreinte
+    (models/vocab_<tfidf_id>/), s'il a été exporté. Sinon, pipeline inchangé.
+    """
+    tfidf_id = pipeline.get('tfidf_id')
+    if not tfidf_id or pipeline.get('tfidf') is None:
+        return pipeline
+    dirpath = vocab_dir(models_dir, tfidf_id)
+    if not os.path.isdir(dirpath):
+        return pipeline
+    shared = _MMAP_VOCABS.get(dirpath)
+    if shared is None:
+        shared = MmapTfidf.load(dirpath)
+        if shared.tfidf_id != tfidf_id:
+            return pipeline
+        _MMAP_VOCABS[dirpath] = shared
+    pipeline['tfidf'] = shared
+    return pipeline
+
+
+# Vocabulaires partagés déjà ouverts (un seul mmap par répertoire)
+_MMAP_VOCABS: Dict[str, MmapTfidf] = {}
+
+
+# =============================================================================
+# CHAÎNE COMPILÉE (urgence -> catégorie -> type)
+# =============================================================================
+
+class CompiledLinearChain:
+    """
+    Enchaîne les étapes linéaires compilées comme predict_pipeline.run_chain.
+    """
+
+    def __init__(self, stages: Dict[str, CompiledLinearStage]):
+        self.stages = stages
+
+    @classmethod
+    def from_dir(cls, models_dir: str, mmap: Optional[bool] = None) -> 'CompiledLinearChain':
+        """
+        Charge les étapes compilées présentes dans models_dir.
+
+        Args:
+            models_dir: Répertoire des modèles
+            mmap: True = format mmap, False = .npz, None = mmap s'il existe
+
+        Raises:
+            FileNotFoundError: Si une étape n'a pas été exportée
+        """
+        stages = {}
+        for name, _ in LINEAR_STAGES:
+            dirpath = compiled_dir(models_dir, name)
+            use_mmap = os.path.isdir(dirpath) if mmap is None else mmap
+            if use_mmap:
+                if not os.path.isdir(dirpath):
+                    raise FileNotFoundError(
+                        f"Étape compilée (mmap) introuvable : {dirpath}\n"
+                        f"Exécutez d'abord : python src/ml/export_linear.py --format mmap"
+                    )
+                stages[name] = CompiledLinearStage.load_mmap(dirpath)
+                continue
+
+            filepath = compiled_path(models_dir, name)
+            if not os.path.exists(filepath):
+                raise FileNotFoundError(
+                    f"Étape compilée introuvable : {filepath}\n"
+                    f"Exécutez d'abord : python src/ml/export_linear.py"
+                )
+            stages[name] = CompiledLinearStage.load(filepath)
+        return cls(stages)
+
+    def predict_text(self, text_full: str) -> Dict[str, str]:
+        """
+        Prédit urgence, catégorie et type à partir de text_full.
+
+        Returns:
+            Dict {urgence_pred, categorie_pred, type_ticket_pred}
+        """
+        nb_mots = len(text_full.split())
+        preds = {}
+        vectors = {}
+        for name, column in LINEAR_STAGES:
+            stage = self.stages[name]
+            # Les étapes au même vocabulaire réutilisent le même vecteur
+            key = stage.meta.get('tfidf_id')
+            vector = vectors.get(key) if key else None
+            if vector is None:
+                vector = stage.text_vector(text_full)
+                if key:
+                    vectors[key] = vector
+            preds[column] = stage.predict(text_full, [nb_mots], preds, text_vector=vector)
+        return preds
+
+    def predict(self, titre: str, texte: str) -> Dict[str, str]:
+        """Prédit urgence, catégorie et type d'un ticket (titre + texte)."""
+        return self.predict_text(f"{titre or ''} {texte or ''}".strip())
@@ -6,6 +6,7 @@ Ce module contient les fonctions utilitaires partagées entre tous les scripts
 d'entraînement ML :
 - Chargement des données
 - Construction de pipelines TF-IDF + features numériques
+- Vectoriseur TF-IDF partagé entre les étapes (optionnel)
 - Génération de prédictions Out-Of-Fold (OOF) anti-fuite
 - Fonctions d'évaluation (classification et régression)
 - Sauvegarde des modèles et métadonnées
@@ -30,6 +31,7 @@ from sklearn.metrics import (
     mean_absolute_error, mean_squared_error, r2_score
 )
 from scipy.sparse import hstack, csr_matrix
+from text_features import SHARED_TFIDF_FILE, tfidf_fingerprint
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -51,6 +53,13 @@ TFIDF_PARAMS = {
     'lowercase': True
 }
 
+# Vectoriseur TF-IDF unique pour les 4 modèles (SHARED_TFIDF=1, défaut)
+# Le premier script de la chaîne (train_urgency.py) le ré-entraîne et le
+# sauvegarde dans models/text_vectorizer.pkl ; les suivants le réutilisent,
+# après vérification qu'il correspond bien au pipeline d'urgence.
+USE_SHARED_TFIDF = os.getenv("SHARED_TFIDF", "1") == "1"
+SHARED_TFIDF_OWNER = "urgency_pipeline.pkl"
+
 
 # =============================================================================
 # FONCTIONS DE CHARGEMENT DES DONNÉES
@@ -185,6 +194,88 @@ def build_text_numeric_pipeline(text_column: str = 'text_full',
     ], remainder='drop')
 
 
+def fit_text_vectorizer(texts: pd.Series,
+                        shared: bool = USE_SHARED_TFIDF,
+                        refit: bool = False) -> Tuple[TfidfVectorizer, Any]:
+    """
+    Entraîne (ou réutilise) le vectoriseur TF-IDF final d'un modèle.
+    
+    En mode partagé, le vectoriseur est lu depuis models/text_vectorizer.pkl
+    s'il existe (sinon entraîné puis sauvegardé) : toutes les étapes utilisent
+    alors exactement le même vocabulaire et le même idf, ce qui permet à
+    l'inférence de ne vectoriser text_full qu'une seule fois.
+    
+    Args:
+        texts: Colonne texte du train set
+        shared: Utiliser le vectoriseur partagé
+        refit: Forcer le ré-entraînement du vectoriseur partagé
+        
+    Returns:
+        Tuple (vectoriseur, matrice TF-IDF du train set)
+    """
+    texts = texts.fillna('')
+    
+    if not shared:
+        tfidf = TfidfVectorizer(**TFIDF_PARAMS)
+        return tfidf, tfidf.fit_transform(texts)
+    
+    filepath = os.path.join(MODELS_DIR, SHARED_TFIDF_FILE)
+    if os.path.exists(filepath) and not refit:
+        tfidf = joblib.load(filepath)
+        check_shared_vectorizer(tfidf)
+        print(f"   ♻️ Vectoriseur TF-IDF partagé réutilisé : {filepath}")
+        return tfidf, tfidf.transform(texts)
+    
+    tfidf = TfidfVectorizer(**TFIDF_PARAMS)
+    X_text = tfidf.fit_transform(texts)
+    save_model(tfidf, SHARED_TFIDF_FILE, "Vectoriseur TF-IDF partagé")
+    return tfidf, X_text
+
+
+def check_shared_vectorizer(tfidf: TfidfVectorizer) -> None:
+    """
+    Vérifie que le vectoriseur partagé est celui du pipeline d'urgence.
+    
+    Un models/text_vectorizer.pkl laissé par un ancien entraînement (ou
+    ré-entraîné sans ré-entraîner l'urgence) fausserait silencieusement les
+    features des étapes suivantes.
+    
+    Raises:
+        ValueError: Si les empreintes diffèrent
+    """
+    owner_path = os.path.join(MODELS_DIR, SHARED_TFIDF_OWNER)
+    if not os.path.exists(owner_path):
+        return
+    owner = joblib.load(owner_path)
+    owner_tfidf = owner.get('tfidf') if isinstance(owner, dict) else None
+    if owner_tfidf is None:
+        return
+    expected = tfidf_fingerprint(owner_tfidf)
+    actual = tfidf_fingerprint(tfidf)
+    if actual != expected:
+        raise ValueError(
+            f"{SHARED_TFIDF_FILE} (empreinte {actual}) ne correspond pas au vectoriseur de "
+            f"{SHARED_TFIDF_OWNER} ({expected}). Relancer d'abord python src/ml/train_urgency.py."
+        )
+
+
+def tfidf_pipeline_fields(tfidf: TfidfVectorizer, shared: bool = USE_SHARED_TFIDF) -> Dict[str, Any]:
+    """
+    Champs à ajouter au dictionnaire pipeline pour identifier son vectoriseur.
+    
+    Args:
+        tfidf: Vectoriseur final du modèle
+        shared: Le vectoriseur provient de l'artefact partagé
+        
+    Returns:
+        Dict avec tfidf_id (et tfidf_file en mode partagé)
+    """
+    fields = {'tfidf_id': tfidf_fingerprint(tfidf)}
+    if shared:
+        fields['tfidf_file'] = SHARED_TFIDF_FILE
+    return fields
+
+
 # =============================================================================
 # GÉNÉRATION OOF (OUT-OF-FOLD) ANTI-FUITE
 # =============================================================================
@@ -414,6 +505,9 @@ def save_model(model: Any,
     """
     Sauvegarde un modèle avec joblib.
     
+    Le fichier n'est pas compressé : ses tableaux NumPy peuvent ainsi être
+    ouverts en mmap à l'inférence (MODEL_MMAP=1 dans predict_pipeline.py).
+    
     Args:
         model: Objet à sauvegarder
         filename: Nom du fichier (sans chemin)
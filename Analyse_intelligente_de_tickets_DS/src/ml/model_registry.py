@@ -0,0 +1,219 @@
+# =============================================================================
+# Registre des Modèles - Chargement unique et rechargement à chaud
+# =============================================================================
+"""
+Registre de pipelines partagé par tout le processus.
+
+Chaque pipeline (urgency, category, type, time) est chargé paresseusement
+au premier accès puis conservé en mémoire. Le fichier source est surveillé :
+si son mtime (ou sa taille) change, son empreinte SHA-256 est recalculée et,
+si le contenu a réellement changé, le pipeline est rechargé puis remplacé
+de manière atomique. Les lecteurs concurrents voient soit l'ancienne version,
+soit la nouvelle, jamais un état intermédiaire.
+
+Usage :
+    registry = ModelRegistry(resolve_path=check_model_exists, loader=joblib.load)
+    pipeline = registry.get('urgency')
+"""
+
+import os
+import time
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+# Intervalle minimal (secondes) entre deux vérifications du fichier sur disque
+DEFAULT_CHECK_INTERVAL = 2.0
+
+# Taille des blocs lus pour le calcul de l'empreinte
+HASH_CHUNK_SIZE = 1 << 20
+
+
+# =============================================================================
+# FONCTIONS UTILITAIRES
+# =============================================================================
+
+def file_sha256(filepath: str) -> str:
+    """
+    Calcule l'empreinte SHA-256 d'un fichier.
+
+    Args:
+        filepath: Chemin du fichier
+
+    Returns:
+        Empreinte hexadécimale
+    """
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class _Entry:
+    """Pipeline résident et état du fichier dont il provient."""
+    __slots__ = ('pipeline', 'path', 'mtime_ns', 'size', 'sha256', 'checked_at')
+
+    def __init__(self, pipeline: Any, path: str, mtime_ns: int, size: int, sha256: str):
+        self.pipeline = pipeline
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.sha256 = sha256
+        self.checked_at = time.monotonic()
+
+
+# =============================================================================
+# REGISTRE
+# =============================================================================
+
+class ModelRegistry:
+    """
+    Registre thread-safe des pipelines chargés.
+
+    Args:
+        resolve_path: Fonction nom -> chemin du fichier (lève FileNotFoundError si absent)
+        loader: Fonction chemin -> pipeline (ex: joblib.load)
+        check_interval: Délai minimal entre deux stat() du fichier (0 = à chaque accès,
+            None = pas de rechargement à chaud)
+    """
+
+    def __init__(self,
+                 resolve_path: Callable[[str], str],
+                 loader: Callable[[str], Any],
+                 check_interval: Optional[float] = DEFAULT_CHECK_INTERVAL):
+        self._resolve_path = resolve_path
+        self._loader = loader
+        self.check_interval = check_interval
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    # -------------------------------------------------------------------------
+    # Accès
+    # -------------------------------------------------------------------------
+
+    def get(self, name: str) -> Any:
+        """
+        Retourne le pipeline résident, en le chargeant ou rechargeant si besoin.
+
+        Args:
+            name: Nom du modèle ('urgency', 'category', 'type', 'time')
+
+        Returns:
+            Pipeline chargé
+        """
+        entry = self._entries.get(name)
+        if entry is not None and not self._is_check_due(entry):
+            return entry.pipeline
+
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                entry = self._load(name)
+            elif self._is_check_due(entry):
+                entry = self._refresh(name, entry)
+            return entry.pipeline
+
+    def preload(self, names: Iterable[str]) -> None:
+        """Charge immédiatement une liste de modèles (warm-up au démarrage)."""
+        for name in names:
+            self.get(name)
+
+    def reload(self, name: Optional[str] = None) -> None:
+        """
+        Force le rechargement d'un modèle (ou de tous si name est None).
+        """
+        with self._lock:
+            names = [name] if name else list(self._entries)
+            for n in names:
+                self._load(n)
+
+    def clear(self) -> None:
+        """Vide le registre (les modèles seront rechargés au prochain accès)."""
+        with self._lock:
+            self._entries = {}
+            self._generation += 1
+
+    # -------------------------------------------------------------------------
+    # Versionnement
+    # -------------------------------------------------------------------------
+
+    @property
+    def generation(self) -> int:
+        """Compteur incrémenté à chaque (re)chargement d'un modèle."""
+        return self._generation
+
+    def version(self, names: Optional[Iterable[str]] = None) -> str:
+        """
+        Empreinte courte de l'ensemble des modèles chargés.
+
+        Args:
+            names: Modèles à inclure (tous les modèles résidents par défaut)
+
+        Returns:
+            Empreinte hexadécimale (16 caractères)
+        """
+        entries = self._entries
+        names = sorted(names) if names is not None else sorted(entries)
+        digest = hashlib.sha256()
+        for n in names:
+            entry = entries.get(n)
+            digest.update(f"{n}:{entry.sha256 if entry else '-'};".encode('utf-8'))
+        return digest.hexdigest()[:16]
+
+    def info(self) -> Dict[str, Dict[str, Any]]:
+        """Retourne l'état des modèles résidents (chemin, empreinte, taille)."""
+        return {
+            name: {'path': e.path, 'sha256': e.sha256, 'size': e.size, 'mtime_ns': e.mtime_ns}
+            for name, e in self._entries.items()
+        }
+
+    # -------------------------------------------------------------------------
+    # Interne (appelé avec le verrou)
+    # -------------------------------------------------------------------------
+
+    def _is_check_due(self, entry: _Entry) -> bool:
+        if self.check_interval is None:
+            return False
+        return time.monotonic() - entry.checked_at >= self.check_interval
+
+    def _load(self, name: str) -> _Entry:
+        path = self._resolve_path(name)
+        stat = os.stat(path)
+        sha256 = file_sha256(path)
+        pipeline = self._loader(path)
+        entry = _Entry(pipeline, path, stat.st_mtime_ns, stat.st_size, sha256)
+        # Remplacement atomique : nouveau dict, une seule affectation
+        entries = dict(self._entries)
+        entries[name] = entry
+        self._entries = entries
+        self._generation += 1
+        return entry
+
+    def _refresh(self, name: str, entry: _Entry) -> _Entry:
+        try:
+            path = self._resolve_path(name)
+            stat = os.stat(path)
+            if path == entry.path and stat.st_mtime_ns == entry.mtime_ns and stat.st_size == entry.size:
+                entry.checked_at = time.monotonic()
+                return entry
+
+            # mtime modifié : ne recharger que si le contenu a réellement changé
+            if path == entry.path and file_sha256(path) == entry.sha256:
+                entry.mtime_ns = stat.st_mtime_ns
+                entry.size = stat.st_size
+                entry.checked_at = time.monotonic()
+                return entry
+
+            return self._load(name)
+        except Exception:
+            # Fichier absent ou en cours d'écriture : on garde la version résidente
+            # et on retentera à la prochaine vérification.
+            entry.checked_at = time.monotonic()
+            return entry
@@ -0,0 +1,143 @@
+# =============================================================================
+# Runtime ONNX - Modèles des 4 étapes servis par onnxruntime
+# =============================================================================
+"""
+Backend d'inférence ONNX pour predict_pipeline (INFERENCE_BACKEND=onnx).
+
+Chaque étape est exportée par export_onnx.py dans models/<étape>_pipeline.onnx.
+Le graphe ONNX contient uniquement le modèle (régression logistique,
+XGBoost ou GradientBoosting) : la vectorisation TF-IDF (strip_accents non
+supporté par les convertisseurs ONNX), nb_mots et l'encodage OneHot restent
+calculés par predict_pipeline, puis la matrice de l'étape est passée au
+graphe en float32 dense, par paquets de ONNX_BATCH_ROWS lignes.
+
+Limites : scikit-learn reste nécessaire (vectoriseur TF-IDF du pipeline .pkl)
+et les convertisseurs n'acceptent pas d'entrée creuse ; chaque paquet est
+densifié (ONNX_BATCH_ROWS x n_features x 4 octets, environ 13 Mo pour 64
+lignes et 50 000 termes TF-IDF). Réduire ONNX_BATCH_ROWS borne cette mémoire.
+Parité avec sklearn vérifiée à chaque export (export_onnx.py, data/test.csv).
+
+Les objets OnnxClassifier / OnnxRegressor exposent la même interface que
+les modèles sklearn utilisés par la chaîne (classes_, predict,
+predict_proba) et remplacent pipeline['model'] à l'inférence.
+
+Variables d'environnement :
+    ONNX_THREADS=0        threads intra-op d'onnxruntime (0 = choix d'onnxruntime)
+    ONNX_BATCH_ROWS=64    lignes densifiées par appel au graphe
+"""
+
+import os
+from typing import Any, Dict
+
+import numpy as np
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+ONNX_SUFFIX = ".onnx"
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))
+ONNX_BATCH_ROWS = int(os.getenv("ONNX_BATCH_ROWS", "64"))
+
+# Métadonnée du graphe : entrées absentes de la matrice creuse = valeurs
+# manquantes (XGBoost entraîné sur CSR), et non des zéros
+MISSING_AS_NAN_KEY = "sparse_missing_as_nan"
+
+
+def onnx_path(pipeline_path: str) -> str:
+    """Chemin du graphe ONNX associé à un fichier pipeline .pkl."""
+    return os.path.splitext(pipeline_path)[0] + ONNX_SUFFIX
+
+
+def _session(filepath: str):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    if ONNX_THREADS > 0:
+        options.intra_op_num_threads = ONNX_THREADS
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return ort.InferenceSession(filepath, sess_options=options,
+                                providers=['CPUExecutionProvider'])
+
+
+# =============================================================================
+# MODÈLES ONNX
+# =============================================================================
+
+class _OnnxModel:
+    """Session onnxruntime alimentée par paquets de lignes denses float32."""
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self.session = _session(filepath)
+        self.input_name = self.session.get_inputs()[0].name
+        self.n_features = self.session.get_inputs()[0].shape[1]
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.missing_as_nan = metadata.get(MISSING_AS_NAN_KEY) == '1'
+
+    def _dense(self, X) -> np.ndarray:
+        if not hasattr(X, 'tocsr'):
+            return np.asarray(X, dtype=np.float32)
+        X = X.tocsr()
+        if not self.missing_as_nan:
+            return X.astype(np.float32).toarray()
+        dense = np.full(X.shape, np.nan, dtype=np.float32)
+        rows = np.repeat(np.arange(X.shape[0]), np.diff(X.indptr))
+        dense[rows, X.indices] = X.data
+        return dense
+
+    def _run(self, X, output: int) -> np.ndarray:
+        chunks = []
+        for start in range(0, X.shape[0], ONNX_BATCH_ROWS):
+            block = self._dense(X[start:start + ONNX_BATCH_ROWS])
+            chunks.append(self.session.run(None, {self.input_name: block})[output])
+        return np.concatenate(chunks) if chunks else np.empty(0, dtype=np.float32)
+
+
+class OnnxClassifier(_OnnxModel):
+    """
+    Classifieur ONNX (sorties : label, probabilités sans zipmap).
+
+    Args:
+        filepath: Fichier .onnx
+        classes: classes_ du modèle sklearn d'origine (ordre des probabilités)
+    """
+
+    def __init__(self, filepath: str, classes: np.ndarray):
+        super().__init__(filepath)
+        self.classes_ = np.asarray(classes)
+
+    def predict_proba(self, X) -> np.ndarray:
+        return self._run(X, 1).astype(np.float64)
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+class OnnxRegressor(_OnnxModel):
+    """Régresseur ONNX (une sortie : variable prédite)."""
+
+    def predict(self, X) -> np.ndarray:
+        return self._run(X, 0).reshape(-1).astype(np.float64)
+
+
+def attach_onnx_model(pipeline: Dict[str, Any], pipeline_path: str) -> Dict[str, Any]:
+    """
+    Renseigne pipeline['onnx_model'] à partir du graphe exporté.
+
+    Raises:
+        FileNotFoundError: Si le graphe n'a pas été exporté
+        ImportError: Si onnxruntime n'est pas installé
+    """
+    filepath = onnx_path(pipeline_path)
+    if not os.path.exists(filepath):
+        raise FileNotFoundError(
+            f"Graphe ONNX introuvable : {filepath}\n"
+            f"Exécutez d'abord : python src/ml/export_onnx.py"
+        )
+    model = pipeline['model']
+    if hasattr(model, 'classes_'):
+        pipeline['onnx_model'] = OnnxClassifier(filepath, model.classes_)
+    else:
+        pipeline['onnx_model'] = OnnxRegressor(filepath)
+    return pipeline
@@ -16,19 +16,51 @@ Usage :
     
     Puis entrer le titre et le texte du ticket quand demandé.
 
+Usage fichier / flux (sortie JSONL, traitement par paquets) :
+    python src/ml/predict_pipeline.py --input data/tickets.csv --output preds.jsonl
+    cat tickets.jsonl | python src/ml/predict_pipeline.py --input - > preds.jsonl
+
+Usage en lot (depuis Python) :
+    from predict_pipeline import predict_tickets
+    preds = predict_tickets([{'titre': ..., 'texte': ...}, ...])
+
 Modèles requis (dans models/) :
     - urgency_pipeline.pkl
     - category_pipeline.pkl
     - type_pipeline.pkl
     - time_pipeline.pkl
+
+Les pipelines sont chargés une seule fois par processus via un registre
+partagé (voir model_registry.py) et rechargés à chaud si le fichier change.
+Quand les étapes partagent le même vectoriseur TF-IDF (voir text_features.py),
+text_full n'est vectorisé qu'une seule fois par lot.
+
+Backend des modèles : sklearn (défaut) ou onnx (INFERENCE_BACKEND=onnx,
+graphes exportés par export_onnx.py, voir onnx_runtime.py).
+
+Latence par étape (validation, features, TF-IDF, OneHot, hstack, predict) :
+PIPELINE_METRICS=1 puis latency_metrics.to_json() / to_prometheus().
 """
 
 import os
 import sys
+import json
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
 import joblib
 import pandas as pd
 import numpy as np
 
+from model_registry import ModelRegistry
+from prediction_cache import PredictionCache
+from text_features import TextMatrixCache, attach_tfidf_id
+from tree_runtime import attach_fast_predict
+from categorical_codes import StageCodes
+from onnx_runtime import attach_onnx_model
+from linear_runtime import attach_mmap_vocabulary
+import latency_metrics
+from latency_metrics import timed, increment
+
 # =============================================================================
 # CONFIGURATION
 # =============================================================================
@@ -46,6 +78,25 @@ PIPELINE_FILES = {
     'time': 'time_pipeline.pkl'
 }
 
+# Intervalle (secondes) de vérification des fichiers pour le rechargement à chaud
+MODEL_RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", "2.0"))
+
+# Ouvrir les tableaux NumPy des .pkl en mémoire partagée (mmap, lecture seule).
+# Les .pkl sont écrits sans compression par ml_utils.save_model : les
+# coefficients et idf sont alors partagés entre processus au lieu d'être copiés.
+# Le vocabulaire TF-IDF (dict Python, non partageable) est remplacé par
+# models/vocab_<tfidf_id>/ s'il a été exporté (export_linear.py --format mmap).
+MODEL_MMAP = os.getenv("MODEL_MMAP", "0") == "1"
+
+# Cache des prédictions (tickets re-soumis à l'identique)
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "1024"))   # 0 = désactivé
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "0"))      # secondes, 0 = illimité
+PREDICTION_CACHE_FILE = os.getenv("PREDICTION_CACHE_FILE")                # persistance JSON (optionnel)
+
+# Backend d'exécution des modèles : 'sklearn' ou 'onnx'
+BACKENDS = ('sklearn', 'onnx')
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "sklearn")
+
 
 # =============================================================================
 # FONCTIONS UTILITAIRES
@@ -88,9 +139,84 @@ def check_model_exists(model_name: str) -> str:
     return filepath
 
 
+def _load_pipeline_file(filepath: str) -> dict:
+    """
+    Désérialise un pipeline, identifie son vectoriseur TF-IDF et prépare
+    le chemin d'inférence rapide du régresseur (voir tree_runtime.py), ou
+    le graphe ONNX de l'étape si INFERENCE_BACKEND='onnx'. Avec MODEL_MMAP=1,
+    le vocabulaire TF-IDF partagé (mmap) remplace celui du .pkl.
+    """
+    pipeline = joblib.load(filepath, mmap_mode='r' if MODEL_MMAP else None)
+    pipeline = attach_fast_predict(attach_tfidf_id(pipeline, os.path.dirname(filepath)))
+    if MODEL_MMAP:
+        pipeline = attach_mmap_vocabulary(pipeline, os.path.dirname(filepath))
+    if INFERENCE_BACKEND == 'onnx':
+        pipeline = attach_onnx_model(pipeline, filepath)
+    return pipeline
+
+
+# Registre partagé par tout le processus (chargement paresseux, une fois)
+_REGISTRY = ModelRegistry(
+    resolve_path=check_model_exists,
+    loader=_load_pipeline_file,
+    check_interval=MODEL_RELOAD_INTERVAL
+)
+
+
+def get_registry() -> ModelRegistry:
+    """Retourne le registre de modèles du processus."""
+    return _REGISTRY
+
+
+# Cache des prédictions, invalidé quand la version des modèles change
+_CACHE = PredictionCache(
+    maxsize=PREDICTION_CACHE_SIZE,
+    ttl=PREDICTION_CACHE_TTL,
+    path=PREDICTION_CACHE_FILE
+)
+
+
+def get_prediction_cache() -> PredictionCache:
+    """Retourne le cache de prédictions du processus (stats(), clear())."""
+    return _CACHE
+
+
+def set_backend(backend: str) -> None:
+    """
+    Change le backend des modèles ('sklearn' ou 'onnx').
+    
+    Les pipelines sont rechargés au prochain appel et le cache de
+    prédictions est vidé.
+    """
+    global INFERENCE_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend inconnu: {backend}. Backends disponibles: {list(BACKENDS)}")
+    if backend != INFERENCE_BACKEND:
+        INFERENCE_BACKEND = backend
+        _REGISTRY.clear()
+        _CACHE.clear()
+
+
+def model_bundle_version() -> str:
+    """
+    Version de l'ensemble des 4 modèles (empreinte de leurs fichiers).
+    
+    Charge les modèles si nécessaire : la version change dès qu'un modèle
+    est rechargé à chaud. Le backend non-sklearn fait partie de la version.
+    """
+    _REGISTRY.preload(PIPELINE_FILES)
+    version = _REGISTRY.version(PIPELINE_FILES)
+    if INFERENCE_BACKEND != 'sklearn':
+        version = f"{version}-{INFERENCE_BACKEND}"
+    return version
+
+
 def load_pipeline(model_name: str) -> dict:
     """
-    Charge un pipeline de modèle depuis un fichier .pkl.
+    Retourne un pipeline de modèle résident en mémoire.
+    
+    Le fichier .pkl n'est désérialisé qu'au premier appel (puis à chaque
+    modification du fichier) ; les appels suivants réutilisent l'objet chargé.
     
     Args:
         model_name: Nom du modèle à charger
@@ -98,9 +224,7 @@ def load_pipeline(model_name: str) -> dict:
     Returns:
         Dictionnaire contenant le modèle et ses composants (TF-IDF, encoder, etc.)
     """
-    filepath = check_model_exists(model_name)
-    pipeline = joblib.load(filepath)
-    return pipeline
+    return _REGISTRY.get(model_name)
 
 
 def prepare_features(titre: str, texte: str) -> pd.DataFrame:
@@ -129,6 +253,52 @@ def prepare_features(titre: str, texte: str) -> pd.DataFrame:
     return df
 
 
+def prepare_features_batch(titres: list, textes: list) -> pd.DataFrame:
+    """
+    Prépare les features de N tickets dans une seule DataFrame.
+    
+    Args:
+        titres: Liste des titres
+        textes: Liste des textes (même longueur que titres)
+        
+    Returns:
+        DataFrame avec une ligne par ticket (text_full, nb_mots)
+    """
+    text_full = [f"{t or ''} {x or ''}".strip() for t, x in zip(titres, textes)]
+    nb_mots = [len(t.split()) for t in text_full]
+    
+    return pd.DataFrame({
+        'text_full': text_full,
+        'nb_mots': nb_mots
+    })
+
+
+def split_records(records) -> tuple:
+    """
+    Extrait les listes (titres, textes) d'un lot de tickets.
+    
+    Args:
+        records: DataFrame (colonnes titre/texte), dicts ou tuples (titre, texte)
+        
+    Returns:
+        Tuple (titres, textes)
+    """
+    if isinstance(records, pd.DataFrame):
+        titres = records['titre'].fillna('').astype(str).tolist() if 'titre' in records else [''] * len(records)
+        textes = records['texte'].fillna('').astype(str).tolist() if 'texte' in records else [''] * len(records)
+        return titres, textes
+    
+    titres, textes = [], []
+    for rec in records:
+        if isinstance(rec, dict):
+            titre, texte = rec.get('titre'), rec.get('texte')
+        else:
+            titre, texte = rec
+        titres.append('' if titre is None else str(titre))
+        textes.append('' if texte is None else str(texte))
+    return titres, textes
+
+
 def validate_input(titre: str, texte: str) -> None:
     """
     Valide que l'entrée utilisateur n'est pas vide.
@@ -159,111 +329,264 @@ def validate_input(titre: str, texte: str) -> None:
 # FONCTIONS DE PRÉDICTION
 # =============================================================================
 
-def predict_urgency(pipeline: dict, df: pd.DataFrame) -> str:
+def build_stage_matrix(pipeline: dict, df: pd.DataFrame, default_cat_cols: list = None,
+                       text_cache: TextMatrixCache = None, stage: str = 'stage',
+                       codes: StageCodes = None):
     """
-    Prédit l'urgence du ticket.
+    Construit la matrice de features d'une étape pour toutes les lignes de df.
     
     Args:
-        pipeline: Pipeline chargé pour l'urgence
-        df: DataFrame avec text_full et nb_mots
+        pipeline: Pipeline chargé (tfidf, encoder, colonnes)
+        df: DataFrame avec text_full, nb_mots et les prédictions upstream
+        default_cat_cols: Colonnes catégorielles par défaut si absentes du pipeline
+        text_cache: Cache TF-IDF du lot (partagé entre les étapes)
+        stage: Nom de l'étape pour l'instrumentation (ex: 'urgency')
+        codes: Codes entiers des prédictions upstream (sinon lus dans df)
         
     Returns:
-        Urgence prédite (Basse, Moyenne, Haute)
+        Matrice sparse TF-IDF + numériques (+ OneHot des prédictions upstream)
     """
     from scipy.sparse import hstack, csr_matrix
     
-    tfidf = pipeline['tfidf']
-    model = pipeline['model']
-    text_col = pipeline['text_column']
     num_cols = pipeline.get('numeric_columns', ['nb_mots'])
     
-    # Vectoriser le texte
-    X_text = tfidf.transform(df[text_col].fillna(''))
+    # Vectoriser le texte (une seule fois par lot si le vectoriseur est partagé)
+    if text_cache is None:
+        text_cache = TextMatrixCache(df)
+    with timed(f'{stage}.tfidf'):
+        X_text = text_cache.transform(pipeline)
     
-    # Ajouter les features numériques (nb_mots)
+    # Features numériques (nb_mots)
     X_num = df[num_cols].values
-    X_combined = hstack([X_text, csr_matrix(X_num)])
     
-    # Prédire
-    prediction = model.predict(X_combined)[0]
+    if default_cat_cols is None:
+        with timed(f'{stage}.hstack'):
+            return hstack([X_text, csr_matrix(X_num)]).tocsr()
+    
+    # Encoder les prédictions catégorielles upstream
+    cat_cols = pipeline.get('categorical_pred_columns', default_cat_cols)
+    with timed(f'{stage}.onehot'):
+        if codes is not None and codes.has(cat_cols):
+            # OneHot par index (voir categorical_codes.py)
+            X_cat = codes.onehot(pipeline, cat_cols)
+        else:
+            X_cat = pipeline['encoder'].transform(df[cat_cols])
     
-    return prediction
+    with timed(f'{stage}.hstack'):
+        return hstack([X_text, csr_matrix(X_num), X_cat]).tocsr()
 
 
-def predict_category(pipeline: dict, df: pd.DataFrame) -> str:
+def classify_codes(model, X, return_margin: bool = False) -> tuple:
     """
-    Prédit la catégorie du ticket.
+    Prédit l'indice de la classe (dans model.classes_) de chaque ligne.
+    
+    Sans marge, les scores de décision suffisent (même règle que
+    model.predict pour un classifieur linéaire). Avec marge, voir
+    classify_with_margin.
     
     Args:
-        pipeline: Pipeline chargé pour la catégorie
-        df: DataFrame avec text_full, nb_mots, urgence_pred
+        model: Classifieur entraîné
+        X: Matrice de features
+        return_margin: Calculer aussi les marges de confiance
         
     Returns:
-        Catégorie prédite
+        Tuple (array des codes, array des marges ou None)
     """
-    from scipy.sparse import hstack, csr_matrix
+    if not return_margin:
+        if hasattr(model, 'decision_function'):
+            scores = model.decision_function(X)
+            if scores.ndim == 1:
+                return (scores > 0).astype(np.intp), None
+            return np.argmax(scores, axis=1), None
+        return np.searchsorted(model.classes_, model.predict(X)), None
     
-    tfidf = pipeline['tfidf']
-    model = pipeline['model']
-    encoder = pipeline['encoder']
-    text_col = pipeline['text_column']
-    num_cols = pipeline.get('numeric_columns', ['nb_mots'])
-    cat_cols = pipeline.get('categorical_pred_columns', ['urgence_pred'])
+    if hasattr(model, 'predict_proba'):
+        scores = model.predict_proba(X)
+    else:
+        scores = model.decision_function(X)
+        if scores.ndim == 1:
+            scores = np.column_stack([-scores, scores])
     
-    # Vectoriser le texte
-    X_text = tfidf.transform(df[text_col].fillna(''))
+    best = np.argmax(scores, axis=1)
+    top2 = np.sort(scores, axis=1)[:, -2:]
+    margins = top2[:, 1] - top2[:, 0]
+    return best, margins
+
+
+def classify_with_margin(model, X) -> tuple:
+    """
+    Prédit les classes et la marge de confiance de chaque ligne.
     
-    # Features numériques
-    X_num = df[num_cols].values
+    La marge est l'écart entre les deux plus fortes probabilités
+    (predict_proba) : proche de 0 = modèle hésitant, proche de 1 = certain.
+    Pour un modèle sans predict_proba, l'écart des scores de décision est utilisé.
     
-    # Encoder les prédictions catégorielles (urgence_pred)
-    X_cat = encoder.transform(df[cat_cols])
+    Args:
+        model: Classifieur entraîné
+        X: Matrice de features
+        
+    Returns:
+        Tuple (array des classes, array des marges)
+    """
+    best, margins = classify_codes(model, X, return_margin=True)
+    return model.classes_[best], margins
+
+
+def _stage_output(pipeline: dict, X, return_margin: bool, stage: str = 'stage',
+                  codes: StageCodes = None, column: str = None):
+    """
+    Classes prédites (et marges si demandé) d'une étape de classification.
     
-    # Combiner toutes les features
-    X_combined = hstack([X_text, csr_matrix(X_num), X_cat])
+    Les codes de classe sont enregistrés dans codes (colonne column) pour
+    l'encodage OneHot des étapes suivantes.
+    """
+    model = pipeline.get('onnx_model') or pipeline['model']
+    with timed(f'{stage}.predict'):
+        best, margins = classify_codes(model, X, return_margin)
+    if codes is not None:
+        codes.set(column, best, model.classes_)
+    labels = model.classes_[best]
+    return (labels, margins) if return_margin else labels
+
+
+def predict_urgency_batch(pipeline: dict, df: pd.DataFrame,
+                          text_cache: TextMatrixCache = None,
+                          return_margin: bool = False,
+                          codes: StageCodes = None) -> np.ndarray:
+    """
+    Prédit l'urgence de tous les tickets de df en un seul appel.
     
-    # Prédire
-    prediction = model.predict(X_combined)[0]
+    Args:
+        pipeline: Pipeline chargé pour l'urgence
+        df: DataFrame avec text_full et nb_mots
+        text_cache: Cache TF-IDF du lot (optionnel)
+        return_margin: Retourner aussi les marges de confiance
+        codes: Codes des prédictions upstream du lot (complété par cette étape)
+        
+    Returns:
+        Array des urgences prédites (Basse, Moyenne, Haute)
+        (tuple (classes, marges) si return_margin)
+    """
+    X_combined = build_stage_matrix(pipeline, df, text_cache=text_cache, stage='urgency')
+    return _stage_output(pipeline, X_combined, return_margin, 'urgency', codes, 'urgence_pred')
+
+
+def predict_category_batch(pipeline: dict, df: pd.DataFrame,
+                           text_cache: TextMatrixCache = None,
+                           return_margin: bool = False,
+                           codes: StageCodes = None) -> np.ndarray:
+    """
+    Prédit la catégorie de tous les tickets de df en un seul appel.
     
-    return prediction
+    Args:
+        pipeline: Pipeline chargé pour la catégorie
+        df: DataFrame avec text_full, nb_mots, urgence_pred
+        text_cache: Cache TF-IDF du lot (optionnel)
+        return_margin: Retourner aussi les marges de confiance
+        codes: Codes des prédictions upstream du lot (complété par cette étape)
+        
+    Returns:
+        Array des catégories prédites (tuple (classes, marges) si return_margin)
+    """
+    X_combined = build_stage_matrix(pipeline, df, ['urgence_pred'], text_cache=text_cache,
+                                    stage='category', codes=codes)
+    return _stage_output(pipeline, X_combined, return_margin, 'category', codes, 'categorie_pred')
 
 
-def predict_type(pipeline: dict, df: pd.DataFrame) -> str:
+def predict_type_batch(pipeline: dict, df: pd.DataFrame,
+                       text_cache: TextMatrixCache = None,
+                       return_margin: bool = False,
+                       codes: StageCodes = None) -> np.ndarray:
     """
-    Prédit le type de ticket.
+    Prédit le type de tous les tickets de df en un seul appel.
     
     Args:
         pipeline: Pipeline chargé pour le type
         df: DataFrame avec text_full, nb_mots, urgence_pred, categorie_pred
+        text_cache: Cache TF-IDF du lot (optionnel)
+        return_margin: Retourner aussi les marges de confiance
+        codes: Codes des prédictions upstream du lot (complété par cette étape)
         
     Returns:
-        Type prédit (Demande, Incident)
+        Array des types prédits (Demande, Incident)
+        (tuple (classes, marges) si return_margin)
     """
-    from scipy.sparse import hstack, csr_matrix
-    
-    tfidf = pipeline['tfidf']
-    model = pipeline['model']
-    encoder = pipeline['encoder']
-    text_col = pipeline['text_column']
-    num_cols = pipeline.get('numeric_columns', ['nb_mots'])
-    cat_cols = pipeline.get('categorical_pred_columns', ['urgence_pred', 'categorie_pred'])
-    
-    # Vectoriser le texte
-    X_text = tfidf.transform(df[text_col].fillna(''))
+    X_combined = build_stage_matrix(pipeline, df, ['urgence_pred', 'categorie_pred'],
+                                    text_cache=text_cache, stage='type', codes=codes)
+    return _stage_output(pipeline, X_combined, return_margin, 'type', codes, 'type_ticket_pred')
+
+
+def predict_time_batch(pipeline: dict, df: pd.DataFrame,
+                       text_cache: TextMatrixCache = None,
+                       codes: StageCodes = None) -> np.ndarray:
+    """
+    Prédit le temps de résolution de tous les tickets de df en un seul appel.
     
-    # Features numériques
-    X_num = df[num_cols].values
+    Args:
+        pipeline: Pipeline chargé pour le temps
+        df: DataFrame avec text_full, nb_mots, urgence_pred, categorie_pred, type_ticket_pred
+        text_cache: Cache TF-IDF du lot (optionnel)
+        codes: Codes des prédictions upstream du lot (optionnel)
+        
+    Returns:
+        Array des temps prédits (en heures, >= 0)
+    """
+    X_combined = build_stage_matrix(
+        pipeline, df, ['urgence_pred', 'categorie_pred', 'type_ticket_pred'],
+        text_cache=text_cache, stage='time', codes=codes
+    )
+    # Graphe ONNX, sinon booster XGBoost configuré pour l'inférence, sinon model.predict
+    if pipeline.get('onnx_model') is not None:
+        predict = pipeline['onnx_model'].predict
+    else:
+        predict = pipeline.get('fast_predict') or pipeline['model'].predict
+    with timed('time.predict'):
+        predictions = predict(X_combined)
     
-    # Encoder les prédictions catégorielles (urgence_pred + categorie_pred)
-    X_cat = encoder.transform(df[cat_cols])
+    # Assurer des valeurs positives
+    return np.maximum(predictions, 0)
+
+
+def predict_urgency(pipeline: dict, df: pd.DataFrame) -> str:
+    """
+    Prédit l'urgence du ticket.
     
-    # Combiner toutes les features
-    X_combined = hstack([X_text, csr_matrix(X_num), X_cat])
+    Args:
+        pipeline: Pipeline chargé pour l'urgence
+        df: DataFrame avec text_full et nb_mots
+        
+    Returns:
+        Urgence prédite (Basse, Moyenne, Haute)
+    """
+    return predict_urgency_batch(pipeline, df)[0]
+
+
+def predict_category(pipeline: dict, df: pd.DataFrame) -> str:
+    """
+    Prédit la catégorie du ticket.
     
-    # Prédire
-    prediction = model.predict(X_combined)[0]
+    Args:
+        pipeline: Pipeline chargé pour la catégorie
+        df: DataFrame avec text_full, nb_mots, urgence_pred
+        
+    Returns:
+        Catégorie prédite
+    """
+    return predict_category_batch(pipeline, df)[0]
+
+
+def predict_type(pipeline: dict, df: pd.DataFrame) -> str:
+    """
+    Prédit le type de ticket.
     
-    return prediction
+    Args:
+        pipeline: Pipeline chargé pour le type
+        df: DataFrame avec text_full, nb_mots, urgence_pred, categorie_pred
+        
+    Returns:
+        Type prédit (Demande, Incident)
+    """
+    return predict_type_batch(pipeline, df)[0]
 
 
 def predict_time(pipeline: dict, df: pd.DataFrame) -> float:
@@ -277,94 +600,206 @@ def predict_time(pipeline: dict, df: pd.DataFrame) -> float:
     Returns:
         Temps de résolution prédit (en heures)
     """
-    from scipy.sparse import hstack, csr_matrix
-    
-    tfidf = pipeline['tfidf']
-    model = pipeline['model']
-    encoder = pipeline['encoder']
-    text_col = pipeline['text_column']
-    num_cols = pipeline['numeric_columns']
-    cat_cols = pipeline['categorical_pred_columns']
-    
-    # Vectoriser le texte
-    X_text = tfidf.transform(df[text_col].fillna(''))
-    
-    # Features numériques
-    X_num = df[num_cols].values
-    
-    # Encoder les prédictions catégorielles
-    X_cat = encoder.transform(df[cat_cols])
-    
-    # Combiner toutes les features
-    X_combined = hstack([X_text, csr_matrix(X_num), X_cat])
-    
-    # Prédire
-    prediction = model.predict(X_combined)[0]
-    
-    # Assurer une valeur positive
-    prediction = max(0, prediction)
-    
-    return prediction
+    return predict_time_batch(pipeline, df)[0]
 
 
 # =============================================================================
 # PIPELINE PRINCIPAL D'INFÉRENCE
 # =============================================================================
 
-def predict_ticket(titre: str, texte: str) -> dict:
+def run_chain(df: pd.DataFrame, with_confidence: bool = False) -> dict:
     """
-    Pipeline complet de prédiction pour un ticket.
+    Exécute la chaîne des 4 modèles sur toutes les lignes de df.
     
-    Chaîne séquentielle :
-    1. Urgence → 2. Catégorie → 3. Type → 4. Temps
+    Chaque étape est un seul appel vectorisé (une matrice sparse pour N tickets)
+    et la matrice TF-IDF est calculée une seule fois pour les étapes qui
+    partagent le même vectoriseur. Les prédictions upstream passent d'une étape
+    à l'autre sous forme de codes entiers (voir categorical_codes.py) : df
+    n'est pas modifié et les libellés ne sont décodés qu'une fois par étape.
     
     Args:
-        titre: Titre du ticket
-        texte: Corps du texte du ticket
+        df: DataFrame avec text_full et nb_mots
+        with_confidence: Ajouter les marges de confiance des 3 classifieurs
+            (urgence_margin, categorie_margin, type_ticket_margin)
         
     Returns:
-        Dictionnaire avec toutes les prédictions
+        Dictionnaire colonne -> array des prédictions (une valeur par ligne)
     """
-    # Valider l'entrée
-    validate_input(titre, texte)
-    
-    # Préparer les features de base
-    df = prepare_features(titre, texte)
+    text_cache = TextMatrixCache(df)
+    codes = StageCodes()
+    margins = {}
+    increment('chain_runs')
+    increment('tickets', len(df))
     
     # -------------------------------------------------------------------------
     # ÉTAPE 1 : Prédiction de l'urgence
     # -------------------------------------------------------------------------
-    urgency_pipeline = load_pipeline('urgency')
-    urgence_pred = predict_urgency(urgency_pipeline, df)
-    df['urgence_pred'] = urgence_pred
+    urgence_pred = predict_urgency_batch(load_pipeline('urgency'), df, text_cache, with_confidence, codes)
+    if with_confidence:
+        urgence_pred, margins['urgence_margin'] = urgence_pred
     
     # -------------------------------------------------------------------------
     # ÉTAPE 2 : Prédiction de la catégorie
     # -------------------------------------------------------------------------
-    category_pipeline = load_pipeline('category')
-    categorie_pred = predict_category(category_pipeline, df)
-    df['categorie_pred'] = categorie_pred
+    categorie_pred = predict_category_batch(load_pipeline('category'), df, text_cache, with_confidence, codes)
+    if with_confidence:
+        categorie_pred, margins['categorie_margin'] = categorie_pred
     
     # -------------------------------------------------------------------------
     # ÉTAPE 3 : Prédiction du type de ticket
     # -------------------------------------------------------------------------
-    type_pipeline = load_pipeline('type')
-    type_ticket_pred = predict_type(type_pipeline, df)
-    df['type_ticket_pred'] = type_ticket_pred
+    type_ticket_pred = predict_type_batch(load_pipeline('type'), df, text_cache, with_confidence, codes)
+    if with_confidence:
+        type_ticket_pred, margins['type_ticket_margin'] = type_ticket_pred
     
     # -------------------------------------------------------------------------
     # ÉTAPE 4 : Prédiction du temps de résolution
     # -------------------------------------------------------------------------
-    time_pipeline = load_pipeline('time')
-    temps_resolution_pred = predict_time(time_pipeline, df)
+    temps_resolution_pred = predict_time_batch(load_pipeline('time'), df, text_cache, codes)
     
-    # Construire le résultat (temps arrondi à 2 décimales)
-    result = {
+    return {
         'urgence_pred': urgence_pred,
         'categorie_pred': categorie_pred,
         'type_ticket_pred': type_ticket_pred,
-        'temps_resolution_pred': float(f"{temps_resolution_pred:.2f}")
+        'temps_resolution_pred': np.round(temps_resolution_pred.astype(float), 2),
+        **margins
+    }
+
+
+def predict_ticket(titre: str, texte: str, use_cache: bool = True) -> dict:
+    """
+    Pipeline complet de prédiction pour un ticket.
+    
+    Chaîne séquentielle :
+    1. Urgence → 2. Catégorie → 3. Type → 4. Temps
+    
+    Un ticket identique (après normalisation) à un ticket déjà prédit avec
+    les mêmes modèles est servi depuis le cache.
+    
+    Args:
+        titre: Titre du ticket
+        texte: Corps du texte du ticket
+        use_cache: Consulter / alimenter le cache de prédictions
+        
+    Returns:
+        Dictionnaire avec toutes les prédictions
+    """
+    # Valider l'entrée
+    with timed('validate'):
+        validate_input(titre, texte)
+    
+    # Préparer les features de base
+    with timed('prepare_features'):
+        df = prepare_features(titre, texte)
+    
+    # Cache (clé : text_full normalisé + version des modèles)
+    use_cache = use_cache and _CACHE.enabled
+    if use_cache:
+        text_full = df['text_full'].iloc[0]
+        version = model_bundle_version()
+        cached = _CACHE.get(text_full, version)
+        if cached is not None:
+            increment('cache_hits')
+            return cached
+    
+    # Exécuter la chaîne (une seule ligne)
+    preds = run_chain(df)
+    
+    # Construire le résultat (temps arrondi à 2 décimales)
+    result = {
+        'urgence_pred': preds['urgence_pred'][0],
+        'categorie_pred': preds['categorie_pred'][0],
+        'type_ticket_pred': preds['type_ticket_pred'][0],
+        'temps_resolution_pred': float(preds['temps_resolution_pred'][0])
+    }
+    
+    if use_cache:
+        _CACHE.put(text_full, version, result)
+    
+    return result
+
+
+def predict_ticket_with_confidence(titre: str, texte: str) -> dict:
+    """
+    Prédiction d'un ticket avec les marges de confiance des classifieurs.
+    
+    Utilisé par le routage hybride (modèles locaux / LLM) : une marge faible
+    signale un ticket sur lequel le modèle local hésite. Pas de cache ici,
+    les marges n'y sont pas conservées.
+    
+    Args:
+        titre: Titre du ticket
+        texte: Corps du texte du ticket
+        
+    Returns:
+        Dictionnaire des prédictions + urgence_margin, categorie_margin,
+        type_ticket_margin (entre 0 et 1)
+    """
+    with timed('validate'):
+        validate_input(titre, texte)
+    with timed('prepare_features'):
+        df = prepare_features(titre, texte)
+    preds = run_chain(df, with_confidence=True)
+    
+    return {
+        key: (values[0].item() if hasattr(values[0], 'item') else values[0])
+        for key, values in preds.items()
+    }
+
+
+def predict_tickets(records, validate: bool = True) -> dict:
+    """
+    Prédiction par lot : exécute la chaîne des 4 modèles sur N tickets à la fois.
+    
+    Les tickets invalides (voir validate_input) ne font pas échouer le lot :
+    leurs prédictions valent None et le message est reporté dans 'error'.
+    
+    Args:
+        records: Itérable de dicts {'titre': ..., 'texte': ...}, de tuples
+            (titre, texte) ou DataFrame avec les colonnes titre/texte
+        validate: Appliquer validate_input à chaque ticket
+        
+    Returns:
+        Résultats en colonnes (une liste par clé, dans l'ordre des records) :
+        urgence_pred, categorie_pred, type_ticket_pred, temps_resolution_pred, error
+    """
+    titres, textes = split_records(records)
+    n = len(titres)
+    
+    # Validation ligne par ligne (sans interrompre le lot)
+    errors = [None] * n
+    if validate:
+        with timed('validate'):
+            for i in range(n):
+                try:
+                    validate_input(titres[i], textes[i])
+                except ValueError as e:
+                    errors[i] = str(e).strip()
+        increment('invalid_tickets', sum(e is not None for e in errors))
+    valid_idx = [i for i in range(n) if errors[i] is None]
+    
+    result = {
+        'urgence_pred': [None] * n,
+        'categorie_pred': [None] * n,
+        'type_ticket_pred': [None] * n,
+        'temps_resolution_pred': [None] * n,
+        'error': errors
     }
+    if not valid_idx:
+        return result
+    
+    # Une seule frame text_full/nb_mots pour tous les tickets valides
+    with timed('prepare_features'):
+        df = prepare_features_batch(
+            [titres[i] for i in valid_idx],
+            [textes[i] for i in valid_idx]
+        )
+    preds = run_chain(df)
+    
+    for key, values in preds.items():
+        column = result[key]
+        for pos, i in enumerate(valid_idx):
+            column[i] = values[pos].item() if hasattr(values[pos], 'item') else values[pos]
     
     return result
 
@@ -390,9 +825,107 @@ def display_results(result: dict) -> None:
 # INTERFACE CLI
 # =============================================================================
 
-def main():
+# Taille par défaut des paquets de tickets en mode fichier / flux
+DEFAULT_CHUNK_SIZE = 512
+
+
+def detect_format(path: str, fmt: str = None) -> str:
     """
-    Point d'entrée CLI pour l'inférence interactive.
+    Détermine le format d'un fichier d'entrée ('csv' ou 'jsonl').
+    
+    Args:
+        path: Chemin du fichier ('-' pour stdin)
+        fmt: Format explicite (prioritaire)
+        
+    Returns:
+        'csv' ou 'jsonl'
+    """
+    if fmt:
+        return fmt
+    if path != '-' and path.lower().endswith('.csv'):
+        return 'csv'
+    return 'jsonl'
+
+
+def iter_record_chunks(stream, fmt: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Lit un flux de tickets par paquets de taille fixe.
+    
+    Args:
+        stream: Flux texte ouvert (fichier ou stdin)
+        fmt: 'csv' ou 'jsonl'
+        chunk_size: Nombre de tickets par paquet
+        
+    Yields:
+        Listes de dicts (au plus chunk_size éléments)
+        
+    Les lignes JSONL invalides sont ignorées et signalées sur stderr
+    (numéro de ligne) sans interrompre le traitement du flux.
+    """
+    if fmt == 'csv':
+        for chunk in pd.read_csv(stream, chunksize=chunk_size, dtype=str, keep_default_na=False):
+            yield chunk.to_dict(orient='records')
+        return
+    
+    chunk = []
+    for line_no, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            print(f"⚠️ Ligne {line_no} ignorée (JSON invalide : {e})", file=sys.stderr)
+            continue
+        if not isinstance(record, dict):
+            print(f"⚠️ Ligne {line_no} ignorée (objet JSON attendu)", file=sys.stderr)
+            continue
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def predict_stream(stream_in, stream_out, fmt: str = 'jsonl',
+                   chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """
+    Prédit un flux de tickets paquet par paquet et écrit les résultats en JSONL.
+    
+    La mémoire reste constante quelle que soit la taille de l'entrée : chaque
+    paquet est prédit en un seul lot puis écrit immédiatement.
+    
+    Args:
+        stream_in: Flux d'entrée (CSV ou JSONL avec titre/texte)
+        stream_out: Flux de sortie JSONL
+        fmt: Format d'entrée ('csv' ou 'jsonl')
+        chunk_size: Nombre de tickets par lot
+        
+    Returns:
+        Nombre de tickets traités
+    """
+    keys = ('urgence_pred', 'categorie_pred', 'type_ticket_pred', 'temps_resolution_pred', 'error')
+    n_total = 0
+    
+    for chunk in iter_record_chunks(stream_in, fmt, chunk_size):
+        preds = predict_tickets(chunk)
+        for i, rec in enumerate(chunk):
+            out = {}
+            if 'ID' in rec:
+                out['ID'] = rec['ID']
+            for key in keys:
+                out[key] = preds[key][i]
+            stream_out.write(json.dumps(out, ensure_ascii=False) + "\n")
+        stream_out.flush()
+        n_total += len(chunk)
+    
+    return n_total
+
+
+def run_interactive():
+    """
+    Mode interactif : saisie d'un ticket au clavier.
     """
     print("\n" + "=" * 50)
     print("🎫 SYSTÈME DE PRÉDICTION DE TICKETS")
@@ -400,37 +933,112 @@ def main():
     print("Entrez les informations du ticket ci-dessous.")
     print()
     
+    # Demander les entrées utilisateur
+    print("📌 Titre du ticket:")
+    titre = input("   > ").strip()
+    
+    print("\n📝 Description/Texte du ticket:")
+    texte = input("   > ").strip()
+    
+    # Exécuter la prédiction
+    result = predict_ticket(titre, texte)
+    
+    # Afficher les résultats
+    display_results(result)
+    
+    return result
+
+
+def run_batch(input_path: str, output_path: str, fmt: str = None,
+              chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """
+    Mode fichier / flux : lit input_path ('-' = stdin), écrit output_path ('-' = stdout).
+    
+    Returns:
+        Nombre de tickets traités
+    """
+    fmt = detect_format(input_path, fmt)
+    
+    stream_in = sys.stdin if input_path == '-' else open(input_path, 'r', encoding='utf-8', newline='')
+    stream_out = sys.stdout if output_path == '-' else open(output_path, 'w', encoding='utf-8')
+    
     try:
-        # Demander les entrées utilisateur
-        print("📌 Titre du ticket:")
-        titre = input("   > ").strip()
-        
-        print("\n📝 Description/Texte du ticket:")
-        texte = input("   > ").strip()
-        
-        # Exécuter la prédiction
-        result = predict_ticket(titre, texte)
-        
-        # Afficher les résultats
-        display_results(result)
-        
-        return result
+        n_total = predict_stream(stream_in, stream_out, fmt=fmt, chunk_size=chunk_size)
+    finally:
+        if stream_in is not sys.stdin:
+            stream_in.close()
+        if stream_out is not sys.stdout:
+            stream_out.close()
+    
+    # Les messages vont sur stderr pour ne pas polluer la sortie JSONL
+    print(f"✅ {n_total} tickets prédits → {output_path}", file=sys.stderr)
+    return n_total
+
+
+def parse_args(argv=None):
+    """Analyse les arguments de la ligne de commande."""
+    import argparse
+    
+    parser = argparse.ArgumentParser(
+        description="Prédiction de tickets (urgence, catégorie, type, temps de résolution)."
+    )
+    parser.add_argument('--input', '-i',
+                        help="Fichier CSV/JSONL de tickets (titre, texte). '-' pour stdin. "
+                             "Sans cette option : mode interactif.")
+    parser.add_argument('--output', '-o', default='-',
+                        help="Fichier JSONL de sortie ('-' pour stdout, par défaut).")
+    parser.add_argument('--format', choices=['csv', 'jsonl'],
+                        help="Format d'entrée (déduit de l'extension, jsonl pour stdin).")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"Nombre de tickets par lot (défaut: {DEFAULT_CHUNK_SIZE}).")
+    parser.add_argument('--metrics',
+                        help="Activer la mesure de latence par étape et l'écrire dans ce fichier "
+                             "(.prom : format Prometheus, sinon JSON).")
+    return parser.parse_args(argv)
+
+
+def write_metrics(path: str) -> None:
+    """Écrit les latences par étape (JSON, ou texte Prometheus si .prom)."""
+    if path.endswith('.prom'):
+        content = latency_metrics.to_prometheus()
+    else:
+        content = latency_metrics.to_json()
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+
+def main(argv=None):
+    """
+    Point d'entrée CLI : mode interactif, ou mode fichier/flux avec --input.
+    """
+    args = parse_args(argv)
+    if args.metrics:
+        latency_metrics.enable()
+    
+    try:
+        if args.input:
+            return run_batch(args.input, args.output, args.format, args.chunk_size)
+        return run_interactive()
         
     except FileNotFoundError as e:
-        print(str(e))
+        print(str(e), file=sys.stderr)
         sys.exit(1)
         
     except ValueError as e:
-        print(str(e))
+        print(str(e), file=sys.stderr)
         sys.exit(1)
         
     except KeyboardInterrupt:
-        print("\n\n⚠️ Annulé par l'utilisateur.")
+        print("\n\n⚠️ Annulé par l'utilisateur.", file=sys.stderr)
         sys.exit(0)
         
     except Exception as e:
-        print(f"\n❌ Erreur inattendue: {e}")
+        print(f"\n❌ Erreur inattendue: {e}", file=sys.stderr)
         sys.exit(1)
+        
+    finally:
+        if args.metrics:
+            write_metrics(args.metrics)
 
 
 # =============================================================================
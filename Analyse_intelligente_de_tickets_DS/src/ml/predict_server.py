@@ -0,0 +1,311 @@
+# =============================================================================
+# Service de Prédiction Local - Micro-batching (asyncio)
+# =============================================================================
+"""
+Service HTTP local autour de predict_pipeline.
+
+Les requêtes unitaires sont mises en file d'attente puis regroupées : dès
+qu'une requête arrive, le service attend au plus MAX_WAIT_MS millisecondes
+(ou MAX_BATCH requêtes) et exécute la chaîne des 4 modèles une seule fois
+pour tout le lot (predict_tickets). Le calcul tourne dans un thread pour ne
+pas bloquer la boucle asyncio.
+
+Endpoints :
+    POST /predict   {"titre": "...", "texte": "..."}  -> prédictions du ticket
+    GET  /health                                      -> état + statistiques
+    GET  /metrics                                     -> latence par étape (Prometheus)
+
+Latence par étape : activée par PIPELINE_METRICS=1 ou --metrics.
+
+Usage :
+    python src/ml/predict_server.py --port 8765 --max-batch 64 --max-wait-ms 5
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import latency_metrics
+from predict_pipeline import predict_tickets, get_registry, PIPELINE_FILES
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_MAX_BATCH = 64        # Taille maximale d'un lot
+DEFAULT_MAX_WAIT_MS = 5.0     # Attente maximale avant d'exécuter un lot incomplet
+MAX_BODY_BYTES = 1 << 20      # Taille maximale d'une requête (1 Mo)
+
+RESULT_KEYS = ('urgence_pred', 'categorie_pred', 'type_ticket_pred', 'temps_resolution_pred')
+
+
+# =============================================================================
+# MICRO-BATCHER
+# =============================================================================
+
+class MicroBatcher:
+    """
+    Regroupe les tickets soumis individuellement en lots pour predict_tickets.
+
+    Args:
+        predict_fn: Fonction de prédiction par lot (records -> résultats en colonnes)
+        max_batch: Nombre maximal de tickets par lot
+        max_wait_ms: Délai maximal (ms) entre le premier ticket et l'exécution du lot
+    """
+
+    def __init__(self, predict_fn=predict_tickets,
+                 max_batch: int = DEFAULT_MAX_BATCH,
+                 max_wait_ms: float = DEFAULT_MAX_WAIT_MS):
+        self.predict_fn = predict_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = None
+        self._worker = None
+        self.n_requests = 0
+        self.n_batches = 0
+
+    async def start(self) -> None:
+        """Démarre la tâche de regroupement (à appeler dans la boucle asyncio)."""
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        """Arrête la tâche de regroupement."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+
+    async def submit(self, record: dict) -> dict:
+        """
+        Soumet un ticket et attend sa prédiction.
+
+        Args:
+            record: {'titre': ..., 'texte': ...}
+
+        Returns:
+            Dict des prédictions (avec 'error' si le ticket est invalide)
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((record, future))
+        return await future
+
+    async def _collect(self) -> list:
+        # Attendre le premier ticket, puis compléter le lot jusqu'à l'échéance
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            records = [record for record, _ in batch]
+            try:
+                preds = await loop.run_in_executor(None, self.predict_fn, records)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.n_requests += len(batch)
+            self.n_batches += 1
+            for i, (_, future) in enumerate(batch):
+                if not future.done():
+                    future.set_result({key: values[i] for key, values in preds.items()})
+
+    def stats(self) -> dict:
+        """Statistiques de regroupement."""
+        return {
+            'requests': self.n_requests,
+            'batches': self.n_batches,
+            'avg_batch_size': self.n_requests / self.n_batches if self.n_batches else 0.0,
+            'queue_size': self._queue.qsize() if self._queue else 0,
+            'max_batch': self.max_batch,
+            'max_wait_ms': self.max_wait * 1000.0,
+        }
+
+
+# =============================================================================
+# SERVEUR HTTP (asyncio, sans dépendance externe)
+# =============================================================================
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            413: 'Payload Too Large', 422: 'Unprocessable Entity', 500: 'Internal Server Error'}
+
+
+async def _write_json(writer, status: int, payload, keep_alive: bool) -> None:
+    # Les réponses texte (str) sont envoyées telles quelles (format Prometheus)
+    if isinstance(payload, str):
+        body = payload.encode('utf-8')
+        content_type = "text/plain; version=0.0.4; charset=utf-8"
+    else:
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        content_type = "application/json; charset=utf-8"
+    head = (
+        f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    ).encode('ascii')
+    writer.write(head + body)
+    await writer.drain()
+
+
+async def _read_request(reader):
+    """Lit une requête HTTP/1.1 ; retourne (méthode, chemin, en-têtes, corps) ou None."""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    parts = request_line.decode('latin-1').split()
+    if len(parts) < 2:
+        raise ValueError("Requête HTTP invalide")
+    method, path = parts[0].upper(), parts[1]
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get('content-length', 0) or 0)
+    if length > MAX_BODY_BYTES:
+        raise OverflowError("Requête trop volumineuse")
+    body = await reader.readexactly(length) if length else b''
+    return method, path, headers, body
+
+
+class PredictionServer:
+    """
+    Serveur HTTP local exposant /predict (micro-batché), /health et /metrics.
+    """
+
+    def __init__(self, batcher: MicroBatcher):
+        self.batcher = batcher
+        self.started_at = time.time()
+
+    async def handle(self, reader, writer) -> None:
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except OverflowError as e:
+                    await _write_json(writer, 413, {'error': str(e)}, keep_alive=False)
+                    break
+                except (ValueError, asyncio.IncompleteReadError) as e:
+                    await _write_json(writer, 400, {'error': str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+
+                method, path, headers, body = request
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                status, payload = await self.dispatch(method, path, body)
+                await _write_json(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method: str, path: str, body: bytes):
+        """Retourne (code HTTP, réponse JSON) pour une requête."""
+        path = path.split('?', 1)[0]
+
+        if path == '/health':
+            return 200, {
+                'status': 'ok',
+                'uptime_s': round(time.time() - self.started_at, 1),
+                'models': get_registry().info(),
+                'batching': self.batcher.stats(),
+                'latency': latency_metrics.snapshot()['sections'],
+            }
+
+        if path == '/metrics':
+            return 200, latency_metrics.to_prometheus()
+
+        if path != '/predict':
+            return 404, {'error': f"Chemin inconnu: {path}"}
+        if method != 'POST':
+            return 405, {'error': "Utiliser POST /predict"}
+
+        try:
+            record = json.loads(body or b'{}')
+            if not isinstance(record, dict):
+                raise ValueError("Objet JSON attendu")
+        except ValueError as e:
+            return 400, {'error': f"JSON invalide: {e}"}
+
+        try:
+            result = await self.batcher.submit({'titre': record.get('titre'), 'texte': record.get('texte')})
+        except Exception as e:
+            return 500, {'error': str(e)}
+
+        if result.get('error'):
+            return 422, result
+        return 200, {key: result[key] for key in RESULT_KEYS}
+
+
+async def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                max_batch: int = DEFAULT_MAX_BATCH,
+                max_wait_ms: float = DEFAULT_MAX_WAIT_MS) -> None:
+    """Démarre le service et le maintient jusqu'à interruption."""
+    # Charger les modèles avant d'accepter des requêtes
+    get_registry().preload(PIPELINE_FILES)
+
+    batcher = MicroBatcher(max_batch=max_batch, max_wait_ms=max_wait_ms)
+    await batcher.start()
+    server = PredictionServer(batcher)
+
+    srv = await asyncio.start_server(server.handle, host, port)
+    print(f"✅ Service de prédiction sur http://{host}:{port} "
+          f"(max_batch={max_batch}, max_wait={max_wait_ms} ms)")
+    try:
+        async with srv:
+            await srv.serve_forever()
+    finally:
+        await batcher.stop()
+
+
+# =============================================================================
+# POINT D'ENTRÉE
+# =============================================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Service local de prédiction (micro-batching)")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH,
+                        help=f"Tickets maximum par lot (défaut: {DEFAULT_MAX_BATCH})")
+    parser.add_argument('--max-wait-ms', type=float, default=DEFAULT_MAX_WAIT_MS,
+                        help=f"Attente maximale avant exécution d'un lot (défaut: {DEFAULT_MAX_WAIT_MS} ms)")
+    parser.add_argument('--metrics', action='store_true',
+                        help="Activer la mesure de latence par étape (GET /metrics)")
+    args = parser.parse_args()
+    if args.metrics:
+        latency_metrics.enable()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.max_batch, args.max_wait_ms))
+    except KeyboardInterrupt:
+        print("\n⚠️ Service arrêté.")
@@ -0,0 +1,178 @@
+# =============================================================================
+# Cache de Prédictions - Correspondance exacte
+# =============================================================================
+"""
+Cache LRU borné placé devant predict_ticket.
+
+La clé est une empreinte du text_full normalisé (minuscules, espaces
+compactés) et de la version des modèles chargés : un ticket re-soumis à
+l'identique réutilise la prédiction déjà calculée. Quand les modèles sont
+rechargés, la version change et le cache est vidé automatiquement.
+
+Options :
+    - TTL (secondes) : les entrées expirées sont ignorées puis supprimées
+    - Persistance sur disque (JSON) : rechargée au démarrage, écrite par save()
+      et à la sortie du processus
+"""
+
+import os
+import json
+import time
+import atexit
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+def normalize_text(text_full: str) -> str:
+    """
+    Normalise text_full pour la clé de cache.
+
+    Les modèles sont insensibles à la casse (TF-IDF lowercase) et aux espaces
+    (tokenisation, nb_mots) : deux textes de même forme normalisée ont donc
+    exactement les mêmes prédictions.
+    """
+    return ' '.join((text_full or '').lower().split())
+
+
+def cache_key(text_full: str, model_version: str) -> str:
+    """Empreinte SHA-256 du texte normalisé et de la version des modèles."""
+    payload = f"{model_version}\n{normalize_text(text_full)}".encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()
+
+
+class PredictionCache:
+    """
+    Cache LRU thread-safe des prédictions.
+
+    Args:
+        maxsize: Nombre maximal d'entrées (0 = cache désactivé)
+        ttl: Durée de vie d'une entrée en secondes (None ou 0 = illimitée)
+        path: Fichier JSON de persistance (optionnel)
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None,
+                 path: Optional[str] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl or None
+        self.path = path
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+        if path:
+            self.load()
+            atexit.register(self.save)
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    # -------------------------------------------------------------------------
+    # Accès
+    # -------------------------------------------------------------------------
+
+    def get(self, text_full: str, model_version: str) -> Optional[Dict[str, Any]]:
+        """
+        Retourne la prédiction en cache (copie) ou None.
+
+        Args:
+            text_full: Texte complet du ticket
+            model_version: Version des modèles actuellement chargés
+        """
+        if not self.enabled:
+            return None
+        key = cache_key(text_full, model_version)
+        with self._lock:
+            self._check_version(model_version)
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            value, stored_at = item
+            if self.ttl and time.time() - stored_at > self.ttl:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return dict(value)
+
+    def put(self, text_full: str, model_version: str, value: Dict[str, Any]) -> None:
+        """Enregistre une prédiction (évince l'entrée la moins récente si plein)."""
+        if not self.enabled:
+            return
+        key = cache_key(text_full, model_version)
+        with self._lock:
+            self._check_version(model_version)
+            self._data[key] = (dict(value), time.time())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Vide le cache (les compteurs sont conservés)."""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Compteurs du cache (hits, misses, hit_rate, taille...)."""
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+            'model_version': self._version,
+        }
+
+    def _check_version(self, model_version: str) -> None:
+        # Modèles rechargés : les anciennes entrées ne peuvent plus servir
+        if self._version is not None and model_version != self._version and self._data:
+            self._data.clear()
+            self.invalidations += 1
+        self._version = model_version
+
+    # -------------------------------------------------------------------------
+    # Persistance
+    # -------------------------------------------------------------------------
+
+    def load(self) -> None:
+        """Recharge le cache depuis le fichier JSON (s'il existe et est lisible)."""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            self._version = payload.get('model_version')
+            for key, value, stored_at in payload.get('entries', [])[-self.maxsize:]:
+                self._data[key] = (value, stored_at)
+
+    def save(self) -> None:
+        """Écrit le cache dans le fichier JSON (écriture atomique)."""
+        if not self.path:
+            return
+        with self._lock:
+            payload = {
+                'model_version': self._version,
+                'entries': [[k, v, t] for k, (v, t) in self._data.items()],
+            }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
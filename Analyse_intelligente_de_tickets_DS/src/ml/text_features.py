@@ -0,0 +1,182 @@
+# =============================================================================
+# Features Texte Partagées - Vectorisation TF-IDF unique
+# =============================================================================
+"""
+Outils pour partager la vectorisation TF-IDF entre les 4 étapes de la chaîne.
+
+Chaque pipeline (urgency, category, type, time) embarque son TfidfVectorizer.
+Quand ces vectoriseurs sont identiques (même paramètres, vocabulaire et idf),
+la matrice TF-IDF de text_full n'a besoin d'être calculée qu'une seule fois
+par lot. Deux vectoriseurs sont reconnus identiques grâce à leur empreinte
+(tfidf_id), enregistrée à l'entraînement ou calculée au chargement.
+
+À l'entraînement (SHARED_TFIDF=1, défaut), les scripts produisent un seul
+artefact models/text_vectorizer.pkl réutilisé par toutes les étapes. Des
+pipelines entraînés séparément (SHARED_TFIDF=0) ont chacun leur vocabulaire :
+rien n'est alors partagé, il faut ré-entraîner la chaîne pour en profiter.
+
+Au chargement, l'empreinte est toujours recalculée sur le vectoriseur embarqué
+par l'étape ; l'artefact partagé n'est substitué que si son empreinte est
+identique (un fichier périmé est ignoré avec un avertissement).
+"""
+
+import os
+import hashlib
+import logging
+import weakref
+from typing import Any, Dict, Optional
+
+import joblib
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+# Artefact du vectoriseur TF-IDF partagé (dans models/)
+SHARED_TFIDF_FILE = "text_vectorizer.pkl"
+
+# Vectoriseurs déjà chargés, indexés par empreinte (une seule copie en mémoire)
+_VECTORIZERS = weakref.WeakValueDictionary()
+
+# Artefact partagé chargé : chemin -> (mtime, vectoriseur, empreinte)
+_SHARED_FILES: Dict[str, tuple] = {}
+
+
+# =============================================================================
+# EMPREINTE DU VECTORISEUR
+# =============================================================================
+
+def tfidf_fingerprint(tfidf: Any) -> str:
+    """
+    Calcule l'empreinte d'un TfidfVectorizer entraîné.
+
+    L'empreinte couvre les paramètres, le vocabulaire (terme -> colonne) et
+    le vecteur idf : deux vectoriseurs de même empreinte produisent la même
+    matrice pour le même texte.
+
+    Args:
+        tfidf: TfidfVectorizer entraîné
+
+    Returns:
+        Empreinte hexadécimale (16 caractères)
+    """
+    digest = hashlib.sha256()
+    params = tfidf.get_params()
+    digest.update(repr(sorted((k, repr(v)) for k, v in params.items())).encode('utf-8'))
+    for term, col in sorted(tfidf.vocabulary_.items(), key=lambda kv: kv[1]):
+        digest.update(f"{col}:{term}\n".encode('utf-8'))
+    idf = getattr(tfidf, 'idf_', None)
+    if idf is not None:
+        digest.update(np.ascontiguousarray(idf, dtype=np.float64).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def load_shared_vectorizer(filepath: str) -> Optional[tuple]:
+    """
+    Charge l'artefact TF-IDF partagé (une fois par version du fichier).
+
+    Args:
+        filepath: Chemin de models/text_vectorizer.pkl
+
+    Returns:
+        Tuple (vectoriseur, empreinte), ou None si le fichier est absent
+    """
+    try:
+        mtime = os.path.getmtime(filepath)
+    except OSError:
+        return None
+    cached = _SHARED_FILES.get(filepath)
+    if cached is None or cached[0] != mtime:
+        tfidf = joblib.load(filepath)
+        cached = (mtime, tfidf, tfidf_fingerprint(tfidf))
+        _SHARED_FILES[filepath] = cached
+    return cached[1], cached[2]
+
+
+def attach_tfidf_id(pipeline: Dict[str, Any], models_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Renseigne pipeline['tfidf_id'] et déduplique le vectoriseur en mémoire.
+
+    L'empreinte est recalculée sur le vectoriseur de l'étape (l'identifiant
+    enregistré à l'entraînement n'est qu'indicatif). Si le pipeline référence
+    l'artefact partagé (tfidf_file) et que son empreinte est identique, cet
+    artefact remplace la copie embarquée ; sinon l'étape garde la sienne.
+    Les pipelines de même empreinte partagent ensuite le même objet.
+
+    Args:
+        pipeline: Dictionnaire pipeline chargé depuis un .pkl
+        models_dir: Dossier des modèles (pour résoudre tfidf_file)
+
+    Returns:
+        Le même dictionnaire, complété
+    """
+    tfidf = pipeline.get('tfidf')
+    if tfidf is None:
+        return pipeline
+
+    tfidf_id = tfidf_fingerprint(tfidf)
+    recorded = pipeline.get('tfidf_id')
+    if recorded and recorded != tfidf_id:
+        logger.warning("tfidf_id enregistré (%s) différent du vectoriseur embarqué (%s)",
+                       recorded, tfidf_id)
+    pipeline['tfidf_id'] = tfidf_id
+
+    shared = _VECTORIZERS.get(tfidf_id)
+    if shared is None and pipeline.get('tfidf_file') and models_dir:
+        filepath = os.path.join(models_dir, pipeline['tfidf_file'])
+        loaded = load_shared_vectorizer(filepath)
+        if loaded is None:
+            logger.warning("Vectoriseur partagé absent (%s) : copie embarquée utilisée", filepath)
+        elif loaded[1] != tfidf_id:
+            logger.warning("Vectoriseur partagé périmé (%s, empreinte %s != %s) : copie embarquée utilisée",
+                           filepath, loaded[1], tfidf_id)
+        else:
+            shared = loaded[0]
+            _VECTORIZERS[tfidf_id] = shared
+
+    if shared is None:
+        _VECTORIZERS[tfidf_id] = tfidf
+    else:
+        pipeline['tfidf'] = shared
+    return pipeline
+
+
+# =============================================================================
+# CACHE DE MATRICES TF-IDF (portée : un lot)
+# =============================================================================
+
+class TextMatrixCache:
+    """
+    Mémorise les matrices TF-IDF d'un lot de tickets pour toute la chaîne.
+
+    Le cache est créé pour un lot (une DataFrame) et indexé par
+    (tfidf_id, colonne texte) : les étapes dont le vectoriseur est identique
+    réutilisent la même matrice au lieu de re-tokeniser text_full.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self._matrices = {}
+
+    def transform(self, pipeline: Dict[str, Any]):
+        """
+        Retourne la matrice TF-IDF du lot pour le vectoriseur du pipeline.
+
+        Args:
+            pipeline: Pipeline chargé (tfidf, text_column, tfidf_id optionnel)
+
+        Returns:
+            Matrice sparse TF-IDF (n_tickets x n_termes)
+        """
+        tfidf = pipeline['tfidf']
+        text_col = pipeline['text_column']
+        key = (pipeline.get('tfidf_id') or id(tfidf), text_col)
+
+        X_text = self._matrices.get(key)
+        if X_text is None:
+            X_text = tfidf.transform(self.df[text_col].fillna(''))
+            self._matrices[key] = X_text
+        return X_text
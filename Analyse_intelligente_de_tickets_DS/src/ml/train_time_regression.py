@@ -50,7 +50,8 @@ warnings.filterwarnings('ignore')
 from ml_utils import (
     ensure_models_dir, save_metadata,
     evaluate_regression,
-    TFIDF_PARAMS, RANDOM_STATE, MODELS_DIR
+    fit_text_vectorizer, tfidf_pipeline_fields,
+    TFIDF_PARAMS, USE_SHARED_TFIDF, RANDOM_STATE, MODELS_DIR
 )
 
 # Essayer d'importer XGBoost si disponible
@@ -213,8 +214,8 @@ def train_time_model_regularized(df_train: pd.DataFrame = None,
     
     # TF-IDF
     print("   Vectorisation TF-IDF...")
-    tfidf = TfidfVectorizer(**TFIDF_PARAMS)
-    X_text_train = tfidf.fit_transform(df_train[TEXT_COLUMN].fillna(''))
+    # (mode SHARED_TFIDF : réutilise models/text_vectorizer.pkl)
+    tfidf, X_text_train = fit_text_vectorizer(df_train[TEXT_COLUMN])
     X_text_val = tfidf.transform(df_val[TEXT_COLUMN].fillna(''))
     X_text_test = tfidf.transform(df_test[TEXT_COLUMN].fillna(''))
     
@@ -429,6 +430,7 @@ def train_time_model_regularized(df_train: pd.DataFrame = None,
     pipeline_dict = {
         'model': model,
         'tfidf': tfidf,
+        **tfidf_pipeline_fields(tfidf),
         'encoder': encoder,
         'text_column': TEXT_COLUMN,
         'numeric_columns': NUMERIC_COLUMNS,
@@ -463,7 +465,8 @@ def train_time_model_regularized(df_train: pd.DataFrame = None,
                 'text': TEXT_COLUMN,
                 'numeric': NUMERIC_COLUMNS,
                 'categorical_pred': CATEGORICAL_PRED_COLUMNS,
-                'tfidf_params': TFIDF_PARAMS
+                'tfidf_params': TFIDF_PARAMS,
+                'shared_tfidf': USE_SHARED_TFIDF
             },
             'target': TARGET_COLUMN,
             'metrics': {
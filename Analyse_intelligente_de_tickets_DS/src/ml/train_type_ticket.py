@@ -29,7 +29,8 @@ warnings.filterwarnings('ignore')
 from ml_utils import (
     ensure_models_dir, save_model, save_metadata,
     evaluate_classification,
-    TFIDF_PARAMS, RANDOM_STATE, N_FOLDS, MODELS_DIR
+    fit_text_vectorizer, tfidf_pipeline_fields,
+    TFIDF_PARAMS, USE_SHARED_TFIDF, RANDOM_STATE, N_FOLDS, MODELS_DIR
 )
 
 # =============================================================================
@@ -212,8 +213,8 @@ def train_type_model(df_train: pd.DataFrame = None,
     print("-" * 70)
     
     # TF-IDF
-    tfidf_final = TfidfVectorizer(**TFIDF_PARAMS)
-    X_text_train = tfidf_final.fit_transform(df_train[TEXT_COLUMN].fillna(''))
+    # (mode SHARED_TFIDF : réutilise models/text_vectorizer.pkl)
+    tfidf_final, X_text_train = fit_text_vectorizer(df_train[TEXT_COLUMN])
     
     # Features numériques
     X_num_train = df_train[NUMERIC_COLUMNS].values
@@ -290,6 +291,7 @@ def train_type_model(df_train: pd.DataFrame = None,
     pipeline_dict = {
         'model': final_model,
         'tfidf': tfidf_final,
+        **tfidf_pipeline_fields(tfidf_final),
         'encoder': encoder,
         'text_column': TEXT_COLUMN,
         'numeric_columns': NUMERIC_COLUMNS,
@@ -308,7 +310,8 @@ def train_type_model(df_train: pd.DataFrame = None,
                 'text': TEXT_COLUMN,
                 'numeric': NUMERIC_COLUMNS,
                 'categorical_pred': CATEGORICAL_PRED_COLUMNS,
-                'tfidf_params': TFIDF_PARAMS
+                'tfidf_params': TFIDF_PARAMS,
+                'shared_tfidf': USE_SHARED_TFIDF
             },
             'classes': TYPE_LABELS,
             'metrics': {
@@ -28,7 +28,8 @@ warnings.filterwarnings('ignore')
 from ml_utils import (
     load_data, ensure_models_dir, save_model, save_metadata,
     evaluate_classification, generate_oof_predictions_classification,
-    TFIDF_PARAMS, RANDOM_STATE, N_FOLDS, MODELS_DIR
+    fit_text_vectorizer, tfidf_pipeline_fields,
+    TFIDF_PARAMS, USE_SHARED_TFIDF, RANDOM_STATE, N_FOLDS, MODELS_DIR
 )
 
 # =============================================================================
@@ -139,8 +140,8 @@ def train_urgency_model():
     print("-" * 70)
     
     # Créer et fitter le vectorizer TF-IDF final
-    tfidf_final = TfidfVectorizer(**TFIDF_PARAMS)
-    X_text_train = tfidf_final.fit_transform(df_train[TEXT_COLUMN].fillna(''))
+    # (mode SHARED_TFIDF : premier modèle de la chaîne → ré-entraîne l'artefact partagé)
+    tfidf_final, X_text_train = fit_text_vectorizer(df_train[TEXT_COLUMN], refit=True)
     
     # Ajouter les features numériques
     X_num_train = df_train[NUMERIC_COLUMNS].values
@@ -211,6 +212,7 @@ def train_urgency_model():
     pipeline_dict = {
         'model': final_model,
         'tfidf': tfidf_final,
+        **tfidf_pipeline_fields(tfidf_final),
         'text_column': TEXT_COLUMN,
         'numeric_columns': NUMERIC_COLUMNS,
         'target_column': TARGET_COLUMN,
@@ -227,7 +229,8 @@ def train_urgency_model():
             'features': {
                 'text': TEXT_COLUMN,
                 'numeric': NUMERIC_COLUMNS,
-                'tfidf_params': TFIDF_PARAMS
+                'tfidf_params': TFIDF_PARAMS,
+                'shared_tfidf': USE_SHARED_TFIDF
             },
             'classes': URGENCY_LABELS,
             'metrics': {
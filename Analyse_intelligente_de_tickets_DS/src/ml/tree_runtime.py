@@ -0,0 +1,125 @@
+# =============================================================================
+# Runtime Arbres - Chemin rapide du modèle de temps de résolution
+# =============================================================================
+"""
+Inférence directe sur le booster XGBoost du modèle de temps.
+
+XGBRegressor.predict passe par le wrapper sklearn et utilise les threads
+d'entraînement (n_jobs=-1) : pour un seul ticket, le coût du pool de threads
+dépasse celui des arbres. Ici, le booster est copié une fois au chargement
+et configuré pour l'inférence :
+
+    - lots de petite taille (<= TREE_SMALL_BATCH lignes) : 1 thread
+    - lots plus grands : TREE_NTHREAD threads
+
+La prédiction se fait en place (inplace_predict) sur la matrice CSR, sans
+construire de DMatrix, avec la meilleure itération de l'early stopping.
+
+Si le modèle n'est pas un XGBRegressor (GradientBoostingRegressor quand
+XGBoost n'était pas installé à l'entraînement) ou si xgboost est absent,
+model.predict est utilisé tel quel.
+
+Variables d'environnement :
+    TREE_FAST_PATH=0        désactive le chemin rapide
+    TREE_NTHREAD=4          threads pour les grands lots
+    TREE_SMALL_BATCH=64     taille de lot traitée sur un seul thread
+"""
+
+import os
+from typing import Any, Callable, Dict
+
+import numpy as np
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+TREE_FAST_PATH = os.getenv("TREE_FAST_PATH", "1") == "1"
+TREE_NTHREAD = int(os.getenv("TREE_NTHREAD", str(min(4, os.cpu_count() or 1))))
+TREE_SMALL_BATCH = int(os.getenv("TREE_SMALL_BATCH", "64"))
+
+
+# =============================================================================
+# BOOSTER XGBOOST
+# =============================================================================
+
+class BoosterPredictor:
+    """
+    Prédicteur XGBoost configuré pour l'inférence.
+
+    Args:
+        model: XGBRegressor entraîné
+        nthread: Threads utilisés pour les lots de plus de small_batch lignes
+        small_batch: Taille de lot jusqu'à laquelle un seul thread est utilisé
+    """
+
+    def __init__(self, model: Any, nthread: int = TREE_NTHREAD,
+                 small_batch: int = TREE_SMALL_BATCH):
+        booster = model.get_booster()
+        self.small_batch = small_batch
+
+        # Deux copies : les paramètres d'un booster ne se changent pas
+        # sans risque pendant qu'un autre thread prédit
+        self._single = booster.copy()
+        self._single.set_param({'nthread': 1})
+        self._multi = booster.copy()
+        self._multi.set_param({'nthread': max(1, nthread)})
+
+        # Même nombre d'arbres que XGBRegressor.predict (early stopping)
+        best_iteration = getattr(model, 'best_iteration', None)
+        self.iteration_range = (0, best_iteration + 1) if best_iteration is not None else (0, 0)
+        self.n_features = booster.num_features()
+
+    def predict(self, X) -> np.ndarray:
+        """Prédiction en place sur une matrice CSR (une valeur par ligne)."""
+        if not hasattr(X, 'tocsr'):
+            raise TypeError("Matrice sparse attendue")
+        X = X.tocsr()
+        if X.shape[1] != self.n_features:
+            raise ValueError(
+                f"{X.shape[1]} features reçues, {self.n_features} attendues par le booster"
+            )
+
+        booster = self._single if X.shape[0] <= self.small_batch else self._multi
+        preds = booster.inplace_predict(
+            X,
+            iteration_range=self.iteration_range,
+            predict_type='value',
+            validate_features=False,
+        )
+        return np.asarray(preds).reshape(-1)
+
+
+def make_regressor_predict(model: Any) -> Callable:
+    """
+    Fonction de prédiction la plus rapide disponible pour un régresseur.
+
+    Returns:
+        BoosterPredictor.predict pour un XGBRegressor, sinon model.predict
+    """
+    if not TREE_FAST_PATH or not hasattr(model, 'get_booster'):
+        return model.predict
+    try:
+        return BoosterPredictor(model).predict
+    except Exception:
+        # xgboost absent ou booster incompatible : chemin sklearn standard
+        return model.predict
+
+
+def attach_fast_predict(pipeline: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Renseigne pipeline['fast_predict'] pour les pipelines de régression.
+
+    Les classifieurs (modèles avec classes_) ne sont pas modifiés.
+
+    Args:
+        pipeline: Dictionnaire pipeline chargé depuis un .pkl
+
+    Returns:
+        Le même dictionnaire, complété
+    """
+    model = pipeline.get('model')
+    if model is None or hasattr(model, 'classes_'):
+        return pipeline
+    pipeline['fast_predict'] = make_regressor_predict(model)
+    return pipeline
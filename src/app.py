@@ -11,11 +11,17 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 # Imports
 from llm.simple_rag_bot import ask_bot
-from llm.groq_predict import predict_ticket_groq as predict_ticket
+# Routage hybride : modèles locaux d'abord, Groq seulement si le local hésite
+# (escalade bornée par HEDGE_DEADLINE, sinon réponse locale)
+from llm.hybrid_router import route_ticket as predict_ticket
 
 from langchain_community.embeddings import SentenceTransformerEmbeddings
 from langchain_community.vectorstores import Chroma
-from openai import OpenAI
+# Client Groq partagé (pool de connexions keep-alive) avec la classification
+from llm.groq_client import get_client
+from llm.llm_cache import cached_completion
+from llm.llm_scheduler import CHAT_DEADLINE, PRIORITY_INTERACTIVE, DeadlineExceeded
+from llm.circuit_breaker import CircuitOpenError, get_breaker
 
 # -----------------------------------------------------------------------------
 # CONFIGURATION DE LA PAGE
@@ -54,7 +60,7 @@ def load_resources():
         st.error("🚨 Clé API GROQ manquante ! Définissez GROQ_API_KEY.")
         return None, None
     
-    client_llm = OpenAI(base_url="https://api.groq.com/openai/v1", api_key=api_key)
+    client_llm = get_client()
     
     persist_directory = "./chroma_db"
     embeddings = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
@@ -119,7 +125,7 @@ with tab_new:
     if analyze_btn and titre and description:
         with st.spinner("Analyse sémantique en cours..."):
             try:
-                # Appel API Groq
+                # Modèle local (ou Groq si la confiance locale est insuffisante)
                 result = predict_ticket(titre, description)
                 
                 # Sauvegarde du ticket
@@ -131,7 +137,9 @@ with tab_new:
                     "Urgence": result.get('urgence', 'Moyenne'),
                     "Type": result.get('type_ticket', 'Demande'),
                     "Temps Résolution (h)": result.get('temps_resolution', 0),
-                    "Statut": "Nouveau"
+                    "Statut": "Nouveau",
+                    "Source": result.get('source', 'llm'),
+                    "Audit": bool(result.get('audit', False))
                 }
                 save_ticket(new_ticket)
                 
@@ -160,6 +168,15 @@ with tab_new:
                 with c4:
                     metric_card("Temps Est.", f"{result.get('temps_resolution', 0)} h")
                 
+                source = result.get('source', 'llm')
+                reason = result.get('route_reason')
+                latency = result.get('latency_ms')
+                st.caption(f"Source : {source}" + (f" ({reason})" if reason else "")
+                           + (f" · {latency:.0f} ms" if latency is not None else ""))
+                if result.get('audit'):
+                    st.info(f"Classification reprise d'un ticket similaire "
+                            f"(similarité {result.get('semantic_similarity')}) : à vérifier.")
+                
                 # Recharger les données pour que le dashboard soit à jour au prochain clic
                 st.cache_data.clear()
 
@@ -214,6 +231,17 @@ with tab_dash:
         st.markdown("**Derniers Tickets Enregistrés**")
         st.dataframe(df_live.sort_values(by="Date", ascending=False).head(10), use_container_width=True)
 
+    # Disjoncteur de l'API Groq : état, refus et transitions (format Prometheus)
+    breaker = get_breaker()
+    if breaker is not None:
+        with st.expander("🔌 État de l'API Groq"):
+            breaker_stats = breaker.stats()
+            b1, b2, b3 = st.columns(3)
+            b1.metric("Disjoncteur", breaker_stats["state"])
+            b2.metric("Taux d'échec récent", f"{breaker_stats['failure_rate'] * 100:.0f} %")
+            b3.metric("Appels refusés", breaker_stats["rejected"])
+            st.code(breaker.to_prometheus(), language="text")
+
 # --- TAB 3 : CHATBOT RAG ---
 with tab_bot:
     st.markdown('<div class="sub-header">Assistant Virtuel</div>', unsafe_allow_html=True)
@@ -239,12 +267,18 @@ with tab_bot:
                     rag_prompt = f"""CONTEXTE:\n{context}\n\nQUESTION:\n{prompt}\n\nINSTRUCTIONS:\nRéponds en français, de manière concise. Base-toi UNIQUEMENT sur le contexte fourni. Si tu ne sais pas, dis-le."""
                     
                     try:
-                        resp = client_llm.chat.completions.create(
+                        # Questions déjà posées (même contexte) : réponse depuis le cache disque.
+                        # Sinon, passe devant les backfills dans l'ordonnanceur partagé.
+                        response_text = cached_completion(client_llm, dict(
                             model="llama-3.3-70b-versatile",
                             messages=[{"role": "user", "content": rag_prompt}],
                             temperature=0.0
-                        )
-                        response_text = resp.choices[0].message.content
+                        ), priority=PRIORITY_INTERACTIVE, deadline=CHAT_DEADLINE)
+                    except CircuitOpenError:
+                        # API Groq en panne (disjoncteur ouvert) ; les questions en cache restent servies
+                        response_text = "⚠️ Base de connaissances déconnectée (API LLM indisponible)."
+                    except DeadlineExceeded:
+                        response_text = "⏳ Assistant momentanément saturé, réessayez dans un instant."
                     except Exception as e:
                         response_text = f"Erreur API: {e}"
             else:
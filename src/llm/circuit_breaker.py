@@ -0,0 +1,188 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Disjoncteur partagé devant l'API Groq (classification et chatbot) : quand
+# trop d'appels récents échouent ou dépassent le budget de latence, les
+# appels sont refusés immédiatement (repli local / réponse en cache) au lieu
+# d'attendre chacun un échec complet.
+BREAKER_ENABLED = os.getenv("BREAKER", "1") == "1"
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", "20"))                  # derniers appels observés
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "5"))             # avant de pouvoir déclencher
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))   # échecs / appels de la fenêtre
+BREAKER_LATENCY_BUDGET = float(os.getenv("BREAKER_LATENCY_BUDGET", "10"))  # secondes ; au-delà = échec
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))    # durée d'ouverture avant sondage
+BREAKER_PROBES = int(os.getenv("BREAKER_PROBES", "2"))                   # sondes réussies pour refermer
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(RuntimeError):
+    """Appel refusé : le disjoncteur est ouvert."""
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur à trois états.
+
+    - closed : appels autorisés ; chaque résultat est mémorisé sur une
+      fenêtre glissante. Le taux d'échec (panne ou latence > budget)
+      atteint, le disjoncteur s'ouvre.
+    - open : appels refusés (CircuitOpenError) pendant open_seconds.
+    - half_open : une seule sonde à la fois ; `probes` succès consécutifs
+      le referment, un échec le rouvre.
+
+    Args:
+        name: Nom du service protégé (logs, métriques)
+        window: Nombre d'appels récents observés
+        min_calls: Appels minimum dans la fenêtre avant déclenchement
+        failure_rate: Taux d'échec déclenchant l'ouverture (0..1)
+        latency_budget: Latence (secondes) au-delà de laquelle un appel réussi compte comme échec
+        open_seconds: Durée d'ouverture avant le passage en half_open
+        probes: Sondes réussies nécessaires pour refermer
+    """
+
+    def __init__(self, name: str = "groq",
+                 window: int = BREAKER_WINDOW,
+                 min_calls: int = BREAKER_MIN_CALLS,
+                 failure_rate: float = BREAKER_FAILURE_RATE,
+                 latency_budget: float = BREAKER_LATENCY_BUDGET,
+                 open_seconds: float = BREAKER_OPEN_SECONDS,
+                 probes: int = BREAKER_PROBES):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.latency_budget = latency_budget
+        self.open_seconds = open_seconds
+        self.probes = probes
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_successes = 0
+        self.transitions: Dict[str, int] = {}
+        self.rejected = 0
+
+    def _transition(self, state: str) -> None:
+        key = f"{self._state}->{state}"
+        self.transitions[key] = self.transitions.get(key, 0) + 1
+        logger.warning("Disjoncteur %s : %s", self.name, key)
+        self._state = state
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        if state == CLOSED:
+            self._outcomes.clear()
+        self._probe_in_flight = False
+        self._probe_successes = 0
+
+    def _refresh(self) -> None:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._transition(HALF_OPEN)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def is_open(self) -> bool:
+        """True si un appel serait refusé maintenant (sans réserver de sonde) ; compté comme refus."""
+        with self._lock:
+            self._refresh()
+            blocked = self._state == OPEN or (self._state == HALF_OPEN and self._probe_in_flight)
+            if blocked:
+                self.rejected += 1
+            return blocked
+
+    def allow(self) -> bool:
+        """Autorise un appel ; en half_open, réserve l'unique sonde."""
+        with self._lock:
+            self._refresh()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, success: bool, latency: Optional[float] = None) -> None:
+        """Enregistre le résultat d'un appel autorisé par allow() (succès ou panne du service)."""
+        failed = not success or (latency is not None and latency > self.latency_budget)
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probe_in_flight = False
+                if failed:
+                    self._transition(OPEN)
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.probes:
+                        self._transition(CLOSED)
+                return
+            if self._state != CLOSED:
+                return
+            self._outcomes.append(failed)
+            n = len(self._outcomes)
+            if n >= self.min_calls and sum(self._outcomes) / n >= self.failure_rate:
+                self._transition(OPEN)
+
+    def release(self) -> None:
+        """Libère la sonde réservée sans résultat (appel abandonné, erreur propre à la requête)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refresh()
+            n = len(self._outcomes)
+            return {
+                "state": self._state,
+                "failure_rate": sum(self._outcomes) / n if n else 0.0,
+                "window_calls": n,
+                "rejected": self.rejected,
+                "transitions": dict(self.transitions),
+            }
+
+    def to_prometheus(self, prefix: str = "llm_circuit") -> str:
+        """Export au format texte Prometheus (état, refus, transitions)."""
+        stats = self.stats()
+        label = f'name="{self.name}"'
+        lines = [
+            f"# HELP {prefix}_state État du disjoncteur (0 closed, 1 half_open, 2 open).",
+            f"# TYPE {prefix}_state gauge",
+            f"{prefix}_state{{{label}}} {_STATE_VALUES[stats['state']]}",
+            f"# HELP {prefix}_rejected_total Appels refusés par le disjoncteur.",
+            f"# TYPE {prefix}_rejected_total counter",
+            f"{prefix}_rejected_total{{{label}}} {stats['rejected']}",
+            f"# HELP {prefix}_transitions_total Changements d'état du disjoncteur.",
+            f"# TYPE {prefix}_transitions_total counter",
+        ]
+        for key, count in sorted(stats["transitions"].items()):
+            src, dst = key.split("->")
+            lines.append(f'{prefix}_transitions_total{{{label},from="{src}",to="{dst}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+_lock = threading.Lock()
+_breaker: Optional[CircuitBreaker] = None
+
+
+def get_breaker() -> Optional[CircuitBreaker]:
+    """Disjoncteur partagé de l'API Groq (None si BREAKER=0)."""
+    global _breaker
+    if not BREAKER_ENABLED:
+        return None
+    if _breaker is None:
+        with _lock:
+            if _breaker is None:
+                _breaker = CircuitBreaker()
+    return _breaker
@@ -0,0 +1,126 @@
+import os
+import asyncio
+import logging
+import weakref
+import threading
+from typing import Optional
+
+import httpx
+from openai import OpenAI, AsyncOpenAI, NOT_GIVEN
+
+logger = logging.getLogger(__name__)
+
+# Groq OpenAI-compatible base URL
+GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+
+# Pool de connexions HTTP partagé par tous les appels Groq du processus
+# (classification, chatbot de app.py, simple_rag_bot) : les connexions TLS
+# restent ouvertes (keep-alive) au lieu d'être renégociées à chaque appel.
+MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("GROQ_MAX_KEEPALIVE", "10"))
+KEEPALIVE_EXPIRY = float(os.getenv("GROQ_KEEPALIVE_EXPIRY", "60"))      # secondes
+CONNECT_TIMEOUT = float(os.getenv("GROQ_CONNECT_TIMEOUT", "5"))         # secondes
+REQUEST_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", "30"))                # secondes, par requête
+# Reprises faites par llm_scheduler (backoff + jitter, échéance) : pas de reprise côté SDK
+MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "0"))
+USE_HTTP2 = os.getenv("GROQ_HTTP2", "0") == "1"                         # nécessite le paquet h2
+
+_lock = threading.Lock()
+_client: Optional[OpenAI] = None
+# Un client async par boucle asyncio (un pool httpx.AsyncClient est lié à sa boucle)
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _api_key() -> str:
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key:
+        raise RuntimeError("GROQ_API_KEY manquant. Définis la variable d'environnement GROQ_API_KEY.")
+    return api_key
+
+
+def _build_http_client(cls=httpx.Client):
+    http2 = USE_HTTP2 and _http2_available()
+    if USE_HTTP2 and not http2:
+        logger.warning("GROQ_HTTP2=1 mais le paquet h2 est absent : HTTP/1.1 utilisé.")
+    return cls(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+    )
+
+
+def get_client() -> OpenAI:
+    """
+    Client Groq (OpenAI-compatible) unique et thread-safe pour le processus.
+
+    Créé au premier appel ; les appels suivants réutilisent le même client
+    et son pool de connexions. Le délai d'une requête peut être ajusté
+    par appel : client.chat.completions.create(..., timeout=10).
+    """
+    global _client
+    if _client is not None:
+        return _client
+    with _lock:
+        if _client is None:
+            _client = OpenAI(
+                base_url=GROQ_BASE_URL,
+                api_key=_api_key(),
+                max_retries=MAX_RETRIES,
+                timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+                http_client=_build_http_client(),
+            )
+    return _client
+
+
+def get_async_client() -> AsyncOpenAI:
+    """
+    Client Groq async partagé par la boucle asyncio courante.
+
+    Même configuration de pool que get_client() ; un client distinct est
+    créé pour chaque boucle (asyncio.run en crée une nouvelle à chaque appel).
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = AsyncOpenAI(
+            base_url=GROQ_BASE_URL,
+            api_key=_api_key(),
+            max_retries=MAX_RETRIES,
+            timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+            http_client=_build_http_client(httpx.AsyncClient),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def close_async_client() -> None:
+    """Ferme le client async de la boucle courante (s'il existe)."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+
+def request_timeout(timeout: Optional[float]):
+    """Délai à passer à create(timeout=...) : None = délai par défaut du client."""
+    return NOT_GIVEN if timeout is None else timeout
+
+
+def close_client() -> None:
+    """Ferme le pool de connexions (le prochain get_client() en recrée un)."""
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+            _client = None
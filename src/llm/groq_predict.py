@@ -1,12 +1,20 @@
 import os
 import json
 import re
-from typing import Dict, Any, Optional
+import asyncio
+from typing import Dict, Any, Optional, Iterable, List
 
-from openai import OpenAI
+from .groq_client import get_client, get_async_client, close_async_client, request_timeout
+from .llm_cache import cached_completion, cached_completion_async
+from .llm_scheduler import PRIORITY_INTERACTIVE, PRIORITY_BACKFILL
+from .keyword_rules import get_rule_engine
 
-# Groq OpenAI-compatible base URL
-GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+# Appels simultanés par défaut pour classify_many
+DEFAULT_CONCURRENCY = int(os.getenv("GROQ_CONCURRENCY", "8"))
+
+# Mode lot : tickets envoyés dans une même requête (1 = un appel par ticket)
+DEFAULT_PACK_SIZE = int(os.getenv("GROQ_PACK_SIZE", "1"))
+PACKED_TOKENS_PER_TICKET = 80
 
 # ⚡ Modèles recommandés Groq (tu peux changer)
 # - "llama-3.1-8b-instant" : très rapide
@@ -49,6 +57,16 @@ SYSTEM_PROMPT = (
     "- Email / messagerie => categorie Email / Messagerie, souvent Incident.\n"
 )
 
+# Mode lot : le prompt système n'est envoyé qu'une fois pour K tickets
+PACKED_SYSTEM_PROMPT = (
+    SYSTEM_PROMPT
+    + "\nMODE LOT: plusieurs tickets numérotés (TICKET 0, TICKET 1, ...) te sont envoyés.\n"
+    "Réponds uniquement par un tableau JSON strict contenant un objet par ticket.\n"
+    'Chaque objet contient "index" (numéro du ticket) et les 4 clés ci-dessus.\n'
+)
+
+REQUIRED_KEYS = ("urgence", "categorie", "type_ticket", "temps_resolution")
+
 def _clamp_hours(x: Any) -> float:
     try:
         v = float(x)
@@ -75,6 +93,26 @@ def _extract_json(text: str) -> Optional[Dict[str, Any]]:
     except Exception:
         return None
 
+def _extract_json_array(text: str) -> Optional[List[Any]]:
+    if not text:
+        return None
+    text = text.strip()
+    try:
+        data = json.loads(text)
+    except Exception:
+        # extract first [...]
+        m = re.search(r"\[.*\]", text, flags=re.S)
+        if not m:
+            return None
+        try:
+            data = json.loads(m.group(0))
+        except Exception:
+            return None
+    # {"tickets": [...]} accepté aussi
+    if isinstance(data, dict):
+        data = next((v for v in data.values() if isinstance(v, list)), None)
+    return data if isinstance(data, list) else None
+
 def _normalize(out: Dict[str, Any]) -> Dict[str, Any]:
     urgence = out.get("urgence", "Moyenne")
     if urgence not in ALLOWED_URGENCE:
@@ -101,40 +139,36 @@ def _hard_overrides(text_full: str, out: Dict[str, Any]) -> Dict[str, Any]:
     """
     Post-traitement minimal pour éviter des sorties illogiques sur cas critiques.
     (Même en LLM 100%, ça sécurise la démo.)
+
+    Règles (sécurité, coupure / bloquant, mot de passe...) dans
+    override_rules.json, compilées par keyword_rules.
     """
-    t = (text_full or "").lower()
-
-    # Sécurité
-    if any(k in t for k in [
-        "fuite", "accès non autorisé", "acces non autorise", "intrusion",
-        "tentatives de connexion", "connexion suspecte", "suspicious login",
-        "pirat", "hack", "data breach"
-    ]):
-        return {"urgence": "Haute", "categorie": "Sécurité", "type_ticket": "Incident", "temps_resolution": 10.0}
-
-    # Coupure / bloquant
-    if any(k in t for k in ["coupure", "plus aucune", "panne", "bloquant", "production", "service down", "inaccessible"]):
-        # Si c'est clairement bloquant, on pousse vers Haute/Incident
-        out["type_ticket"] = "Incident"
-        if out["urgence"] == "Basse":
-            out["urgence"] = "Haute"
-        if "réseau" in t or "internet" in t or "wifi" in t or "serveur" in t:
-            out["categorie"] = "Réseau & Connexion"
-        return out
+    return get_rule_engine().apply(text_full, out)
 
-    # Password/proc
-    if any(k in t for k in ["mot de passe", "réinitialiser", "reinitialiser", "procedure", "procédure"]):
-        return {"urgence": "Basse", "categorie": "Comptes & Accès", "type_ticket": "Demande", "temps_resolution": 2.0}
+def _parse_response(content: str, text_full: str) -> Dict[str, Any]:
+    """
+    JSON du LLM -> prédiction normalisée + règles métier.
 
-    return out
+    Réponse illisible : valeurs par défaut marquées parse_fallback=True
+    (ce n'est pas une classification du LLM, à ne pas réutiliser).
+    """
+    data = _extract_json(content)
 
-def predict_ticket_groq(titre: str, texte: str, model: Optional[str] = None) -> Dict[str, Any]:
-    api_key = os.getenv("GROQ_API_KEY")
-    if not api_key:
-        raise RuntimeError("GROQ_API_KEY manquant. Définis la variable d'environnement GROQ_API_KEY.")
+    if not data:
+        # fallback robuste
+        out = {"urgence": "Moyenne", "categorie": "Autre", "type_ticket": "Demande", "temps_resolution": 8.0}
+        out = _hard_overrides(text_full, out)
+        out["parse_fallback"] = True
+        return out
 
-    client = OpenAI(base_url=GROQ_BASE_URL, api_key=api_key)
+    out = _normalize(data)
+    out = _hard_overrides(text_full, out)
+    out["temps_resolution"] = _clamp_hours(out["temps_resolution"])
+    return out
 
+def _build_request(titre: str, texte: str, model: Optional[str] = None,
+                   timeout: Optional[float] = None):
+    """Retourne (text_full, paramètres de chat.completions.create)."""
     titre = (titre or "").strip()
     texte = (texte or "").strip()
     text_full = f"{titre} {texte}".strip()
@@ -145,11 +179,8 @@ def predict_ticket_groq(titre: str, texte: str, model: Optional[str] = None) ->
         "Réponds uniquement en JSON strict."
     )
 
-    chosen_model = model or DEFAULT_MODEL
-
-    # Appel Groq (OpenAI-compatible chat completions) :contentReference[oaicite:1]{index=1}
-    resp = client.chat.completions.create(
-        model=chosen_model,
+    params = dict(
+        model=model or DEFAULT_MODEL,
         messages=[
             {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": user_prompt},
@@ -157,17 +188,193 @@ def predict_ticket_groq(titre: str, texte: str, model: Optional[str] = None) ->
         temperature=0.0,
         max_tokens=120,   # ⚡ rapide + évite blabla
         top_p=0.9,
+        timeout=request_timeout(timeout),
     )
+    return text_full, params
 
-    content = resp.choices[0].message.content or ""
-    data = _extract_json(content)
+def predict_ticket_groq(titre: str, texte: str, model: Optional[str] = None,
+                        timeout: Optional[float] = None,
+                        priority: int = PRIORITY_INTERACTIVE) -> Dict[str, Any]:
+    # Client partagé (pool de connexions keep-alive), voir groq_client.py
+    client = get_client()
+    text_full, params = _build_request(titre, texte, model, timeout)
 
-    if not data:
-        # fallback robuste
-        out = {"urgence": "Moyenne", "categorie": "Autre", "type_ticket": "Demande", "temps_resolution": 8.0}
-        return _hard_overrides(text_full, out)
+    # Appel Groq (OpenAI-compatible chat completions), via le cache disque
+    # et l'ordonnanceur partagé (limite de débit, reprises, échéance)
+    content = cached_completion(client, params, priority=priority)
+    return _parse_response(content, text_full)
 
-    out = _normalize(data)
-    out = _hard_overrides(text_full, out)
-    out["temps_resolution"] = _clamp_hours(out["temps_resolution"])
-    return out
+async def predict_ticket_groq_async(titre: str, texte: str, model: Optional[str] = None,
+                                    timeout: Optional[float] = None,
+                                    priority: int = PRIORITY_INTERACTIVE) -> Dict[str, Any]:
+    """Version async de predict_ticket_groq (client AsyncOpenAI partagé par boucle)."""
+    client = get_async_client()
+    text_full, params = _build_request(titre, texte, model, timeout)
+
+    content = await cached_completion_async(client, params, priority=priority)
+    return _parse_response(content, text_full)
+
+def _ticket_fields(ticket) -> tuple:
+    if isinstance(ticket, dict):
+        return ticket.get("titre", ""), ticket.get("texte", "")
+    titre, texte = ticket
+    return titre, texte
+
+def _build_packed_request(tickets: List[Any], model: Optional[str] = None,
+                          timeout: Optional[float] = None):
+    """Retourne (text_full de chaque ticket, paramètres d'une requête pour tout le lot)."""
+    text_fulls, blocks = [], []
+    for i, ticket in enumerate(tickets):
+        titre, texte = _ticket_fields(ticket)
+        titre, texte = (titre or "").strip(), (texte or "").strip()
+        text_fulls.append(f"{titre} {texte}".strip())
+        blocks.append(f"TICKET {i}\nTITRE: {titre}\nDESCRIPTION: {texte}")
+
+    user_prompt = (
+        "\n\n".join(blocks)
+        + f"\n\nRéponds uniquement par un tableau JSON strict de {len(tickets)} objets."
+    )
+    params = dict(
+        model=model or DEFAULT_MODEL,
+        messages=[
+            {"role": "system", "content": PACKED_SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt},
+        ],
+        temperature=0.0,
+        max_tokens=PACKED_TOKENS_PER_TICKET * len(tickets),
+        top_p=0.9,
+        timeout=request_timeout(timeout),
+    )
+    return text_fulls, params
+
+def _parse_packed_response(content: str, text_fulls: List[str]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Un résultat validé par ticket du lot, None si l'élément est absent ou
+    mal formé (index invalide ou dupliqué, clé manquante).
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(text_fulls)
+    for item in _extract_json_array(content) or []:
+        if not isinstance(item, dict) or any(k not in item for k in REQUIRED_KEYS):
+            continue
+        try:
+            idx = int(item.get("index"))
+        except (TypeError, ValueError):
+            continue
+        if not 0 <= idx < len(text_fulls) or results[idx] is not None:
+            continue
+        out = _normalize(item)
+        out = _hard_overrides(text_fulls[idx], out)
+        out["temps_resolution"] = _clamp_hours(out["temps_resolution"])
+        results[idx] = out
+    return results
+
+def predict_tickets_groq_packed(tickets: Iterable, model: Optional[str] = None,
+                                timeout: Optional[float] = None,
+                                priority: int = PRIORITY_BACKFILL) -> List[Dict[str, Any]]:
+    """
+    Classifie un lot de tickets en une seule requête (prompt système envoyé une fois).
+
+    Les éléments manquants ou mal formés de la réponse sont reclassés par
+    un appel predict_ticket_groq individuel.
+
+    Returns:
+        Un résultat par ticket, dans l'ordre d'entrée (format de predict_ticket_groq)
+    """
+    tickets = list(tickets)
+    if not tickets:
+        return []
+    text_fulls, params = _build_packed_request(tickets, model, timeout)
+    content = cached_completion(get_client(), params, priority=priority)
+    results = _parse_packed_response(content, text_fulls)
+
+    for i, out in enumerate(results):
+        if out is None:
+            titre, texte = _ticket_fields(tickets[i])
+            results[i] = predict_ticket_groq(titre, texte, model=model, timeout=timeout,
+                                             priority=priority)
+    return results
+
+async def _predict_pack_async(tickets: List[Any], model: Optional[str] = None,
+                              timeout: Optional[float] = None,
+                              priority: int = PRIORITY_BACKFILL) -> List[Optional[Dict[str, Any]]]:
+    """Une requête pour le lot ; None pour les éléments à reclasser individuellement."""
+    text_fulls, params = _build_packed_request(tickets, model, timeout)
+    content = await cached_completion_async(get_async_client(), params, priority=priority)
+    return _parse_packed_response(content, text_fulls)
+
+async def classify_many_async(tickets: Iterable, concurrency: int = DEFAULT_CONCURRENCY,
+                              model: Optional[str] = None,
+                              timeout: Optional[float] = None,
+                              pack_size: int = DEFAULT_PACK_SIZE,
+                              priority: int = PRIORITY_BACKFILL) -> List[Dict[str, Any]]:
+    """
+    Classifie plusieurs tickets en parallèle (au plus `concurrency` appels en cours).
+
+    Args:
+        tickets: Dicts {"titre", "texte"} ou tuples (titre, texte)
+        concurrency: Nombre maximal de requêtes simultanées
+        model: Modèle Groq (DEFAULT_MODEL par défaut)
+        timeout: Délai par requête (secondes)
+        pack_size: Tickets par requête (> 1 : mode lot, les éléments mal
+            formés de la réponse sont reclassés individuellement)
+        priority: Priorité dans l'ordonnanceur partagé (par défaut, cède la
+            place au chat et à l'analyse des nouveaux tickets)
+
+    Returns:
+        Un résultat par ticket, dans l'ordre d'entrée : le format de
+        predict_ticket_groq, ou {"error": "..."} si ce ticket a échoué
+    """
+    tickets = list(tickets)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    results: List[Optional[Dict[str, Any]]] = [None] * len(tickets)
+
+    async def _one(i: int) -> None:
+        async with semaphore:
+            try:
+                titre, texte = _ticket_fields(tickets[i])
+                results[i] = await predict_ticket_groq_async(titre, texte, model=model, timeout=timeout,
+                                                             priority=priority)
+            except Exception as e:
+                results[i] = {"error": f"{type(e).__name__}: {e}"}
+
+    async def _pack(indices: List[int]) -> None:
+        async with semaphore:
+            try:
+                packed = await _predict_pack_async([tickets[i] for i in indices], model, timeout, priority)
+            except Exception as e:
+                for i in indices:
+                    results[i] = {"error": f"{type(e).__name__}: {e}"}
+                return
+        retry = []
+        for i, out in zip(indices, packed):
+            if out is None:
+                retry.append(i)
+            else:
+                results[i] = out
+        await asyncio.gather(*(_one(i) for i in retry))
+
+    if pack_size > 1:
+        chunks = [list(range(s, min(s + pack_size, len(tickets))))
+                  for s in range(0, len(tickets), pack_size)]
+        await asyncio.gather(*(_pack(chunk) for chunk in chunks))
+    else:
+        await asyncio.gather(*(_one(i) for i in range(len(tickets))))
+    return results
+
+def classify_many(tickets: Iterable, concurrency: int = DEFAULT_CONCURRENCY,
+                  model: Optional[str] = None,
+                  timeout: Optional[float] = None,
+                  pack_size: int = DEFAULT_PACK_SIZE,
+                  priority: int = PRIORITY_BACKFILL) -> List[Dict[str, Any]]:
+    """
+    Version bloquante de classify_many_async (pour scripts et backfills).
+
+    À appeler hors d'une boucle asyncio ; sinon utiliser classify_many_async.
+    """
+    async def _run():
+        try:
+            return await classify_many_async(tickets, concurrency, model, timeout, pack_size, priority)
+        finally:
+            await close_async_client()
+
+    return asyncio.run(_run())
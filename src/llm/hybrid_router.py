@@ -0,0 +1,208 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, Any, Optional
+
+from .groq_predict import predict_ticket_groq, _hard_overrides, _normalize, _clamp_hours
+from .local_predict import predict_ticket_local
+from .semantic_cache import get_semantic_cache
+from .circuit_breaker import CircuitOpenError, get_breaker
+
+logger = logging.getLogger(__name__)
+
+# Seuils de marge (écart entre les 2 meilleures probabilités) en dessous
+# desquels le modèle local est jugé hésitant et le ticket part au LLM.
+URGENCE_MIN_MARGIN = float(os.getenv("ROUTER_URGENCE_MIN_MARGIN", "0.30"))
+CATEGORIE_MIN_MARGIN = float(os.getenv("ROUTER_CATEGORIE_MIN_MARGIN", "0.20"))
+
+# Chemins possibles (valeur de "source" dans le résultat)
+SOURCE_LOCAL = "local"              # modèle local confiant
+SOURCE_LLM = "llm"                  # escaladé au LLM
+SOURCE_LOCAL_FALLBACK = "local_fallback"  # escalade demandée mais LLM en échec
+SOURCE_SEMANTIC = "semantic_cache"  # ticket quasi identique déjà classé par le LLM
+SOURCE_LOCAL_DEADLINE = "local_deadline"  # escalade demandée mais LLM hors délai
+
+# Échéance de l'escalade LLM quand un résultat local existe (0 = attendre le LLM)
+HEDGE_DEADLINE = float(os.getenv("HEDGE_DEADLINE", "4"))    # secondes
+HEDGE_WORKERS = int(os.getenv("HEDGE_WORKERS", "8"))
+
+_executor_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+
+LABEL_KEYS = ("urgence", "categorie", "type_ticket", "temps_resolution")
+MARGIN_KEYS = ("urgence_margin", "categorie_margin", "type_ticket_margin")
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="hedge")
+    return _executor
+
+
+def _local_result(text_full: str, local: Dict[str, Any], source: str, reason: Optional[str]) -> Dict[str, Any]:
+    # Mêmes garde-fous que la réponse LLM (_parse_response) : valeurs autorisées,
+    # règles métier, temps borné
+    out = _hard_overrides(text_full, _normalize({k: local[k] for k in LABEL_KEYS}))
+    out["temps_resolution"] = _clamp_hours(out["temps_resolution"])
+    out.update({k: round(local[k], 3) for k in MARGIN_KEYS})
+    out.update({"source": source, "route_reason": reason})
+    return out
+
+
+def _needs_escalation(local: Dict[str, Any],
+                      urgence_min: float,
+                      categorie_min: float) -> Optional[str]:
+    """Retourne la raison de l'escalade, ou None si le local est assez confiant."""
+    if local["categorie"] is None:
+        return f"categorie_unmapped={local['categorie_local']}"
+    if local["urgence_margin"] < urgence_min:
+        return f"urgence_margin={local['urgence_margin']:.2f}<{urgence_min:.2f}"
+    if local["categorie_margin"] < categorie_min:
+        return f"categorie_margin={local['categorie_margin']:.2f}<{categorie_min:.2f}"
+    return None
+
+
+def _circuit_open() -> bool:
+    breaker = get_breaker()
+    return breaker is not None and breaker.is_open()
+
+
+def _semantic_lookup(text_full: str):
+    """Retourne (cache, embedding, résultat réutilisé ou None)."""
+    cache = get_semantic_cache()
+    if cache is None or not text_full:
+        return None, None, None
+    try:
+        vector = cache.embed(text_full)
+        labels, similarity, matched = cache.lookup(text_full, vector)
+    except Exception as e:
+        logger.warning("Cache sémantique en échec: %s", e)
+        return None, None, None
+    if labels is None:
+        return cache, vector, None
+    out = _hard_overrides(text_full, labels)
+    out.update({
+        "semantic_similarity": round(similarity, 3),
+        "semantic_match": matched,
+        # Classification réutilisée sans appel LLM : à vérifier par un humain
+        "audit": True,
+    })
+    return cache, vector, out
+
+
+def _cacheable(out: Dict[str, Any]) -> bool:
+    # Réponse LLM illisible (valeurs par défaut) : jamais réutilisée
+    return not out.get("parse_fallback")
+
+
+def _cache_llm_result(cache, text_full: str, vector):
+    # Réponse LLM arrivée (même après l'échéance) : ajoutée au cache sémantique
+    def _done(future) -> None:
+        if cache is None or future.cancelled() or future.exception() is not None:
+            return
+        out = future.result()
+        if _cacheable(out):
+            cache.add(text_full, out, vector)
+    return _done
+
+
+def route_ticket(titre: str, texte: str,
+                 urgence_min_margin: Optional[float] = None,
+                 categorie_min_margin: Optional[float] = None,
+                 model: Optional[str] = None,
+                 deadline: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Classification hybride : modèles locaux d'abord, LLM seulement si besoin.
+
+    Le ticket est escaladé au LLM quand la marge d'urgence ou de catégorie du
+    modèle local est sous le seuil, quand sa catégorie n'a pas d'équivalent
+    dans l'application, ou quand le modèle local est indisponible. Si un
+    résultat local existe, l'escalade est bornée par `deadline` secondes
+    (défaut HEDGE_DEADLINE) : au-delà, le résultat local est retourné.
+    L'appel LLM hors délai n'est pas interrompu (un thread ne peut pas
+    l'être) : l'ordonnanceur l'arrête à la même échéance, et sa réponse,
+    si elle arrive, alimente quand même les caches disque et sémantique.
+
+    Le résultat a le format de predict_ticket_groq, complété par :
+      - source : "local", "llm", "semantic_cache", "local_deadline" (LLM
+        hors délai) ou "local_fallback" (LLM en échec, ou disjoncteur
+        ouvert : route_reason "circuit_open")
+      - route_reason : raison de l'escalade (None si servi en local)
+      - urgence_margin, categorie_margin, type_ticket_margin (si servi en local)
+      - semantic_similarity, semantic_match, audit (si servi par le cache
+        sémantique : ticket quasi identique déjà classé par le LLM)
+      - latency_ms : durée de bout en bout
+    """
+    start = time.monotonic()
+    out = _route(titre, texte, urgence_min_margin, categorie_min_margin, model,
+                 HEDGE_DEADLINE if deadline is None else deadline)
+    out["latency_ms"] = round((time.monotonic() - start) * 1000, 1)
+    return out
+
+
+def _route(titre: str, texte: str,
+           urgence_min_margin: Optional[float],
+           categorie_min_margin: Optional[float],
+           model: Optional[str],
+           deadline: float) -> Dict[str, Any]:
+    urgence_min = URGENCE_MIN_MARGIN if urgence_min_margin is None else urgence_min_margin
+    categorie_min = CATEGORIE_MIN_MARGIN if categorie_min_margin is None else categorie_min_margin
+    text_full = f"{(titre or '').strip()} {(texte or '').strip()}".strip()
+
+    local = None
+    try:
+        local = predict_ticket_local(titre, texte)
+        reason = _needs_escalation(local, urgence_min, categorie_min)
+    except Exception as e:
+        # Modèles absents, dépendances manquantes, texte trop court...
+        msg = str(e).strip()
+        reason = f"local_error: {msg.splitlines()[0] if msg else type(e).__name__}"
+
+    if reason is None:
+        return _local_result(text_full, local, SOURCE_LOCAL, None)
+
+    # Ticket quasi identique déjà classé par le LLM : pas de nouvel appel
+    cache, vector, reused = _semantic_lookup(text_full)
+    if reused is not None:
+        reused.update({"source": SOURCE_SEMANTIC, "route_reason": reason})
+        return reused
+
+    # API Groq en panne (disjoncteur ouvert) : pas d'attente, résultat local
+    if _circuit_open():
+        if local is None:
+            raise CircuitOpenError("API Groq indisponible et modèle local en échec")
+        return _local_result(text_full, local, SOURCE_LOCAL_FALLBACK, "circuit_open")
+
+    # Sans résultat local, aucune réponse de repli : le LLM est attendu
+    if local is None or deadline <= 0:
+        try:
+            out = predict_ticket_groq(titre, texte, model=model)
+        except Exception as e:
+            if local is None:
+                raise
+            logger.warning("Escalade LLM en échec (%s), résultat local conservé: %s", reason, e)
+            return _local_result(text_full, local, SOURCE_LOCAL_FALLBACK, reason)
+        if cache is not None and _cacheable(out):
+            cache.add(text_full, out, vector)
+        out.update({"source": SOURCE_LLM, "route_reason": reason})
+        return out
+
+    # Escalade sous échéance : même borne pour l'attente et pour l'appel
+    llm_future = _get_executor().submit(predict_ticket_groq, titre, texte, model, deadline)
+    llm_future.add_done_callback(_cache_llm_result(cache, text_full, vector))
+    try:
+        out = dict(llm_future.result(timeout=deadline))
+    except FutureTimeout:
+        logger.info("Escalade LLM hors délai (%s), résultat local retourné", reason)
+        return _local_result(text_full, local, SOURCE_LOCAL_DEADLINE,
+                             f"{reason}; llm_deadline={deadline:.1f}s")
+    except Exception as e:
+        logger.warning("Escalade LLM en échec (%s), résultat local conservé: %s", reason, e)
+        return _local_result(text_full, local, SOURCE_LOCAL_FALLBACK, reason)
+    out.update({"source": SOURCE_LLM, "route_reason": reason})
+    return out
@@ -0,0 +1,137 @@
+import os
+import re
+import json
+import threading
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+# Moteur de règles mots-clés -> action pour les post-traitements métier
+# (_hard_overrides). Tous les mots-clés de toutes les règles sont compilés
+# dans une seule expression régulière : un passage sur le texte retourne
+# toutes les règles déclenchées, quel que soit le nombre de règles.
+RULES_PATH = os.getenv(
+    "OVERRIDE_RULES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "override_rules.json")
+)
+
+_RULE_KEYS = {"name", "keywords", "labels", "set", "map", "if_any", "stop"}
+
+
+def normalize_text(text: str) -> str:
+    """Minuscules sans accents ("Accès Réseau" -> "acces reseau")."""
+    decomposed = unicodedata.normalize("NFKD", (text or "").lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+class KeywordRuleEngine:
+    """
+    Règles métier compilées en un seul automate de recherche.
+
+    Chaque règle (dict, voir override_rules.json) contient :
+        name: Identifiant de la règle
+        keywords: Sous-chaînes déclenchantes (casse et accents ignorés)
+        labels: Remplace toute la prédiction par ces valeurs
+        set: Champs forcés sur la prédiction
+        map: Remplacements conditionnels {champ: {ancienne valeur: nouvelle}}
+        if_any: Sous-conditions [{keywords, set}] appliquées si l'un de leurs
+            mots-clés est aussi présent
+        stop: Arrête l'évaluation après cette règle (défaut True)
+    """
+
+    def __init__(self, rules: List[Dict[str, Any]]):
+        self.rules = []
+        # mot-clé normalisé -> identifiants des conditions qu'il déclenche
+        self._targets: Dict[str, Set[tuple]] = {}
+        for r, rule in enumerate(rules):
+            unknown = set(rule) - _RULE_KEYS
+            if unknown:
+                raise ValueError(f"Règle {rule.get('name', r)!r}: clés inconnues {sorted(unknown)}")
+            if not rule.get("keywords"):
+                raise ValueError(f"Règle {rule.get('name', r)!r}: aucun mot-clé")
+            self._register(rule["keywords"], (r, None))
+            for c, cond in enumerate(rule.get("if_any", [])):
+                self._register(cond.get("keywords", []), (r, c))
+            self.rules.append(rule)
+
+        keywords = sorted(self._targets, key=len, reverse=True)
+        # Plusieurs mots-clés peuvent commencer à la même position : ce sont
+        # des préfixes du plus long, seul trouvé par l'alternance (ordonnée
+        # du plus long au plus court) ; ses préfixes sont précalculés.
+        self._prefixes = {
+            k: [p for p in keywords if k.startswith(p)] for k in keywords
+        }
+        # Assertion avant : une correspondance possible à chaque position
+        self._pattern = (
+            re.compile("(?=(" + "|".join(re.escape(k) for k in keywords) + "))") if keywords else None
+        )
+
+    def _register(self, keywords: Iterable[str], target: tuple) -> None:
+        for keyword in keywords:
+            keyword = normalize_text(keyword)
+            if keyword:
+                self._targets.setdefault(keyword, set()).add(target)
+
+    @classmethod
+    def from_file(cls, path: str = RULES_PATH) -> "KeywordRuleEngine":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f)["rules"])
+
+    def _scan(self, text: str) -> Set[tuple]:
+        hits: Set[tuple] = set()
+        if self._pattern is None:
+            return hits
+        seen = set()
+        for m in self._pattern.finditer(normalize_text(text)):
+            longest = m.group(1)
+            if longest in seen:
+                continue
+            seen.add(longest)
+            for keyword in self._prefixes[longest]:
+                hits |= self._targets[keyword]
+        return hits
+
+    def match(self, text: str) -> List[str]:
+        """Noms de toutes les règles déclenchées par le texte, dans l'ordre des règles."""
+        hits = self._scan(text)
+        return [rule["name"] for r, rule in enumerate(self.rules) if (r, None) in hits]
+
+    def apply(self, text: str, out: Dict[str, Any]) -> Dict[str, Any]:
+        """Applique les règles déclenchées à la prédiction `out` (modifiée en place sauf `labels`)."""
+        hits = self._scan(text)
+        for r, rule in enumerate(self.rules):
+            if (r, None) not in hits:
+                continue
+            if "labels" in rule:
+                out = dict(rule["labels"])
+            out.update(rule.get("set", {}))
+            for field, mapping in rule.get("map", {}).items():
+                if out.get(field) in mapping:
+                    out[field] = mapping[out[field]]
+            for c, cond in enumerate(rule.get("if_any", [])):
+                if (r, c) in hits:
+                    out.update(cond.get("set", {}))
+            if rule.get("stop", True):
+                break
+        return out
+
+
+_lock = threading.Lock()
+_engine: Optional[KeywordRuleEngine] = None
+
+
+def get_rule_engine() -> KeywordRuleEngine:
+    """Moteur partagé, compilé au premier appel depuis OVERRIDE_RULES_PATH."""
+    global _engine
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                _engine = KeywordRuleEngine.from_file()
+    return _engine
+
+
+def reload_rules(path: Optional[str] = None) -> KeywordRuleEngine:
+    """Recharge les règles (après modification du fichier de configuration)."""
+    global _engine
+    engine = KeywordRuleEngine.from_file(path or RULES_PATH)
+    with _lock:
+        _engine = engine
+    return engine
@@ -0,0 +1,280 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from .llm_scheduler import PRIORITY_INTERACTIVE, DeadlineExceeded, get_scheduler, resolve_deadline
+    from .single_flight import WaitTimeout, single_flight, single_flight_async
+except ImportError:  # importé depuis un script de src/llm (simple_rag_bot)
+    from llm_scheduler import PRIORITY_INTERACTIVE, DeadlineExceeded, get_scheduler, resolve_deadline
+    from single_flight import WaitTimeout, single_flight, single_flight_async
+
+# Cache disque (SQLite) des réponses LLM : un prompt déjà répondu (même
+# modèle, même prompt système, même prompt utilisateur, mêmes paramètres)
+# est resservi sans appel réseau. Partagé par la classification
+# (groq_predict) et le chatbot (app.py, simple_rag_bot).
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "1") == "1"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(ROOT, "llm_cache.sqlite"))
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "64"))          # taille max des réponses stockées
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))  # secondes, 0 = illimité
+
+# Paramètres d'appel qui ne changent pas la réponse (exclus de la clé)
+_NON_KEY_PARAMS = {"messages", "model", "timeout", "stream"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access);
+"""
+
+
+def prompt_key(model: str, system_prompt: str, user_prompt: str, options: str = "") -> str:
+    """Empreinte SHA-256 de (modèle, prompt système, prompt utilisateur, paramètres)."""
+    payload = "\x00".join([model or "", system_prompt or "", user_prompt or "", options or ""])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def split_messages(messages: List[Dict[str, Any]]) -> Tuple[str, str]:
+    """Sépare les messages en (prompt système, prompt utilisateur / historique)."""
+    system = "\n".join(str(m.get("content") or "") for m in messages if m.get("role") == "system")
+    others = [m for m in messages if m.get("role") != "system"]
+    if len(others) == 1:
+        return system, str(others[0].get("content") or "")
+    return system, json.dumps(others, ensure_ascii=False, sort_keys=True)
+
+
+def request_key(params: Dict[str, Any]) -> str:
+    """Clé de cache des paramètres d'un appel chat.completions.create."""
+    system, user = split_messages(params.get("messages", []))
+    options = json.dumps({k: v for k, v in params.items() if k not in _NON_KEY_PARAMS},
+                         sort_keys=True, default=str)
+    return prompt_key(params.get("model", ""), system, user, options)
+
+
+class LLMCache:
+    """
+    Cache SQLite thread-safe des réponses LLM.
+
+    Args:
+        path: Fichier SQLite (":memory:" pour un cache non persistant)
+        max_bytes: Taille maximale cumulée des réponses ; au-delà, les
+            entrées les moins récemment utilisées sont évincées
+        ttl: Durée de vie d'une entrée en secondes (None ou 0 = illimitée)
+    """
+
+    def __init__(self, path: str = LLM_CACHE_PATH,
+                 max_bytes: int = int(LLM_CACHE_MAX_MB * 1024 * 1024),
+                 ttl: Optional[float] = LLM_CACHE_TTL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl or None
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            # Plusieurs processus (workers streamlit, scripts) peuvent partager le fichier
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        # Taille cumulée tenue à jour à chaque écriture (pas de SUM par put) ;
+        # resynchronisée par stats() si d'autres processus partagent le fichier
+        self._bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """Réponse en cache pour key, ou None (absente ou expirée)."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, size, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            response, size, created = row
+            if self.ttl and now - created > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return response
+
+    def put(self, key: str, model: str, response: str) -> None:
+        """Enregistre une réponse puis évince les plus anciennes si la taille max est dépassée."""
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._conn.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, size, now, now),
+            )
+            self._bytes += size - (previous[0] if previous else 0)
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        # Parcours par last_access (indexé), arrêté dès le retour sous la limite
+        to_delete = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+            if self._bytes <= self.max_bytes:
+                break
+            to_delete.append((key,))
+            self._bytes -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", to_delete)
+        self.evictions += len(to_delete)
+
+    def clear(self) -> None:
+        """Vide le cache (les compteurs sont conservés)."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Compteurs du cache (hits, misses, hit_rate, taille...)."""
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            self._bytes = total
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_default_lock = threading.Lock()
+_default_cache: Optional[LLMCache] = None
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """Cache partagé du processus (None si LLM_CACHE=0)."""
+    global _default_cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                _default_cache = LLMCache()
+    return _default_cache
+
+
+def _flight_key(key: str, priority: int) -> str:
+    # Un appelant interactif ne se greffe jamais sur un backfill en file d'attente
+    return f"{key}:{priority}"
+
+
+def _resolve(cache):
+    # cache=None : cache partagé ; cache=False : pas de cache
+    if cache is None:
+        return get_llm_cache()
+    return cache or None
+
+
+def cached_completion(client, params: Dict[str, Any], cache=None,
+                      priority: int = PRIORITY_INTERACTIVE, deadline: Optional[float] = None) -> str:
+    """
+    client.chat.completions.create(**params) avec cache, retourne le texte de la réponse.
+
+    Les appels réseau passent par l'ordonnanceur partagé (llm_scheduler) :
+    limite de débit, priorité, reprises et échéance. Les appels identiques
+    simultanés (même clé et même priorité) partagent une seule requête
+    (single_flight) ; chacun attend au plus sa propre échéance.
+
+    Args:
+        client: Client OpenAI-compatible
+        params: Paramètres de chat.completions.create
+        cache: LLMCache à utiliser (None = cache partagé, False = sans cache)
+        priority: PRIORITY_INTERACTIVE (défaut) ou PRIORITY_BACKFILL
+        deadline: Durée maximale de l'appel en secondes (défaut : timeout de params ou GROQ_DEADLINE)
+
+    Raises:
+        DeadlineExceeded: Si la réponse n'est pas obtenue avant l'échéance
+    """
+    cache = _resolve(cache)
+    key = request_key(params)
+    if cache is not None:
+        content = cache.get(key)
+        if content is not None:
+            return content
+
+    seconds = resolve_deadline(params, deadline)
+    end = time.monotonic() + seconds
+
+    def _fetch() -> str:
+        # Échéance restante de cet appelant (relance après l'échec d'un autre meneur)
+        resp = get_scheduler().call(client.chat.completions.create, params, priority,
+                                    max(0.0, end - time.monotonic()))
+        content = resp.choices[0].message.content or ""
+        if cache is not None and content:
+            cache.put(key, params.get("model", ""), content)
+        return content
+
+    try:
+        return single_flight(_flight_key(key, priority), _fetch, seconds)
+    except WaitTimeout as e:
+        raise DeadlineExceeded(str(e)) from e
+
+
+async def cached_completion_async(client, params: Dict[str, Any], cache=None,
+                                  priority: int = PRIORITY_INTERACTIVE,
+                                  deadline: Optional[float] = None) -> str:
+    """
+    Version async de cached_completion (client AsyncOpenAI).
+
+    Les accès SQLite (bloquants) sont exécutés hors de la boucle asyncio.
+    """
+    cache = _resolve(cache)
+    key = request_key(params)
+    if cache is not None:
+        content = await asyncio.to_thread(cache.get, key)
+        if content is not None:
+            return content
+
+    seconds = resolve_deadline(params, deadline)
+    end = time.monotonic() + seconds
+
+    async def _fetch() -> str:
+        resp = await get_scheduler().call_async(client.chat.completions.create, params, priority,
+                                                max(0.0, end - time.monotonic()))
+        content = resp.choices[0].message.content or ""
+        if cache is not None and content:
+            await asyncio.to_thread(cache.put, key, params.get("model", ""), content)
+        return content
+
+    try:
+        return await single_flight_async(_flight_key(key, priority), _fetch, seconds)
+    except WaitTimeout as e:
+        raise DeadlineExceeded(str(e)) from e
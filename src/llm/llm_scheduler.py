@@ -0,0 +1,327 @@
+import os
+import time
+import heapq
+import random
+import asyncio
+import itertools
+import threading
+from typing import Any, Callable, Dict, Optional
+
+import openai
+
+try:
+    from .circuit_breaker import CircuitBreaker, CircuitOpenError, get_breaker
+except ImportError:  # importé depuis un script de src/llm (simple_rag_bot)
+    from circuit_breaker import CircuitBreaker, CircuitOpenError, get_breaker
+
+# Ordonnanceur partagé des appels Groq : limite de débit (requêtes/min et
+# tokens/min, seau à jetons), priorités (chat interactif et nouveaux tickets
+# avant les backfills), échéance par appel et reprise avec backoff
+# exponentiel + jitter sur 429 / 5xx / erreurs réseau. Chaque tentative
+# passe par le disjoncteur partagé (circuit_breaker).
+RPM_LIMIT = float(os.getenv("GROQ_RPM", "30"))              # requêtes par minute
+TPM_LIMIT = float(os.getenv("GROQ_TPM", "6000"))            # tokens par minute
+DEFAULT_DEADLINE = float(os.getenv("GROQ_DEADLINE", "30"))  # secondes par appel (file d'attente comprise)
+CHAT_DEADLINE = float(os.getenv("GROQ_CHAT_DEADLINE", "15"))  # chatbot : l'utilisateur attend la réponse
+BACKOFF_BASE = float(os.getenv("GROQ_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("GROQ_BACKOFF_MAX", "20"))
+MAX_ATTEMPTS = int(os.getenv("GROQ_MAX_ATTEMPTS", "5"))
+
+# Priorités (plus petit = servi en premier)
+PRIORITY_INTERACTIVE = 0    # chat, analyse d'un nouveau ticket
+PRIORITY_BACKFILL = 10      # classification en masse
+
+# Attente maximale entre deux vérifications de la file (secondes)
+_POLL_INTERVAL = 0.05
+
+
+class DeadlineExceeded(TimeoutError):
+    """L'appel n'a pas pu aboutir avant son échéance."""
+
+
+def resolve_deadline(params: Dict[str, Any], deadline: Optional[float] = None) -> float:
+    """Durée maximale d'un appel (secondes) : deadline, sinon timeout de params, sinon GROQ_DEADLINE."""
+    if deadline is None:
+        timeout = params.get("timeout")
+        deadline = timeout if isinstance(timeout, (int, float)) else DEFAULT_DEADLINE
+    return deadline
+
+
+def estimate_tokens(params: Dict[str, Any]) -> int:
+    """Estimation grossière des tokens d'un appel (≈ 4 caractères par token + réponse max)."""
+    chars = sum(len(str(m.get("content") or "")) for m in params.get("messages", []))
+    return chars // 4 + int(params.get("max_tokens") or 256)
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code >= 500
+    return False
+
+
+def _is_outage(error: Exception, timeout: float, latency_budget: float) -> bool:
+    # Panne du service (5xx, timeout, réseau) : seules erreurs comptées par le
+    # disjoncteur. 4xx (clé invalide, requête refusée) et 429 (limite de débit)
+    # concernent l'appelant, pas la disponibilité de l'API. Un timeout ne
+    # compte que si la tentative disposait d'au moins latency_budget secondes
+    # (sinon l'échéance de l'appelant, entamée en file d'attente, l'a causé).
+    if isinstance(error, (openai.APITimeoutError, TimeoutError)):
+        return timeout >= latency_budget
+    if isinstance(error, openai.APIConnectionError):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code >= 500
+    return False
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Seau à jetons : `rate` jetons par minute, capacité `capacity` (rafale)."""
+
+    def __init__(self, rate_per_min: float, capacity: Optional[float] = None):
+        self.rate = rate_per_min / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_min
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Secondes avant de disposer de `amount` jetons (0 si disponible)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate if self.rate > 0 else float("inf")
+
+    def consume(self, amount: float) -> None:
+        # Le niveau peut devenir négatif (dette) après correction par l'usage réel
+        self.level -= amount
+
+
+class RequestScheduler:
+    """
+    File d'attente prioritaire + limites de débit pour les appels LLM.
+
+    Un appel n'est émis que lorsqu'il est en tête de file (priorité, puis
+    ordre d'arrivée) et que les deux seaux (requêtes, tokens) le permettent.
+    Utilisable depuis des threads (call) et depuis asyncio (call_async).
+    Disjoncteur ouvert, les appels sont refusés sans attente (CircuitOpenError).
+    """
+
+    def __init__(self, rpm: float = RPM_LIMIT, tpm: float = TPM_LIMIT,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.breaker = breaker
+        self._requests = TokenBucket(rpm)
+        self._tokens = TokenBucket(tpm)
+        self._cond = threading.Condition()
+        self._queue = []
+        self._seq = itertools.count()
+        self.stats_counters = {"calls": 0, "retries": 0, "rate_limited": 0, "deadline_exceeded": 0}
+
+    # -------------------------------------------------------------------------
+    # File d'attente
+    # -------------------------------------------------------------------------
+
+    def _enqueue(self, priority: int) -> tuple:
+        entry = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._queue, entry)
+        return entry
+
+    def _leave(self, entry: tuple) -> None:
+        with self._cond:
+            if entry in self._queue:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+            self._cond.notify_all()
+
+    def _try_admit(self, entry: tuple, cost: float) -> float:
+        """Admet l'appel (0.0) ou retourne le temps d'attente conseillé."""
+        with self._cond:
+            if self._queue[0] != entry:
+                return _POLL_INTERVAL
+            now = time.monotonic()
+            wait = max(self._requests.wait_time(1, now), self._tokens.wait_time(cost, now))
+            if wait > 0:
+                return wait
+            self._requests.consume(1)
+            self._tokens.consume(cost)
+            heapq.heappop(self._queue)
+            self._cond.notify_all()
+            return 0.0
+
+    def _admit(self, priority: int, cost: float, deadline: float) -> None:
+        entry = self._enqueue(priority)
+        try:
+            while True:
+                wait = self._try_admit(entry, cost)
+                if wait == 0.0:
+                    return
+                remaining = deadline - time.monotonic()
+                if remaining <= wait:
+                    raise DeadlineExceeded("Échéance dépassée en file d'attente (limite de débit)")
+                with self._cond:
+                    self._cond.wait(min(wait, remaining))
+        except BaseException:
+            self._leave(entry)
+            raise
+
+    async def _admit_async(self, priority: int, cost: float, deadline: float) -> None:
+        entry = self._enqueue(priority)
+        try:
+            while True:
+                wait = self._try_admit(entry, cost)
+                if wait == 0.0:
+                    return
+                remaining = deadline - time.monotonic()
+                if remaining <= wait:
+                    raise DeadlineExceeded("Échéance dépassée en file d'attente (limite de débit)")
+                await asyncio.sleep(min(wait, _POLL_INTERVAL * 4, remaining))
+        except BaseException:
+            self._leave(entry)
+            raise
+
+    # -------------------------------------------------------------------------
+    # Appels
+    # -------------------------------------------------------------------------
+
+    def _check_open(self) -> None:
+        if self.breaker is not None and self.breaker.is_open():
+            raise CircuitOpenError(f"API {self.breaker.name} indisponible (disjoncteur ouvert)")
+
+    def _start_attempt(self) -> float:
+        if self.breaker is not None and not self.breaker.allow():
+            raise CircuitOpenError(f"API {self.breaker.name} indisponible (disjoncteur ouvert)")
+        self.stats_counters["calls"] += 1
+        return time.monotonic()
+
+    def _end_attempt(self, started: float, timeout: float, error: Optional[Exception] = None) -> None:
+        if self.breaker is None:
+            return
+        if error is None or _is_outage(error, timeout, self.breaker.latency_budget):
+            self.breaker.record(error is None, time.monotonic() - started)
+        else:
+            self.breaker.release()
+
+    def _deadline(self, params: Dict[str, Any], deadline: Optional[float]) -> float:
+        return time.monotonic() + resolve_deadline(params, deadline)
+
+    def _backoff(self, attempt: int, error: Exception, deadline: float) -> float:
+        if isinstance(error, openai.RateLimitError):
+            self.stats_counters["rate_limited"] += 1
+        delay = _retry_after(error)
+        if delay is None:
+            # Backoff exponentiel avec jitter complet
+            delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+        if time.monotonic() + delay >= deadline:
+            self.stats_counters["deadline_exceeded"] += 1
+            raise DeadlineExceeded(f"Échéance dépassée après {attempt + 1} tentative(s): {error}") from error
+        self.stats_counters["retries"] += 1
+        return delay
+
+    def _record_usage(self, response: Any, estimated: int) -> None:
+        usage = getattr(response, "usage", None)
+        total = getattr(usage, "total_tokens", None)
+        if total is not None:
+            with self._cond:
+                self._tokens.consume(total - estimated)
+
+    def call(self, create: Callable[..., Any], params: Dict[str, Any],
+             priority: int = PRIORITY_INTERACTIVE, deadline: Optional[float] = None) -> Any:
+        """
+        Exécute create(**params) sous limite de débit, avec reprises et échéance.
+
+        Args:
+            create: Fonction d'appel (ex: client.chat.completions.create)
+            params: Paramètres de l'appel
+            priority: PRIORITY_INTERACTIVE ou PRIORITY_BACKFILL
+            deadline: Durée maximale en secondes (défaut : timeout de params ou GROQ_DEADLINE)
+
+        Raises:
+            DeadlineExceeded: Si l'appel ne peut aboutir avant l'échéance
+            CircuitOpenError: Si le disjoncteur refuse l'appel
+        """
+        end = self._deadline(params, deadline)
+        cost = estimate_tokens(params)
+        self._check_open()
+        for attempt in range(MAX_ATTEMPTS):
+            self._admit(priority, cost, end)
+            started = self._start_attempt()
+            timeout = max(0.1, end - time.monotonic())
+            try:
+                response = create(**{**params, "timeout": timeout})
+            except Exception as e:
+                self._end_attempt(started, timeout, e)
+                if not _is_retryable(e) or attempt == MAX_ATTEMPTS - 1:
+                    raise
+                time.sleep(self._backoff(attempt, e, end))
+                continue
+            except BaseException:
+                # Annulation (asyncio, KeyboardInterrupt) : libère la sonde éventuelle
+                if self.breaker is not None:
+                    self.breaker.release()
+                raise
+            self._end_attempt(started, timeout)
+            self._record_usage(response, cost)
+            return response
+
+    async def call_async(self, create: Callable[..., Any], params: Dict[str, Any],
+                         priority: int = PRIORITY_INTERACTIVE,
+                         deadline: Optional[float] = None) -> Any:
+        """Version async de call (create est une coroutine, ex: AsyncOpenAI)."""
+        end = self._deadline(params, deadline)
+        cost = estimate_tokens(params)
+        self._check_open()
+        for attempt in range(MAX_ATTEMPTS):
+            await self._admit_async(priority, cost, end)
+            started = self._start_attempt()
+            timeout = max(0.1, end - time.monotonic())
+            try:
+                response = await create(**{**params, "timeout": timeout})
+            except Exception as e:
+                self._end_attempt(started, timeout, e)
+                if not _is_retryable(e) or attempt == MAX_ATTEMPTS - 1:
+                    raise
+                await asyncio.sleep(self._backoff(attempt, e, end))
+                continue
+            except BaseException:
+                # Annulation (asyncio, KeyboardInterrupt) : libère la sonde éventuelle
+                if self.breaker is not None:
+                    self.breaker.release()
+                raise
+            self._end_attempt(started, timeout)
+            self._record_usage(response, cost)
+            return response
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            stats = {**self.stats_counters, "queued": len(self._queue)}
+        if self.breaker is not None:
+            stats["breaker"] = self.breaker.stats()
+        return stats
+
+
+_lock = threading.Lock()
+_scheduler: Optional[RequestScheduler] = None
+
+
+def get_scheduler() -> RequestScheduler:
+    """Ordonnanceur partagé du processus (classification, chatbot, RAG)."""
+    global _scheduler
+    if _scheduler is None:
+        with _lock:
+            if _scheduler is None:
+                _scheduler = RequestScheduler(breaker=get_breaker())
+    return _scheduler
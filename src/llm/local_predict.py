@@ -0,0 +1,125 @@
+import os
+import sys
+import threading
+from typing import Dict, Any, Optional
+
+# Modèles locaux (sklearn) : pipeline d'inférence du projet DS
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+ML_DIR = os.getenv("LOCAL_ML_DIR", os.path.join(ROOT, "Analyse_intelligente_de_tickets_DS", "src", "ml"))
+
+# Catégories du modèle local (50 libellés métier) -> catégories de l'app
+# (ALLOWED_CATEGORIES de groq_predict). Les libellés absents de la table
+# (trop ambigus : sauvegarde, bandes...) ne sont pas servis en local : le
+# ticket est escaladé au LLM.
+CATEGORY_MAP = {
+    "Accessoires/Request": "Matériel / Poste de travail",
+    "Accès au partage": "Partage & Droits",
+    "Accès au projet": "Partage & Droits",
+    "Accès au serveurs": "Comptes & Accès",
+    "Accès scanner": "Impression",
+    "Activation compte HTDS de UV365": "Comptes & Accès",
+    "Activation office": "Bureautique",
+    "Affectation PC": "Matériel / Poste de travail",
+    "Applications": "Applications & Logiciels",
+    "Autre": "Autre",
+    "Bureautique": "Bureautique",
+    "Bureautique/Incident": "Bureautique",
+    "Changement pc": "Matériel / Poste de travail",
+    "Compte AD": "Comptes & Accès",
+    "Compte AD désactivation": "Comptes & Accès",
+    "Compte SAP": "Comptes & Accès",
+    "Configuration tél": "Téléphonie",
+    "Connexion Réseau": "Réseau & Connexion",
+    "Connexion internet": "Réseau & Connexion",
+    "Création compte AD": "Comptes & Accès",
+    "Création compte HPLC": "Comptes & Accès",
+    "Création compte Lims": "Comptes & Accès",
+    "Création de projet": "Partage & Droits",
+    "Desktop/Request": "Matériel / Poste de travail",
+    "Impressions & Scanner": "Impression",
+    "Impressions & Scanner/Incident": "Impression",
+    "Impressions Scanner Request": "Impression",
+    "Installation SAP": "Applications & Logiciels",
+    "Installation TEAMS": "Applications & Logiciels",
+    "Laptop/Request": "Matériel / Poste de travail",
+    "MAJ system": "Applications & Logiciels",
+    "MDP CFAO": "Comptes & Accès",
+    "MDP SAP": "Comptes & Accès",
+    "Matériel": "Matériel / Poste de travail",
+    "Matériel/Incident": "Matériel / Poste de travail",
+    "Partage": "Partage & Droits",
+    "Réseau / Connexion internet": "Réseau & Connexion",
+    "Statistique SSID": "Réseau & Connexion",
+    "Sécurité/Sophos": "Sécurité",
+    "Utilitaires/Incident": "Applications & Logiciels",
+    "Utilitaires/Request": "Applications & Logiciels",
+    "VPN": "Réseau & Connexion",
+    "accès SAP": "Comptes & Accès",
+    "accès Windows": "Comptes & Accès",
+}
+
+_lock = threading.Lock()
+_pipeline_module = None
+
+
+def _fix_mojibake(label: str) -> str:
+    # Libellés UTF-8 relus en latin-1 dans les données d'origine ("CrÃ©ation")
+    try:
+        return label.encode("latin-1").decode("utf-8")
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return label
+
+
+def map_category(label: str) -> Optional[str]:
+    """Catégorie de l'app pour un libellé du modèle local, None si non mappé."""
+    label = str(label).strip()
+    return CATEGORY_MAP.get(label) or CATEGORY_MAP.get(_fix_mojibake(label))
+
+
+def _load_module():
+    """
+    Import paresseux de predict_pipeline (sklearn/pandas ne sont chargés
+    que si le chemin local est réellement utilisé).
+    """
+    global _pipeline_module
+    if _pipeline_module is not None:
+        return _pipeline_module
+    with _lock:
+        if _pipeline_module is None:
+            if ML_DIR not in sys.path:
+                sys.path.insert(0, ML_DIR)
+            import predict_pipeline
+            _pipeline_module = predict_pipeline
+    return _pipeline_module
+
+
+def local_available() -> bool:
+    """True si les modèles locaux peuvent être importés (dépendances présentes)."""
+    try:
+        _load_module()
+        return True
+    except Exception:
+        return False
+
+
+def predict_ticket_local(titre: str, texte: str) -> Dict[str, Any]:
+    """
+    Prédiction par les modèles locaux, au même format que predict_ticket_groq.
+
+    Retourne aussi les marges de confiance (0..1) des classifieurs :
+    urgence_margin, categorie_margin, type_ticket_margin. "categorie" est la
+    catégorie de l'app (CATEGORY_MAP), None si le libellé du modèle local
+    (categorie_local) n'a pas d'équivalent.
+    """
+    pp = _load_module()
+    pred = pp.predict_ticket_with_confidence(titre or "", texte or "")
+    return {
+        "urgence": str(pred["urgence_pred"]),
+        "categorie": map_category(pred["categorie_pred"]),
+        "categorie_local": str(pred["categorie_pred"]),
+        "type_ticket": str(pred["type_ticket_pred"]),
+        "temps_resolution": round(float(pred["temps_resolution_pred"]), 2),
+        "urgence_margin": float(pred["urgence_margin"]),
+        "categorie_margin": float(pred["categorie_margin"]),
+        "type_ticket_margin": float(pred["type_ticket_margin"]),
+    }
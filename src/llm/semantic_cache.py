@@ -0,0 +1,153 @@
+import os
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Cache sémantique des classifications LLM : un ticket presque identique
+# (cosinus des embeddings titre + description >= seuil) à un ticket déjà
+# classé par le LLM réutilise ses urgence / catégorie / type / temps.
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE", "1") == "1"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "5000"))
+EMBEDDING_MODEL = os.getenv("SEMANTIC_CACHE_MODEL", "all-MiniLM-L6-v2")
+
+LABEL_KEYS = ("urgence", "categorie", "type_ticket", "temps_resolution")
+
+
+def _default_embedder() -> Callable[[str], np.ndarray]:
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(EMBEDDING_MODEL)
+
+    def embed(text: str) -> np.ndarray:
+        return model.encode([text], normalize_embeddings=True)[0]
+
+    return embed
+
+
+class SemanticCache:
+    """
+    Index en mémoire borné (max_entries) des tickets classés par le LLM.
+
+    Les embeddings normalisés sont rangés dans une matrice préallouée : la
+    recherche est un produit matrice-vecteur. Plein, l'index remplace
+    l'entrée la moins récemment utilisée.
+
+    Args:
+        threshold: Similarité cosinus minimale pour réutiliser une classification
+        max_entries: Nombre maximal de tickets indexés
+        embed: Fonction texte -> embedding ; par défaut SentenceTransformer
+            (chargé au premier usage)
+    """
+
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 max_entries: int = SEMANTIC_CACHE_SIZE,
+                 embed: Optional[Callable[[str], np.ndarray]] = None):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._embed = embed
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None
+        self._values: list = [None] * max_entries
+        self._texts: list = [None] * max_entries
+        self._last_used = np.zeros(max_entries, dtype=np.int64)
+        self._size = 0
+        self._clock = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def embed(self, text: str) -> np.ndarray:
+        if self._embed is None:
+            with self._lock:
+                if self._embed is None:
+                    self._embed = _default_embedder()
+        vec = np.asarray(self._embed(text), dtype=np.float32)
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm else vec
+
+    def lookup(self, text: str, vector: Optional[np.ndarray] = None
+               ) -> Tuple[Optional[Dict[str, Any]], float, Optional[str]]:
+        """
+        Cherche le ticket indexé le plus proche.
+
+        Returns:
+            (labels réutilisables ou None, similarité, texte du ticket retrouvé)
+        """
+        vec = self.embed(text) if vector is None else vector
+        with self._lock:
+            if self._size == 0:
+                self.misses += 1
+                return None, 0.0, None
+            sims = self._vectors[:self._size] @ vec
+            best = int(np.argmax(sims))
+            similarity = float(sims[best])
+            if similarity < self.threshold:
+                self.misses += 1
+                return None, similarity, None
+            self._clock += 1
+            self._last_used[best] = self._clock
+            self.hits += 1
+            return dict(self._values[best]), similarity, self._texts[best]
+
+    def add(self, text: str, labels: Dict[str, Any], vector: Optional[np.ndarray] = None) -> None:
+        """Indexe la classification LLM d'un ticket."""
+        if self.max_entries <= 0:
+            return
+        vec = self.embed(text) if vector is None else vector
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vec.shape[0]), dtype=np.float32)
+            if self._size < self.max_entries:
+                slot = self._size
+                self._size += 1
+            else:
+                slot = int(np.argmin(self._last_used))
+                self.evictions += 1
+            self._clock += 1
+            self._vectors[slot] = vec
+            self._values[slot] = {k: labels[k] for k in LABEL_KEYS}
+            self._texts[slot] = text
+            self._last_used[slot] = self._clock
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": self._size,
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+_lock = threading.Lock()
+_cache: Optional[SemanticCache] = None
+_unavailable = False
+
+
+def get_semantic_cache() -> Optional[SemanticCache]:
+    """
+    Cache sémantique partagé du processus.
+
+    None si SEMANTIC_CACHE=0 ou si sentence-transformers n'est pas installé.
+    """
+    global _cache, _unavailable
+    if not SEMANTIC_CACHE_ENABLED or _unavailable:
+        return None
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                try:
+                    _cache = SemanticCache(embed=_default_embedder())
+                except Exception as e:
+                    logger.warning("Cache sémantique désactivé (modèle d'embedding indisponible): %s", e)
+                    _unavailable = True
+                    return None
+    return _cache
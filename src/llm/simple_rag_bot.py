@@ -2,10 +2,19 @@ import os
 import sys
 import chromadb
 from chromadb.utils import embedding_functions
-from openai import OpenAI
+
+try:
+    from .groq_client import get_client
+    from .llm_cache import cached_completion
+    from .llm_scheduler import CHAT_DEADLINE, PRIORITY_INTERACTIVE
+    from .circuit_breaker import CircuitOpenError
+except ImportError:  # exécuté comme script : python src/llm/simple_rag_bot.py
+    from groq_client import get_client
+    from llm_cache import cached_completion
+    from llm_scheduler import CHAT_DEADLINE, PRIORITY_INTERACTIVE
+    from circuit_breaker import CircuitOpenError
 
 # Configuration
-GROQ_BASE_URL = "https://api.groq.com/openai/v1"
 GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
@@ -46,7 +55,9 @@ def setup_chroma():
     )
     return collection
 
-def ask_bot(query, collection, client_llm):
+def ask_bot(query, collection, client_llm=None):
+    # Par défaut : client Groq partagé du processus (pool de connexions)
+    client_llm = client_llm or get_client()
     print(f"\n🔍 Question: {query}")
     
     # Étape A : Chercher dans la base Chroma
@@ -65,17 +76,21 @@ def ask_bot(query, collection, client_llm):
     
     # Étape C : Envoyer au LLM
     try:
-        response = client_llm.chat.completions.create(
+        # Questions répétées (FAQ) servies depuis le cache disque ; sinon
+        # appel prioritaire sur les backfills, borné par CHAT_DEADLINE
+        answer = cached_completion(client_llm, dict(
             model=GROQ_MODEL,
             messages=[
                 {"role": "system", "content": "Tu es un assistant support expert."},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.0
-        )
-        answer = response.choices[0].message.content
+        ), priority=PRIORITY_INTERACTIVE, deadline=CHAT_DEADLINE)
         return answer
         
+    except CircuitOpenError:
+        # API Groq en panne : questions déjà en cache servies plus haut, sinon message fixe
+        return "⚠️ Assistant hors ligne (API LLM indisponible), réessayez plus tard."
     except Exception as e:
         return f"Erreur LLM: {e}"
 
@@ -87,7 +102,7 @@ def main():
     print("⏳ Initialisation de la base de connaissances (ChromaDB)...")
     collection = setup_chroma()
     
-    client_llm = OpenAI(base_url=GROQ_BASE_URL, api_key=GROQ_API_KEY)
+    client_llm = get_client()
     
     # Test
     query = "Comment résoudre un problème de connexion Maroc Telecom?"
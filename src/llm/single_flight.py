@@ -0,0 +1,176 @@
+import os
+import time
+import asyncio
+import weakref
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# Regroupement des requêtes LLM identiques en vol : quand plusieurs agents
+# ouvrent le même incident en même temps, un seul appel part vers Groq et
+# tous les appelants partagent sa réponse (ou son erreur). Complète le cache
+# disque, qui ne sert qu'une fois la première réponse arrivée.
+SINGLE_FLIGHT_ENABLED = os.getenv("LLM_SINGLE_FLIGHT", "1") == "1"
+
+
+class WaitTimeout(TimeoutError):
+    """Échéance de l'appelant atteinte avant la fin de l'appel partagé."""
+
+
+def _remaining(end: Optional[float]) -> Optional[float]:
+    return None if end is None else max(0.0, end - time.monotonic())
+
+
+def _retry_after_leader_timeout(error: BaseException, end: Optional[float]) -> bool:
+    # Le meneur a dépassé sa propre échéance : un appelant disposant encore
+    # de temps relance l'appel au lieu d'hériter de l'erreur
+    return isinstance(error, TimeoutError) and (end is None or time.monotonic() < end)
+
+
+class _Call:
+    __slots__ = ("event", "result", "error", "abandoned")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        # Meneur interrompu (KeyboardInterrupt, SystemExit...) : pas de résultat à partager
+        self.abandoned = False
+
+
+class SingleFlight:
+    """Un seul appel en cours par clé pour les appelants synchrones (threads)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """
+        Exécute fn(), ou attend l'appel identique déjà en cours et retourne son résultat.
+
+        Args:
+            key: Clé de regroupement
+            fn: Appel à exécuter (sans argument)
+            timeout: Attente maximale (secondes) d'un appel lancé par un autre thread
+
+        Raises:
+            WaitTimeout: Si l'appel partagé n'est pas terminé avant `timeout`
+        """
+        end = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+                    self.calls += 1
+                else:
+                    self.coalesced += 1
+            if leader:
+                break
+            if not call.event.wait(_remaining(end)):
+                raise WaitTimeout(f"Appel partagé non terminé avant l'échéance ({timeout:.1f}s)")
+            if call.abandoned:
+                continue  # l'appel est relancé (par ce thread ou un autre)
+            if call.error is not None:
+                if _retry_after_leader_timeout(call.error, end):
+                    continue
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        except BaseException:
+            call.abandoned = True
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self._calls)}
+
+
+class AsyncSingleFlight:
+    """
+    Un seul appel en cours par clé et par boucle asyncio.
+
+    L'appel est exécuté dans une tâche indépendante : l'annulation de
+    l'appelant qui l'a lancé n'interrompt pas les autres appelants. Si la
+    tâche elle-même est annulée, les appelants en attente la relancent.
+    """
+
+    def __init__(self):
+        # Une table par boucle (une tâche est liée à sa boucle)
+        self._tasks = weakref.WeakKeyDictionary()
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]],
+                 timeout: Optional[float] = None) -> Any:
+        """Version async de SingleFlight.do (même sémantique de `timeout`)."""
+        loop = asyncio.get_running_loop()
+        tasks = self._tasks.setdefault(loop, {})
+        end = None if timeout is None else time.monotonic() + timeout
+        while True:
+            task = tasks.get(key)
+            created = task is None
+            if created:
+                task = tasks[key] = loop.create_task(fn())
+                task.add_done_callback(lambda t: self._done(tasks, key, t))
+                self.calls += 1
+            else:
+                self.coalesced += 1
+            # asyncio.wait n'annule pas la tâche partagée (échéance ou annulation de l'appelant)
+            done, _ = await asyncio.wait({task}, timeout=_remaining(end))
+            if not done:
+                raise WaitTimeout(f"Appel partagé non terminé avant l'échéance ({timeout:.1f}s)")
+            if task.cancelled():
+                continue  # tâche partagée annulée (et non cet appelant) : nouvel appel
+            error = task.exception()
+            if error is not None and not created and _retry_after_leader_timeout(error, end):
+                continue
+            return task.result()
+
+    @staticmethod
+    def _done(tasks: Dict[str, "asyncio.Task"], key: str, task: "asyncio.Task") -> None:
+        if tasks.get(key) is task:
+            del tasks[key]
+        # Exception consommée : pas de "Task exception was never retrieved"
+        # si aucun appelant n'attend plus la tâche
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        in_flight = sum(len(tasks) for tasks in list(self._tasks.values()))
+        return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": in_flight}
+
+
+_single_flight = SingleFlight()
+_async_single_flight = AsyncSingleFlight()
+
+
+def single_flight(key: str, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+    """fn() regroupé avec les appels identiques (même clé) en cours dans le processus."""
+    if not SINGLE_FLIGHT_ENABLED:
+        return fn()
+    return _single_flight.do(key, fn, timeout)
+
+
+async def single_flight_async(key: str, fn: Callable[[], Awaitable[Any]],
+                              timeout: Optional[float] = None) -> Any:
+    """Version async de single_flight (appels de la même boucle asyncio)."""
+    if not SINGLE_FLIGHT_ENABLED:
+        return await fn()
+    return await _async_single_flight.do(key, fn, timeout)
+
+
+def stats() -> Dict[str, Any]:
+    return {"sync": _single_flight.stats(), "async": _async_single_flight.stats()}
@@ -0,0 +1,258 @@
+import gc
+import os
+import sys
+import time
+import asyncio
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "llm"))
+
+from single_flight import AsyncSingleFlight, SingleFlight, WaitTimeout  # noqa: E402
+
+
+# -----------------------------------------------------------------------------
+# SingleFlight (threads)
+# -----------------------------------------------------------------------------
+
+def _run_followers(flight, key, fn, n, **kwargs):
+    """Lance n threads sur la même clé ; retourne (résultats, erreurs)."""
+    results, errors = [], []
+
+    def worker():
+        try:
+            results.append(flight.do(key, fn, **kwargs))
+        except BaseException as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    return results, errors
+
+
+def test_sync_identical_calls_are_coalesced():
+    flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return "réponse"
+
+    threading.Timer(0.1, release.set).start()
+    results, errors = _run_followers(flight, "k", fn, 8)
+
+    assert errors == []
+    assert results == ["réponse"] * 8
+    assert len(calls) == 1
+    assert flight.stats() == {"calls": 1, "coalesced": 7, "in_flight": 0}
+
+
+def test_sync_leader_error_is_shared():
+    flight = SingleFlight()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        time.sleep(0.1)
+        raise ValueError("API en erreur")
+
+    results, errors = _run_followers(flight, "k", fn, 4)
+
+    assert results == []
+    assert len(errors) == 4 and all(isinstance(e, ValueError) for e in errors)
+    assert len(calls) == 1
+
+
+def test_sync_abandoned_leader_is_reissued_by_follower():
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def interrupted():
+        started.set()
+        time.sleep(0.1)
+        raise KeyboardInterrupt
+
+    leader_errors = []
+
+    def leader():
+        try:
+            flight.do("k", interrupted)
+        except KeyboardInterrupt as e:
+            leader_errors.append(e)
+
+    t = threading.Thread(target=leader)
+    t.start()
+    started.wait(5)
+    assert flight.do("k", lambda: 42) == 42
+    t.join(5)
+    assert len(leader_errors) == 1
+
+
+def test_sync_follower_waits_at_most_its_timeout():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return "lent"
+
+    t = threading.Thread(target=flight.do, args=("k", slow))
+    t.start()
+    started.wait(5)
+    begin = time.monotonic()
+    with pytest.raises(WaitTimeout):
+        flight.do("k", slow, timeout=0.1)
+    assert time.monotonic() - begin < 1.0
+    release.set()
+    t.join(5)
+
+
+def test_sync_leader_timeout_is_retried_by_follower_with_time_left():
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def short_deadline():
+        started.set()
+        time.sleep(0.1)
+        raise TimeoutError("échéance du meneur")
+
+    leader_errors = []
+
+    def leader():
+        try:
+            flight.do("k", short_deadline)
+        except TimeoutError as e:
+            leader_errors.append(e)
+
+    t = threading.Thread(target=leader)
+    t.start()
+    started.wait(5)
+    assert flight.do("k", lambda: "relancé", timeout=5) == "relancé"
+    t.join(5)
+    assert len(leader_errors) == 1
+
+
+# -----------------------------------------------------------------------------
+# AsyncSingleFlight
+# -----------------------------------------------------------------------------
+
+def _run(coro):
+    """asyncio.run en capturant les erreurs signalées par la boucle."""
+    reported = []
+
+    async def main():
+        asyncio.get_running_loop().set_exception_handler(lambda _loop, ctx: reported.append(ctx))
+        return await coro
+
+    return asyncio.run(main()), reported
+
+
+def test_async_identical_calls_are_coalesced():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "réponse"
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do("k", fn) for _ in range(8)))
+
+    results, reported = _run(scenario())
+    assert results == ["réponse"] * 8
+    assert len(calls) == 1
+    assert reported == []
+
+
+def test_async_leader_error_is_shared_and_retrieved():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        raise ValueError("API en erreur")
+
+    async def scenario():
+        # Le seul appelant est annulé : l'erreur de la tâche n'est lue par personne
+        lonely = asyncio.ensure_future(flight.do("seul", fn))
+        await asyncio.sleep(0.01)
+        lonely.cancel()
+        results = await asyncio.gather(*(flight.do("k", fn) for _ in range(3)),
+                                       return_exceptions=True)
+        await asyncio.sleep(0.1)
+        return results
+
+    results, reported = _run(scenario())
+    assert len(results) == 3 and all(isinstance(r, ValueError) for r in results)
+    assert len(calls) == 2
+    # Pas de "Task exception was never retrieved"
+    gc.collect()
+    assert reported == []
+
+
+def test_async_cancelled_leader_task_is_reissued():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return len(calls)
+
+    async def scenario():
+        waiters = [asyncio.ensure_future(flight.do("k", fn)) for _ in range(3)]
+        await asyncio.sleep(0.02)
+        shared = next(iter(flight._tasks[asyncio.get_running_loop()].values()))
+        shared.cancel()
+        return await asyncio.gather(*waiters)
+
+    results, _ = _run(scenario())
+    assert results == [2, 2, 2]
+    assert len(calls) == 2
+
+
+def test_async_caller_cancellation_does_not_affect_others():
+    flight = AsyncSingleFlight()
+
+    async def fn():
+        await asyncio.sleep(0.05)
+        return "réponse"
+
+    async def scenario():
+        first = asyncio.ensure_future(flight.do("k", fn))
+        second = asyncio.ensure_future(flight.do("k", fn))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    result, _ = _run(scenario())
+    assert result == "réponse"
+
+
+def test_async_follower_waits_at_most_its_timeout():
+    flight = AsyncSingleFlight()
+
+    async def slow():
+        await asyncio.sleep(0.5)
+        return "lent"
+
+    async def scenario():
+        leader = asyncio.ensure_future(flight.do("k", slow))
+        await asyncio.sleep(0.01)
+        with pytest.raises(WaitTimeout):
+            await flight.do("k", slow, timeout=0.05)
+        return await leader
+
+    result, _ = _run(scenario())
+    assert result == "lent"